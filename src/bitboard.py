@@ -0,0 +1,384 @@
+from typing import Dict, Iterator, List, Optional
+
+from src.utils import PAWN, LANCE, KNIGHT, SILVER, GOLD, BISHOP, ROOK, KING, PIECE_TYPES
+from src.move import make_move
+from src.tables import PIECE_PATTERNS, PROMOTABLE, MUST_PROMOTE_ROWS, STEP_TABLE
+
+# 81-bit bitboard representation of a shogi position.
+# Square index: sq = r * 9 + c, where (r, c) is the same (row, col) used by ShogiBoard.board,
+# so bit `1 << sq` is the cell board[r][c].
+
+PROMOTED = 16  # Flag added to the piece type of a promoted piece code
+
+FULL_BB = (1 << 81) - 1
+SQUARE_BB = [1 << sq for sq in range(81)]
+ROW_BB = [sum(SQUARE_BB[r * 9 + c] for c in range(9)) for r in range(9)]
+COL_BB = [sum(SQUARE_BB[r * 9 + c] for r in range(9)) for c in range(9)]
+
+PROMOTION_ZONE_BB = {1: ROW_BB[0] | ROW_BB[1] | ROW_BB[2], -1: ROW_BB[6] | ROW_BB[7] | ROW_BB[8]}
+# Ranks where a pawn, lance or knight could never move again: it may only arrive promoted
+# and can't be dropped there
+MUST_PROMOTE_BB = {ptype: {team: sum(ROW_BB[r] for r in rows) for team, rows in team_rows.items()}
+                   for ptype, team_rows in MUST_PROMOTE_ROWS.items()}
+
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+ORTHOGONAL_DIRECTIONS = [1, 3, 4, 6]
+DIAGONAL_DIRECTIONS = [0, 2, 5, 7]
+# Direction from a square towards the lances of a team that could attack it
+LANCE_SOURCE_DIRECTION = {1: DIRECTIONS.index((1, 0)), -1: DIRECTIONS.index((-1, 0))}
+
+
+def square(r: int, c: int) -> int:
+    return r * 9 + c
+
+
+def iter_squares(bb: int) -> Iterator[int]:
+    '''Yield the square index of every set bit, lowest first'''
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def piece_code(ptype: int, team: int, promoted: bool = False) -> int:
+    '''Signed piece code stored in BitboardPosition.squares, 0 is an empty cell'''
+    return team * (ptype | PROMOTED) if promoted else team * ptype
+
+
+def _build_rays() -> List[List[int]]:
+    rays = []
+    for dr, dc in DIRECTIONS:
+        dir_rays = []
+        for sq in range(81):
+            r, c = divmod(sq, 9)
+            mask = 0
+            r, c = r + dr, c + dc
+            while 0 <= r <= 8 and 0 <= c <= 8:
+                mask |= SQUARE_BB[r * 9 + c]
+                r, c = r + dr, c + dc
+            dir_rays.append(mask)
+        rays.append(dir_rays)
+    return rays
+
+
+RAYS = _build_rays()
+# Rays whose squares have increasing indices find their nearest blocker at the lowest bit
+RAY_IS_POSITIVE = [dr * 9 + dc > 0 for dr, dc in DIRECTIONS]
+
+
+def _build_between() -> List[List[int]]:
+    between = [[0] * 81 for _ in range(81)]
+    for direction in range(len(DIRECTIONS)):
+        for sq in range(81):
+            ray = RAYS[direction][sq]
+            for target in iter_squares(ray):
+                between[sq][target] = ray & ~RAYS[direction][target] & ~SQUARE_BB[target]
+    return between
+
+
+# Squares strictly between two squares on the same line, 0 if they are not aligned
+BETWEEN = _build_between()
+
+
+STEP_ATTACKS: Dict[int, List[int]] = {}
+SLIDE_DIRECTIONS: Dict[int, List[int]] = {}
+
+# Step masks and slide directions per signed piece code, taken from the move tables
+for (_ptype, _promoted), (_steps, _slides) in PIECE_PATTERNS.items():
+    for _team in (1, -1):
+        _code = piece_code(_ptype, _team, _promoted)
+        STEP_ATTACKS[_code] = [sum(SQUARE_BB[dst] for dst, _ in targets) for targets in STEP_TABLE[(_ptype, _promoted, _team)]]
+        SLIDE_DIRECTIONS[_code] = [DIRECTIONS.index((dr * _team, dc)) for dr, dc in _slides]
+
+
+class BitboardPosition:
+    '''
+    Piece placement as bitboards (occupancy, per team, per piece type, promoted flags)
+    plus a mailbox of piece codes for O(1) lookups by square, the king square and the set
+    of occupied squares of each team, all kept up to date by put() and remove().
+    Pieces in hand stay on ShogiPlayer.captured.
+    '''
+    def __init__(self) -> None:
+        self.occupied = 0
+        self.teams = {1: 0, -1: 0}
+        self.pieces = [0] * 9     # Indexed by piece type
+        self.promoted = 0
+        self.squares = [0] * 81   # Piece code per square
+        self.kings = {1: -1, -1: -1}
+        self.piece_squares = {1: set(), -1: set()}
+
+
+    @classmethod
+    def from_grid(cls, grid) -> 'BitboardPosition':
+        '''Build from a 9x9 list of ShogiPiece objects (ShogiBoard.board)'''
+        position = cls()
+        for r, row in enumerate(grid):
+            for c, cell in enumerate(row):
+                if cell:
+                    position.put(r * 9 + c, PIECE_TYPES[cell.name.upper()], cell.team, cell.promoted)
+        return position
+
+
+    def copy(self) -> 'BitboardPosition':
+        position = BitboardPosition.__new__(BitboardPosition)
+        position.occupied = self.occupied
+        position.teams = dict(self.teams)
+        position.pieces = list(self.pieces)
+        position.promoted = self.promoted
+        position.squares = list(self.squares)
+        position.kings = dict(self.kings)
+        position.piece_squares = {1: set(self.piece_squares[1]), -1: set(self.piece_squares[-1])}
+        return position
+
+
+    def put(self, sq: int, ptype: int, team: int, promoted: bool = False) -> None:
+        bit = SQUARE_BB[sq]
+        self.occupied |= bit
+        self.teams[team] |= bit
+        self.pieces[ptype] |= bit
+        if promoted:
+            self.promoted |= bit
+        self.squares[sq] = piece_code(ptype, team, promoted)
+        self.piece_squares[team].add(sq)
+        if ptype == KING:
+            self.kings[team] = sq
+
+
+    def remove(self, sq: int) -> int:
+        '''Remove the piece on sq and return its code (0 if the square was empty)'''
+        code = self.squares[sq]
+        if code:
+            team = 1 if code > 0 else -1
+            mask = ~SQUARE_BB[sq]
+            self.occupied &= mask
+            self.teams[team] &= mask
+            self.pieces[abs(code) & ~PROMOTED] &= mask
+            self.promoted &= mask
+            self.squares[sq] = 0
+            self.piece_squares[team].discard(sq)
+            if code == team * KING:
+                king_bb = self.pieces[KING] & self.teams[team]
+                self.kings[team] = king_bb.bit_length() - 1 if king_bb else -1
+        return code
+
+
+    def put_code(self, sq: int, code: int) -> None:
+        self.put(sq, abs(code) & ~PROMOTED, 1 if code > 0 else -1, abs(code) & PROMOTED != 0)
+
+
+    def move(self, src: int, dst: int, is_promoted: bool = False) -> int:
+        '''Move the piece on src to dst and return the captured piece code'''
+        code = self.remove(src)
+        captured = self.remove(dst)
+        self.put(dst, abs(code) & ~PROMOTED, 1 if code > 0 else -1, is_promoted or abs(code) & PROMOTED != 0)
+        return captured
+
+
+    def undo_move(self, src: int, dst: int, code: int, captured: int) -> None:
+        '''Revert move(), given the moved piece's original code and the captured code'''
+        self.remove(dst)
+        self.put_code(src, code)
+        if captured:
+            self.put_code(dst, captured)
+
+
+    def king_square(self, team: int) -> int:
+        '''Square of the team's king, -1 if it is not on the board'''
+        return self.kings[team]
+
+
+    def slide_attacks(self, sq: int, direction: int, occupied: int) -> int:
+        ray = RAYS[direction][sq]
+        blockers = ray & occupied
+        if blockers:
+            if RAY_IS_POSITIVE[direction]:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAYS[direction][blocker]
+        return ray
+
+
+    def attacks_from(self, sq: int, occupied: Optional[int] = None) -> int:
+        '''Squares attacked by the piece on sq, including squares held by its own team'''
+        code = self.squares[sq]
+        if occupied is None:
+            occupied = self.occupied
+        attacks = STEP_ATTACKS[code][sq]
+        for direction in SLIDE_DIRECTIONS[code]:
+            attacks |= self.slide_attacks(sq, direction, occupied)
+        return attacks
+
+
+    def team_attacks(self, team: int, occupied: Optional[int] = None) -> int:
+        '''Union of every square attacked by the team'''
+        attacks = 0
+        for sq in self.piece_squares[team]:
+            attacks |= self.attacks_from(sq, occupied)
+        return attacks
+
+
+    def attackers_to(self, sq: int, team: int, occupied: Optional[int] = None) -> int:
+        '''
+        Bitboard of the team's pieces attacking sq.
+        Looks outward from sq: a piece of `team` reaches sq exactly when the same piece
+        of the other team standing on sq would reach it, so the other team's step masks
+        and rays from sq are intersected with the team's pieces of each kind.
+        '''
+        if occupied is None:
+            occupied = self.occupied
+        pieces, promoted, them = self.pieces, self.promoted, self.teams[team]
+        other = -team
+
+        unpromoted = them & ~promoted
+        attackers = STEP_ATTACKS[other * PAWN][sq] & pieces[PAWN] & unpromoted
+        attackers |= STEP_ATTACKS[other * KNIGHT][sq] & pieces[KNIGHT] & unpromoted
+        attackers |= STEP_ATTACKS[other * SILVER][sq] & pieces[SILVER] & unpromoted
+        attackers |= STEP_ATTACKS[other * GOLD][sq] & (pieces[GOLD] | (promoted & (pieces[PAWN] | pieces[LANCE] | pieces[KNIGHT] | pieces[SILVER])))
+        attackers |= STEP_ATTACKS[KING][sq] & (pieces[KING] | (promoted & (pieces[ROOK] | pieces[BISHOP])))
+        attackers &= them
+
+        rooks, bishops = pieces[ROOK] & them, pieces[BISHOP] & them
+        lances = pieces[LANCE] & unpromoted
+        for direction in ORTHOGONAL_DIRECTIONS:
+            sliders = rooks | lances if direction == LANCE_SOURCE_DIRECTION[team] else rooks
+            if RAYS[direction][sq] & sliders:
+                attackers |= self.slide_attacks(sq, direction, occupied) & sliders
+        if bishops:
+            for direction in DIAGONAL_DIRECTIONS:
+                if RAYS[direction][sq] & bishops:
+                    attackers |= self.slide_attacks(sq, direction, occupied) & bishops
+
+        return attackers
+
+
+    def is_attacked(self, sq: int, team: int, occupied: Optional[int] = None) -> bool:
+        return self.attackers_to(sq, team, occupied) != 0
+
+
+    def checkers(self, team: int) -> int:
+        '''Bitboard of the opponent pieces giving check to the team's king'''
+        king_sq = self.kings[team]
+        return self.attackers_to(king_sq, -team) if king_sq >= 0 else 0
+
+
+    def pinned(self, team: int) -> Dict[int, int]:
+        '''
+        Pieces of the team pinned to their king, mapped to the squares they may still move to:
+        the line between the king and the pinning slider, the slider included.
+        '''
+        king_sq = self.kings[team]
+        pins = {}
+        if king_sq < 0:
+            return pins
+
+        them = self.teams[-team]
+        rooks, bishops = self.pieces[ROOK] & them, self.pieces[BISHOP] & them
+        lances = self.pieces[LANCE] & them & ~self.promoted
+
+        for direction in range(len(DIRECTIONS)):
+            if direction in DIAGONAL_DIRECTIONS:
+                sliders = bishops
+            else:
+                sliders = rooks | lances if direction == LANCE_SOURCE_DIRECTION[-team] else rooks
+            if not RAYS[direction][king_sq] & sliders:
+                continue
+
+            # 王將方向上第一個棋子是自己的，第二個是對方的飛車/角行/香車就是被釘住
+            blocker = self.slide_attacks(king_sq, direction, self.occupied) & self.teams[team]
+            if not blocker:
+                continue
+            blocker_sq = blocker.bit_length() - 1
+            pinner = self.slide_attacks(blocker_sq, direction, self.occupied) & sliders
+            if pinner:
+                pins[blocker_sq] = BETWEEN[king_sq][pinner.bit_length() - 1] | pinner
+
+        return pins
+
+
+    def evasion_targets(self, team: int) -> int:
+        '''
+        Squares a non-king move or a drop must land on to be legal with respect to check:
+        every square when not in check, the checker and the squares between it and the king
+        under a single check, none under a double check.
+        '''
+        checkers = self.checkers(team)
+        if not checkers:
+            return FULL_BB
+        if checkers & (checkers - 1):
+            return 0
+        return checkers | BETWEEN[self.kings[team]][checkers.bit_length() - 1]
+
+
+    def piece_moves(self, sq: int, targets: int = FULL_BB) -> List[int]:
+        '''
+        Pseudo-legal moves of the piece on sq, limited to the targets mask, encoded by src.move.
+        A move starting or ending in the promotion zone may promote, and a pawn, lance or knight
+        reaching a rank it could never leave only has the promotion.
+        '''
+        code = self.squares[sq]
+        team = 1 if code > 0 else -1
+        ptype = abs(code)
+        targets &= self.attacks_from(sq) & ~self.teams[team]
+        zone = PROMOTION_ZONE_BB[team]
+        can_promote = ptype in PROMOTABLE
+        from_zone = bool(SQUARE_BB[sq] & zone)
+        must_promote = MUST_PROMOTE_BB[ptype][team] if ptype in MUST_PROMOTE_BB else 0
+
+        moves = []
+        for dst in iter_squares(targets):
+            if not SQUARE_BB[dst] & must_promote:
+                moves.append(make_move(sq, dst))
+            if can_promote and (from_zone or SQUARE_BB[dst] & zone):
+                moves.append(make_move(sq, dst, True))
+        return moves
+
+
+    def generate_moves(self, team: int, mask: int = FULL_BB) -> List[int]:
+        '''Pseudo-legal board moves of the team landing on the mask'''
+        moves = []
+        for sq in self.piece_squares[team]:
+            moves.extend(self.piece_moves(sq, mask))
+        return moves
+
+
+    def generate_legal_moves(self, team: int, mask: int = FULL_BB) -> List[int]:
+        '''
+        Legal board moves of the team, only those landing on the mask, ex: the opponent's
+        pieces for captures. Checkers and pins are found once, then the king avoids attacked
+        squares, pinned pieces stay on their pin line and under check the other pieces may
+        only capture the checker or interpose.
+        '''
+        king_sq = self.kings[team]
+        if king_sq < 0:
+            return self.generate_moves(team, mask)
+
+        # 王將移開後，原本被王將擋住的飛車/角行/香車路線也算被攻擊
+        occupied = self.occupied & ~SQUARE_BB[king_sq]
+        safe = 0
+        for dst in iter_squares(self.attacks_from(king_sq) & ~self.teams[team] & mask):
+            if not self.is_attacked(dst, -team, occupied):
+                safe |= SQUARE_BB[dst]
+        moves = self.piece_moves(king_sq, safe)
+
+        targets = self.evasion_targets(team) & mask
+        if not targets:
+            return moves
+
+        pins = self.pinned(team)
+        for sq in self.piece_squares[team]:
+            if sq != king_sq:
+                moves.extend(self.piece_moves(sq, targets & pins.get(sq, FULL_BB)))
+        return moves
+
+
+    def drop_targets(self, ptype: int, team: int) -> int:
+        '''Empty squares where the team may drop ptype without breaking the placement and nifu rules'''
+        targets = ~self.occupied & FULL_BB
+        if ptype in MUST_PROMOTE_BB:
+            targets &= ~MUST_PROMOTE_BB[ptype][team]
+        if ptype == PAWN:
+            # 二步只看未升變的步兵，と金不算
+            for sq in iter_squares(self.pieces[PAWN] & self.teams[team] & ~self.promoted):
+                targets &= ~COL_BB[sq % 9]
+        return targets
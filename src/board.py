@@ -1,10 +1,21 @@
-from typing import Tuple, List, Set
+import copy
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, Tuple, List, Optional, Set, Union
 
-from src.utils import parse_string_to_pos, parse_drop_to_string
+from src.utils import PIECE_TYPES, PIECE_LETTERS, PAWN, hand_letter, is_in_board
+from src.move import DROP_SHIFT, make_drop, move_src, move_dst, is_promotion, drop_type, string_to_move
 from src.piece import *
 from src.player import ShogiPlayer
+from src.bitboard import BitboardPosition, PROMOTED, SQUARE_BB, FULL_BB, iter_squares
+from src.zobrist import PIECE_KEYS, SIDE_KEY, MOVES_KEYS, CHECK_KEYS, board_key
+from src.transposition import TranspositionTable
+from src.sfen import parse_sfen, to_sfen
+from src.mate import is_checkmate
+
+# (piece code per square, hand counts of team 1, hand counts of team -1, side to move)
+CompactState = Tuple[Tuple[int, ...], Tuple[int, ...], Tuple[int, ...], int]
 
-import copy
 
 class ShogiBoard:
     PIECES = {'K': King, 'R': Rook, 'B': Bishop, 'G': GGeneral, 'S': SGeneral, 'N': Knight, 'L': Lance, 'P': Pawn}
@@ -25,10 +36,12 @@ class ShogiBoard:
     KINGHT_LANCE_PIECE_NAME = ['n', 'l', 'N', 'L']
 
 
-    def __init__(self, our_player: ShogiPlayer, opponent_player: ShogiPlayer) -> None:
+    def __init__(self, our_player: ShogiPlayer, opponent_player: ShogiPlayer, tt_memory_mb: Optional[float] = 16) -> None:
+        '''tt_memory_mb: budget of the cache table, 0 or None for a board that caches nothing'''
         self.board = [[None for _ in range(9)] for _ in range(9)]
         self._our_player = our_player
         self._opponent_player = opponent_player
+        self.tt = TranspositionTable(tt_memory_mb)  # Cached move lists and check status per position
         self.init_board()
 
 
@@ -41,6 +54,12 @@ class ShogiBoard:
         self._opponent_player = opponent_player
 
 
+    @property
+    def players(self) -> Dict[int, ShogiPlayer]:
+        '''Both players by team'''
+        return {self._our_player.team: self._our_player, self._opponent_player.team: self._opponent_player}
+
+
     def __repr__(self) -> str:
         '''Print board for human to see'''
         str_board = ""
@@ -100,9 +119,133 @@ class ShogiBoard:
         self.board[7][7] = Rook('r', 1)
         self.board[8] = [Lance('l', 1), Knight('n', 1), SGeneral('s', 1), GGeneral('g', 1), King('k', 1), GGeneral('g', 1), SGeneral('s', 1), Knight('n', 1), Lance('l', 1)]
 
+        self._reset_position()
+
     
     def insert_board(self, customization_board):
         self.board = customization_board
+        self._reset_position()
+
+
+    def _reset_position(self, position: Optional[BitboardPosition] = None) -> None:
+        self.position = position if position else BitboardPosition.from_grid(self.board)
+        self.side_to_move = 1
+        self.start_move_number = 1
+        self._board_key = board_key(self.position)
+        self._undo_stack = []
+
+
+    @property
+    def move_number(self) -> int:
+        '''Number of the move to be played next, counting plies of both players from start_move_number'''
+        return self.start_move_number + len(self._undo_stack)
+
+
+    @property
+    def key(self) -> int:
+        '''
+        Zobrist key of the current position: pieces on the board, both hands and the side to move
+        '''
+        key = self._board_key ^ self._our_player.hand_key ^ self._opponent_player.hand_key
+        return key ^ SIDE_KEY if self.side_to_move == -1 else key
+
+
+    def _get_position(self, board) -> BitboardPosition:
+        '''
+        Bitboard view of `board`, either a 9x9 grid or an already built BitboardPosition.
+        Our own grid reuses self.position, which make_move keeps in sync with it.
+        '''
+        if isinstance(board, BitboardPosition):
+            return board
+        if board is self.board:
+            return self.position
+        return BitboardPosition.from_grid(board)
+
+
+    def probe_cache(self, board, salt: int) -> Tuple[Optional[int], Any]:
+        '''
+        Look up a result about `board` in the transposition table.
+        Only our own grid has a Zobrist key, so any other board gets (None, None).
+        '''
+        if board is not self.board:
+            return None, None
+
+        cache_key = self.key ^ salt
+        return cache_key, self.tt.probe(cache_key)
+
+
+    def _new_piece(self, piece_name: str, team: int, promoted: bool = False) -> ShogiPiece:
+        if team == 1:
+            return self.PIECES[piece_name.upper()](piece_name.lower(), team, promoted)
+        return self.PIECES[piece_name.upper()](piece_name.upper(), team, promoted)
+
+
+    def _piece_from_code(self, code: int) -> ShogiPiece:
+        return self._new_piece(PIECE_LETTERS[abs(code) & ~PROMOTED], 1 if code > 0 else -1, bool(abs(code) & PROMOTED))
+
+
+    def compact_state(self) -> CompactState:
+        '''
+        The position as a small tuple of ints, cheap to pickle and send to another process
+        '''
+        players = self.players
+        return tuple(self.position.squares), tuple(players[1].captured.counts), tuple(players[-1].captured.counts), self.side_to_move
+
+
+    def load_compact_state(self, state: CompactState) -> None:
+        '''
+        Replace the position with one from compact_state(), the players keep their names
+        '''
+        squares, our_hand, opponent_hand, side_to_move = state
+        self.board = [[self._piece_from_code(code) if code else None for code in squares[r * 9:r * 9 + 9]] for r in range(9)]
+
+        for player in (self._our_player, self._opponent_player):
+            counts = our_hand if player.team == 1 else opponent_hand
+            player.captured = [hand_letter(ptype, player.team) for ptype, count in enumerate(counts) for _ in range(count)]
+
+        position = BitboardPosition()
+        for sq, code in enumerate(squares):
+            if code:
+                position.put_code(sq, code)
+
+        self._reset_position(position)
+        self.side_to_move = side_to_move
+
+
+    def set_sfen(self, sfen: str) -> None:
+        '''
+        Load a SFEN position: board, both hands, side to move and move number
+        '''
+        squares, hands, side_to_move, move_number = parse_sfen(sfen)
+        self.load_compact_state((squares, tuple(hands[1]), tuple(hands[-1]), side_to_move))
+        self.start_move_number = move_number
+
+
+    def to_sfen(self) -> str:
+        squares, our_hand, opponent_hand, side_to_move = self.compact_state()
+        return to_sfen(squares, {1: our_hand, -1: opponent_hand}, side_to_move, self.move_number)
+
+
+    def clone(self) -> 'ShogiBoard':
+        '''
+        Independent copy of the position: the grid rows are copied (pieces are shared flyweights),
+        the bitboards and both players' hands are copied and the cache table is shared.
+        The copy starts with an empty undo stack and has its own player objects.
+        '''
+        board = ShogiBoard.__new__(ShogiBoard)
+        board.board = [row[:] for row in self.board]
+        board._our_player = copy.copy(self._our_player)
+        board._our_player.captured = self._our_player.captured
+        board._opponent_player = copy.copy(self._opponent_player)
+        board._opponent_player.captured = self._opponent_player.captured
+        board.tt = self.tt
+
+        board.position = self.position.copy()
+        board.side_to_move = self.side_to_move
+        board.start_move_number = self.move_number
+        board._board_key = self._board_key
+        board._undo_stack = []
+        return board
 
 
     def _has_piece(self, board, position: Tuple[int, int]) -> bool:
@@ -113,7 +256,7 @@ class ShogiBoard:
         return True if board[r][c] else False
     
     
-    def execute_move(self, move_command: str, player: ShogiPlayer) -> None:
+    def execute_move(self, move_command: Union[str, int], player: ShogiPlayer) -> None:
         '''
         實際的移動步
 
@@ -122,272 +265,255 @@ class ShogiBoard:
 
         Drops are written as a piece letter in upper case
         Drop ex: P*d4 or R*g5
+
+        An integer move from src.move is accepted as well.
         '''
-        board = copy.deepcopy(self.board)
+        move = string_to_move(move_command) if isinstance(move_command, str) else move_command
 
-        if move_command[1] != '*':
-            src_r, src_c, _ = parse_string_to_pos(move_command[:2])
-            dst_r, dst_c, is_promoted = parse_string_to_pos(move_command[2:])
+        dst_sq = move_dst(move)
+        dst_r, dst_c = divmod(dst_sq, 9)
+        drop_ptype = drop_type(move)
 
-            # Execute move
-            if not self._has_piece(board, (src_r, src_c)):
+        if not drop_ptype:
+            src_sq = move_src(move)
+            src_r, src_c = divmod(src_sq, 9)
+
+            if not self._has_piece(self.board, (src_r, src_c)):
                 raise Exception("No piece in the position!")
-            obj_piece = board[src_r][src_c]
             
-            if obj_piece.team != player.team:
+            if self.board[src_r][src_c].team != player.team:
                 raise Exception("You can't move opponent pieces!")
-            
-            valid_moves = obj_piece.get_valid_moves((src_r, src_c), board)
 
-            if move_command not in valid_moves:
+            # Promotions outside the zone or of promoted pieces are never generated
+            if move not in self.position.piece_moves(src_sq):
                 raise Exception("This move is invalid!")
-            elif board[dst_r][dst_c] and board[dst_r][dst_c].team == -player.team:
-                player.capture(board[dst_r][dst_c])
-            
-            # Promote!
-            if is_promoted:
-                if obj_piece.promoted or (player.team == 1 and dst_r not in self.OUR_PROMOTION_ZONE) or (player.team == -1 and dst_r not in self.OPPONENT_PROMOTION_ZONE):
-                    raise Exception("This move can't promote!")
-                obj_piece.promoted = True
-            
-            board[src_r][src_c] = None
-            board[dst_r][dst_c] = obj_piece
         else:
-            piece_name, _ = move_command[:2]
-            dst_r, dst_c, _ = parse_string_to_pos(move_command[2:])  # Drop piece hasn't promotion.
+            piece_name = hand_letter(drop_ptype, player.team)
 
             # Check the pos and piece could drop?
-            if not self._can_drop_piece(board, piece_name, (dst_r, dst_c), player):
+            if not self._can_drop_piece(self.position, piece_name, (dst_r, dst_c), player):
                 raise Exception("Can't drop to the position!")
-            
-            if player.team == 1:
-                obj_piece = self.PIECES[piece_name.upper()](piece_name.lower(), player.team)
-            else:
-                obj_piece = self.PIECES[piece_name.upper()](piece_name.upper(), player.team)
 
-            player.drop(piece_name)
-            board[dst_r][dst_c] = obj_piece
+            if piece_name not in player.captured:
+                raise Exception("You don't have this piece!")
+
+        # 不能讓自己的王將/玉將留在被將軍的狀態
+        moves, drops = self.get_all_valid_moves_and_drops(self.board, player)
+        if move not in moves and move not in drops:
+            raise Exception("Your king would be in check!")
+
+        self.make_move(move, player)
+
 
-        self.board = board
+    def make_move(self, move: int, player: ShogiPlayer) -> None:
+        '''
+        Play a move in place without validating it and push an undo entry:
+        the moved piece, the captured piece, the position codes needed to restore both,
+        and the Zobrist board key and side to move from before the move.
+        '''
+        dst_sq = move_dst(move)
+        dst_r, dst_c = divmod(dst_sq, 9)
+        drop_ptype = drop_type(move)
+        undo_state = (self._board_key, self.side_to_move)
+        self.side_to_move = -player.team
+
+        if drop_ptype:
+            piece_name = hand_letter(drop_ptype, player.team)
+
+            player.drop(piece_name)
+            self.board[dst_r][dst_c] = self._new_piece(piece_name, player.team)
+            self.position.put(dst_sq, drop_ptype, player.team)
+            self._board_key ^= PIECE_KEYS[self.position.squares[dst_sq]][dst_sq]
+            self._undo_stack.append((move, player, None, None, 0, 0, undo_state))
+            return
+
+        src_sq = move_src(move)
+        src_r, src_c = divmod(src_sq, 9)
+        obj_piece = self.board[src_r][src_c]
+        captured_piece = self.board[dst_r][dst_c]
+        code = self.position.squares[src_sq]
+
+        if captured_piece:
+            player.capture(captured_piece)
+
+        # Promote! 換成升變後的棋子，原本的棋子留給 unmake_move 復原
+        moved_piece = obj_piece.promote() if is_promotion(move) else obj_piece
+
+        self.board[src_r][src_c] = None
+        self.board[dst_r][dst_c] = moved_piece
+        captured_code = self.position.move(src_sq, dst_sq, is_promotion(move))
+        self._board_key ^= PIECE_KEYS[code][src_sq] ^ PIECE_KEYS[self.position.squares[dst_sq]][dst_sq]
+        if captured_code:
+            self._board_key ^= PIECE_KEYS[captured_code][dst_sq]
+        self._undo_stack.append((move, player, obj_piece, captured_piece, code, captured_code, undo_state))
+
+
+    def unmake_move(self) -> None:
+        '''
+        Take back the last move played by make_move (or execute_move)
+        '''
+        move, player, obj_piece, captured_piece, code, captured_code, undo_state = self._undo_stack.pop()
+        self._board_key, self.side_to_move = undo_state
+        dst_sq = move_dst(move)
+        dst_r, dst_c = divmod(dst_sq, 9)
+
+        if not obj_piece:
+            self.board[dst_r][dst_c] = None
+            self.position.remove(dst_sq)
+            player.undo_drop(hand_letter(drop_type(move), player.team))
+            return
+
+        src_sq = move_src(move)
+        src_r, src_c = divmod(src_sq, 9)
+
+        self.board[src_r][src_c] = obj_piece
+        self.board[dst_r][dst_c] = captured_piece
+        self.position.undo_move(src_sq, dst_sq, code, captured_code)
+
+        if captured_piece:
+            player.undo_capture(captured_piece)
         
 
+    def get_king_pos(self, team: int) -> Tuple[int, int]:
+        '''
+        王將/玉將目前的位置，由 make_move 持續更新，(-1, -1) 代表已經被吃掉了
+        '''
+        king_sq = self.position.kings[team]
+        return divmod(king_sq, 9) if king_sq >= 0 else (-1, -1)
+
+
+    def get_piece_positions(self, team: int) -> List[Tuple[int, int]]:
+        '''
+        該隊所有棋子的位置，由 make_move 持續更新
+        '''
+        return [divmod(sq, 9) for sq in sorted(self.position.piece_squares[team])]
+
+
     def _find_both_king_pos(self, board: List[List[str]]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
         '''
         找尋目前王將/玉將的位置
         如果是 (-1, -1) 代表有一方的王將/玉將已經被吃掉了
         '''
-        our_king_pos, opponent_king_pos = (-1, -1), (-1, -1)
-        
-        for r, row in enumerate(board):
-            for c, cell in enumerate(row):
-                if cell and cell.name == 'k':
-                    our_king_pos = (r, c)
-                elif cell and cell.name == 'K':
-                    opponent_king_pos = (r, c)
+        if board is self.board:
+            return self.get_king_pos(1), self.get_king_pos(-1)
+
+        position = self._get_position(board)
+        our_king_sq, opponent_king_sq = position.king_square(1), position.king_square(-1)
+
+        our_king_pos = divmod(our_king_sq, 9) if our_king_sq >= 0 else (-1, -1)
+        opponent_king_pos = divmod(opponent_king_sq, 9) if opponent_king_sq >= 0 else (-1, -1)
 
         return our_king_pos, opponent_king_pos
 
 
     def _can_drop_piece(self, board: List[List[str]], piece_name: str, drop_pos: Tuple[int, int], player: ShogiPlayer, is_check_last_rule: bool = True) -> bool:
-        # 1. 檢查是否可以在指定位置打入棋子
+        position = self._get_position(board)
         drop_r, drop_c = drop_pos
-        if self._has_piece(board, (drop_r, drop_c)):
-            return False
+        drop_sq = drop_r * 9 + drop_c
+        ptype = PIECE_TYPES[piece_name.upper()]
 
+        # 1. 檢查是否可以在指定位置打入棋子
         # 2. 禁止打入無法移動的棋子
-        if piece_name in self.KINGHT_LANCE_PIECE_NAME:  # 檢查桂馬與香車
-            if (player.team == 1 and drop_r in self.OUR_NL_DROP_FORBIDDEN_ZONE) or (player.team == -1 and drop_r in self.OPPONENT_NL_DROP_FORBIDDEN_ZONE):
-                return False
-        elif piece_name in self.PAWN_PIECE_NAME:  # 檢查步兵
-            if (player.team == 1 and drop_r == self.OUR_P_DROP_FORBIDDEN_ZONE) or (player.team == -1 and drop_r == self.OPPONENT_P_DROP_FORBIDDEN_ZONE):
-                return False
-
-        if piece_name in self.PAWN_PIECE_NAME:
-            # 3. 二步規則
-            if (player.team == 1 and any(str(board[rol][drop_c]) == 'p' for rol in range(9))) or (player.team == -1 and any(str(board[rol][drop_c]) == 'P' for rol in range(9))):
-                return False
-            
-            # 4. 打步詰規則
-            if is_check_last_rule:
-                if player.team == 1:
-                    obj_piece = self.PIECES[piece_name.upper()](piece_name.lower(), player.team)
-                else:
-                    obj_piece = self.PIECES[piece_name.upper()](piece_name.upper(), player.team)
-
-                board[drop_r][drop_c] = obj_piece
+        # 3. 二步規則
+        if not position.drop_targets(ptype, player.team) & SQUARE_BB[drop_sq]:
+            return False
 
-                # 如果打入後，王將/玉將會被將死，則不可打入
-                if len(self.get_all_king_evade_moves(board, player)) == 0:
-                    return False
+        # 4. 打步詰規則
+        if is_check_last_rule and ptype == PAWN:
+            return self._has_evade_moves_after_drop(position, ptype, drop_sq, player)
 
         return True
 
 
-    def is_in_check(self, board: List[List[str]], player: ShogiPlayer) -> bool:
+    def _has_evade_moves_after_drop(self, position: BitboardPosition, ptype: int, drop_sq: int, player: ShogiPlayer) -> bool:
         '''
-        檢查王將/玉將是否被將軍
+        如果打入後，對方的王將/玉將會被將死，則不可打入 (打步詰)
         '''
-        all_opponent_pieces_name = self.OPPONENT_PIECES_NAME if player.team == 1 else self.OUR_PIECES_NAME
-        all_opponent_moves = []
+        opponent = self.players[-player.team]
+        position.put(drop_sq, ptype, player.team)
+        has_evade_moves = not is_checkmate(position, opponent.team, opponent.captured.counts)
+        position.remove(drop_sq)
 
-        for r, row in enumerate(board):
-            for c, cell in enumerate(row):
-                if cell and (cell.name in all_opponent_pieces_name):
-                    valid_moves = cell.get_valid_moves((r, c), board)
-                    all_opponent_moves.extend(valid_moves)
-
-        king_r, king_c = self._find_both_king_pos(board)[0] if player.team == 1 else self._find_both_king_pos(board)[1]
-        if (king_r, king_c) == (-1, -1):
-            return False
-        
-        king = board[king_r][king_c]
-        king_valid_moves = king.get_valid_moves((king_r, king_c), board)
-        king_src_pos = king_valid_moves[-1][:2]  # 隨機取一個移動步，然後取前半段，即為當前位置(src)的 notation
-        all_opponent_dst = [move[2:4] for move in all_opponent_moves]  # 取 dst 且不取升變步的 notation
+        return has_evade_moves
 
-        return king_src_pos in set(all_opponent_dst)
-    
 
-    def _get_king_evade_moves(self, board: List[List[str]], player: ShogiPlayer) -> Set[str]:
+    def is_square_attacked(self, square: Tuple[int, int], by_team: int, board: Optional[List[List[str]]] = None) -> bool:
         '''
-        得到王將/玉將不會被將軍的移動走步
+        檢查某一格是否被 by_team 的棋子攻擊 (預設為目前盤面)
         '''
-        all_opponent_pieces_name = self.OPPONENT_PIECES_NAME if player.team == 1 else self.OUR_PIECES_NAME
-        all_opponent_moves = []
-
-        for r, row in enumerate(board):
-            for c, cell in enumerate(row):
-                if cell and (cell.name in all_opponent_pieces_name):
-                    valid_moves = cell.get_valid_moves((r, c), board)
-                    all_opponent_moves.extend(valid_moves)
-        
-        king_r, king_c = self._find_both_king_pos(board)[0] if player.team == 1 else self._find_both_king_pos(board)[1]
-        if (king_r, king_c) == (-1, -1):
-            return False
-        
-        king = board[king_r][king_c]
-        king_valid_moves = king.get_valid_moves((king_r, king_c), board)
-        king_src_pos = king_valid_moves[-1][:2]  # 隨機取一個移動步，然後取前半段，即為當前位置(src)的 notation
-        all_king_dst = [king_src_pos] + [move[2:] for move in king_valid_moves]
-        all_opponent_dst = [move[2:4] for move in all_opponent_moves]  # 取所有 dst 且不取升變步的 notation
-        king_safe_pos = list(set(all_king_dst) - set(all_opponent_dst))
-
-        king_evade_moves = set([king_src_pos + king_dst_pos for king_dst_pos in king_safe_pos])  # concate back to king evade move
-        return king_evade_moves
+        r, c = square
+        position = self.position if board is None else self._get_position(board)
+        return position.is_attacked(r * 9 + c, by_team)
 
 
-    def _get_piece_evade_moves(self, board: List[List[str]], player: ShogiPlayer) -> Set[str]:
+    def is_in_check(self, board: List[List[str]], player: ShogiPlayer) -> bool:
         '''
-        檢查一般棋子移動後是否仍然被將軍，如果王將不再被將軍，則該移動是一個有效的閃避走步
+        檢查王將/玉將是否被將軍
         '''
-        piece_evade_moves = []
-        all_our_moves = []
-        all_our_pieces_name = self.OUR_PIECES_NAME if player.team == 1 else self.OPPONENT_PIECES_NAME
+        cache_key, cached = self.probe_cache(board, CHECK_KEYS[player.team])
+        if cached is not None:
+            return cached
 
-        for src_r, row in enumerate(board):
-            for src_c, cell in enumerate(row):
-                if cell and (cell.name in all_our_pieces_name):
-                    valid_moves = cell.get_valid_moves((src_r, src_c), board)
-                    all_our_moves.extend(valid_moves)
+        position = self._get_position(board)
 
-        for move in all_our_moves:
-            src_r, src_c, _ = parse_string_to_pos(move[:2])
-            dst_r, dst_c, is_promoted = parse_string_to_pos(move[2:])
-
-            # 先移動看看
-            piece = board[src_r][src_c]
-            temp = board[dst_r][dst_c]
-            if is_promoted:
-                piece.promoted = True
-            board[src_r][src_c] = None
-            board[dst_r][dst_c] = piece
-
-            # 王將/玉將的位置
-            our_king_pos, opponent_king_pos = self._find_both_king_pos(board)
-
-            if our_king_pos != (-1, -1) and opponent_king_pos != (-1, -1) and not self.is_in_check(board, player):  # 王將/玉將存在，且王將/玉將是否仍然被將軍
-                piece_evade_moves.append(move)
-
-            # 檢查後盤面需復原
-            piece = board[dst_r][dst_c]
-            if is_promoted:
-                piece.promoted = False
-            board[dst_r][dst_c] = temp
-            board[src_r][src_c] = piece
-
-        return set(piece_evade_moves)
+        king_sq = position.king_square(player.team)
+        is_check = king_sq >= 0 and position.is_attacked(king_sq, -player.team)
 
+        if cache_key is not None:
+            self.tt.store(cache_key, is_check)
+        return is_check
+    
 
-    def _get_drop_evade_moves(self, board: List[List[str]], player: ShogiPlayer) -> Set[str]:
+    def is_checkmate(self, board: List[List[str]], player: ShogiPlayer) -> bool:
         '''
-        檢查一般棋子打入後是否仍然被將軍，如果王將不再被將軍，則該移動是一個有效的打躲避走步
+        檢查王將/玉將是否被將死 (被將軍且無法應將)
         '''
-        all_evade_drops = []
-        all_our_captured = player.captured
-        all_empty_cells = self._get_all_empty_cells()
-
-        for piece_name in all_our_captured:
-            for drop_pos in all_empty_cells:
-                dst_r, dst_c = drop_pos
+        return is_checkmate(self._get_position(board), player.team, player.captured.counts)
 
-                # 打入，這邊只需檢查前三個規則
-                if self._can_drop_piece(board, piece_name, drop_pos, player, is_check_last_rule=False):
-                    board[dst_r][dst_c] = self.PIECES[piece_name.upper()](piece_name, player.team)
-
-                if not self.is_in_check(board, player):  # 檢查打入後，王將是否仍然被將軍
-                    move = parse_drop_to_string(piece_name, drop_pos)
-                    all_evade_drops.append(move)
-
-                # 檢查後盤面需復原
-                board[dst_r][dst_c] = None
-
-        return set(all_evade_drops)
-    
 
     def _get_all_empty_cells(self) -> List[Tuple[int, int]]:
         """
         Get all empty cells on the board
         """
-        all_empty_cells = []
+        return [divmod(sq, 9) for sq in iter_squares(~self.position.occupied & FULL_BB)]
 
-        for r, row in enumerate(self.board):
-            for c, cell in enumerate(row):
-                if not cell:
-                    all_empty_cells.append((r, c))
 
-        return all_empty_cells
-
-
-    def get_all_king_evade_moves(self, board: List[List[str]], player: ShogiPlayer) -> Set[str]:
+    def get_all_king_evade_moves(self, board: List[List[str]], player: ShogiPlayer) -> Set[int]:
         """
-        Get all king evade moves
+        Get all king evade moves: the legal moves and drops, which under check are only king moves,
+        captures of the checker and interpositions. Not being in check, every legal move qualifies.
         """
-        king_evade_moves = self._get_king_evade_moves(board, player)
-        king_evade_moves &= self._get_piece_evade_moves(board, player)
-        king_evade_moves |= self._get_drop_evade_moves(board, player)
-
-        return king_evade_moves
+        moves, drops = self.get_all_valid_moves_and_drops(board, player)
+        return moves | drops
     
 
     # 列出該玩家所有的合法走步與合法打入
-    def get_all_valid_moves_and_drops(self, board: List[List[str]], player: ShogiPlayer) -> Tuple[Set[str], Set[str]]:
-        all_valid_moves = set()
-        all_valid_drops = set()
-        all_our_pieces_name = self.OUR_PIECES_NAME if player.team == 1 else self.OPPONENT_PIECES_NAME
-
-        for r, row in enumerate(board):
-            for c, cell in enumerate(row):
-                if cell and cell.name in all_our_pieces_name:
-                    valid_moves = cell.get_valid_moves((r, c), board)
-                    all_valid_moves |= set(valid_moves)
-
-        all_empty_cells = self._get_all_empty_cells()
-        all_our_captured = player.captured
-
-        for piece_name in all_our_captured:
-            for drop_pos in all_empty_cells:
-                if self._can_drop_piece(board, piece_name, drop_pos, player):
-                    move = parse_drop_to_string(piece_name, drop_pos)
-                    all_valid_drops.add(move)
-
-        return all_valid_moves, all_valid_drops
\ No newline at end of file
+    def get_all_valid_moves_and_drops(self, board: List[List[str]], player: ShogiPlayer) -> Tuple[Set[int], Set[int]]:
+        cache_key, cached = self.probe_cache(board, MOVES_KEYS[player.team])
+        if cached is not None:
+            # 走步與打入一起排序存成 array，打入的編碼都比走步大
+            split = bisect_left(cached, 1 << DROP_SHIFT)
+            return set(cached[:split]), set(cached[split:])
+
+        position = self._get_position(board)
+        all_valid_moves = set(position.generate_legal_moves(player.team))
+        all_valid_drops = set(self.iter_valid_drops(position, player))
+
+        if cache_key is not None:
+            self.tt.store(cache_key, array('i', sorted(all_valid_moves | all_valid_drops)))
+        return all_valid_moves, all_valid_drops
+
+
+    def iter_valid_drops(self, position: BitboardPosition, player: ShogiPlayer) -> Iterator[int]:
+        '''
+        Legal drops of the player, one piece type after the other, generated only as far as they are consumed
+        '''
+        # 被將軍時只能打在將軍的路線上 (雙王手時不能打入)
+        evasion_targets = position.evasion_targets(player.team)
+
+        for ptype in player.captured.piece_types():
+            for drop_sq in iter_squares(position.drop_targets(ptype, player.team) & evasion_targets):
+                if ptype == PAWN and not self._has_evade_moves_after_drop(position, ptype, drop_sq, player):
+                    continue
+
+                yield make_drop(ptype, drop_sq)
@@ -0,0 +1,324 @@
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from src.board import ShogiBoard
+from src.player import ShogiPlayer
+from src.move import move_to_string
+from src.values import PIECE_VALUES
+from src.movepicker import MovePicker
+from src.transposition import TranspositionTable
+from src.mate import MateSolver
+
+MATE_SCORE = 100000
+INFINITE = MATE_SCORE + 1
+
+# Bound stored with a search score in the transposition table
+EXACT, LOWER, UPPER = 0, 1, 2
+
+CHECK_EVERY = 1024  # Nodes between two looks at the clock
+MATE_SEARCH_LENGTH = 7  # Longest mate, in attacker moves, looked for by the root mate search
+
+
+class SearchResult(NamedTuple):
+    move: Optional[int]
+    score: int
+    depth: int
+    nodes: int
+    pv: List[int]
+    seconds: float
+
+
+class SearchTimeout(Exception):
+    '''Raised inside a search once its time or node budget is used up'''
+
+
+# Mate scores count plies from the root, the table keeps them relative to the stored position
+def _score_to_tt(score: int, ply: int) -> int:
+    if score >= MATE_SCORE - 1000:
+        return score + ply
+    if score <= -MATE_SCORE + 1000:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE_SCORE - 1000:
+        return score - ply
+    if score <= -MATE_SCORE + 1000:
+        return score + ply
+    return score
+
+
+class ShogiEngine:
+    '''
+    Negamax alpha-beta search over a ShogiBoard, played in place with make_move/unmake_move.
+
+    Iterative deepening: each depth is searched with an aspiration window around the score
+    of the previous one and the best move found so far is searched first, then the moves
+    come from a staged MovePicker. The search stops
+    once `time_limit` seconds or `node_limit` nodes are used up, or stop() is called from another
+    thread, and returns the result of the deepest completed iteration. Leaves are resolved with
+    a captures-only quiescence search. With mate_nodes > 0, a df-pn mate search (src.mate) of
+    up to that many nodes runs first and a mate it proves is played straight away.
+    '''
+    def __init__(self, board: ShogiBoard, max_depth: int = 64, time_limit: Optional[float] = 1.0,
+                 node_limit: Optional[int] = None, aspiration_window: int = 50, tt_memory_mb: float = 16,
+                 mate_nodes: int = 0) -> None:
+        self.board = board
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.aspiration_window = aspiration_window
+        self.mate_nodes = mate_nodes
+        self.tt = TranspositionTable(tt_memory_mb)  # (score, bound, best move) per searched position
+        self.nodes = 0
+        self.stop_requested = False  # 由 stop() 設定，下一次搜尋前由呼叫者清除
+        self._deadline = None
+        self._soft_deadline = None  # 超過之後不再開始新的一層
+        self._clock = threading.Lock()
+        self._players = {}
+
+
+    def stop(self) -> None:
+        '''Make a running search return its best result as soon as possible, safe from any thread'''
+        self.stop_requested = True
+
+
+    def limit_time(self, time_limit: Optional[float]) -> None:
+        '''
+        Give the running search, or the next one, time_limit seconds from now, None for no limit.
+        Safe from any thread, used to put a clock on a search that started without one.
+        '''
+        with self._clock:
+            self.time_limit = time_limit
+            self._start_clock()
+
+
+    def _start_clock(self) -> None:
+        now = time.perf_counter()
+        self._deadline = now + self.time_limit if self.time_limit is not None else None
+        self._soft_deadline = now + self.time_limit / 2 if self.time_limit is not None else None
+
+
+    def evaluate(self, team: int) -> int:
+        '''Material balance from the point of view of `team`, pieces in hand included'''
+        position = self.board.position
+        score = 0
+
+        for sign in (1, -1):
+            material = sum(PIECE_VALUES[abs(position.squares[sq])] for sq in position.piece_squares[sign])
+            hand = self._players[sign].captured.counts
+            material += sum(PIECE_VALUES[ptype] * count for ptype, count in enumerate(hand) if count)
+            score += sign * material
+
+        return score * team
+
+
+    def _count_node(self) -> None:
+        self.nodes += 1
+        if self.stop_requested:
+            raise SearchTimeout()
+        if self.nodes % CHECK_EVERY == 0:
+            if self._deadline is not None and time.perf_counter() >= self._deadline:
+                raise SearchTimeout()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+
+
+    def quiescence(self, player: ShogiPlayer, opponent: ShogiPlayer, alpha: int, beta: int) -> int:
+        '''Stand pat on the material balance or keep resolving captures'''
+        self._count_node()
+
+        stand_pat = self.evaluate(player.team)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        for move in MovePicker(self.board, player, captures_only=True):
+            self.board.make_move(move, player)
+            try:
+                score = -self.quiescence(opponent, player, -beta, -alpha)
+            finally:
+                self.board.unmake_move()
+
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+
+        return alpha
+
+
+    def negamax(self, player: ShogiPlayer, opponent: ShogiPlayer, depth: int, alpha: int, beta: int, ply: int, pv: List[int]) -> int:
+        '''
+        Score of the position for `player` searched `depth` plies deep, the best line is written into pv
+        '''
+        pv.clear()
+        if depth <= 0:
+            return self.quiescence(player, opponent, alpha, beta)
+
+        self._count_node()
+        key = self.board.key
+        entry = self.tt.probe(key)
+        tt_move = None
+
+        if entry is not None:
+            score, bound, tt_move = entry
+            score = _score_from_tt(score, ply)
+            if ply > 0 and self.tt.probe_depth(key) >= depth:
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    pv[:] = [tt_move] if tt_move is not None else []
+                    return score
+
+        original_alpha = alpha
+        best_score, best_move = -INFINITE, None
+
+        # 走法分階段產生，截斷之後剩下的 (通常是打入) 就不用產生了
+        for move in MovePicker(self.board, player, tt_move):
+            child_pv = []
+            self.board.make_move(move, player)
+            try:
+                score = -self.negamax(opponent, player, depth - 1, -beta, -alpha, ply + 1, child_pv)
+            finally:
+                self.board.unmake_move()
+
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    pv[:] = [move] + child_pv
+            if alpha >= beta:
+                break
+
+        # 沒有合法走步就是被將死了 (越快將死分數越高)
+        if best_move is None:
+            return -MATE_SCORE + ply
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(key, (_score_to_tt(best_score, ply), bound, best_move), depth)
+
+        return best_score
+
+
+    def search_depth(self, player: ShogiPlayer, opponent: ShogiPlayer, depth: int, time_limit: Optional[float] = None,
+                     deadline: Optional[float] = None, alpha: int = -INFINITE, beta: int = INFINITE) -> Tuple[int, List[int]]:
+        '''
+        (score, principal variation) of a single search `depth` plies deep within the window (alpha, beta).
+        Raises SearchTimeout if time_limit seconds run out, the time.time() `deadline` passes (it can
+        come from another process) or the engine's node_limit is reached first.
+        '''
+        now = time.perf_counter()
+        limits = []
+        if time_limit is not None:
+            limits.append(now + time_limit)
+        if deadline is not None:
+            limits.append(now + deadline - time.time())
+        self._deadline = min(limits) if limits else None
+        self._players = {player.team: player, opponent.team: opponent}
+        if self._deadline is not None and now >= self._deadline:
+            raise SearchTimeout()
+
+        pv = []
+        score = self.negamax(player, opponent, depth, alpha, beta, 0, pv)
+        return score, pv
+
+
+    def _search_root(self, player: ShogiPlayer, opponent: ShogiPlayer, depth: int, previous_score: Optional[int]):
+        '''One iteration, widening the aspiration window until the score falls inside it'''
+        window = self.aspiration_window
+        if previous_score is None or depth < 2 or abs(previous_score) >= MATE_SCORE - self.max_depth:
+            alpha, beta = -INFINITE, INFINITE
+        else:
+            alpha, beta = previous_score - window, previous_score + window
+
+        while True:
+            pv = []
+            score = self.negamax(player, opponent, depth, alpha, beta, 0, pv)
+
+            if score <= alpha and alpha > -INFINITE:
+                alpha = max(-INFINITE, alpha - window * 4)
+            elif score >= beta and beta < INFINITE:
+                beta = min(INFINITE, beta + window * 4)
+            else:
+                return score, pv
+            window *= 4
+
+
+    def search(self, player: ShogiPlayer, opponent: ShogiPlayer,
+               on_iteration: Optional[Callable[[SearchResult], None]] = None) -> SearchResult:
+        '''
+        Best move and principal variation for `player`, who is to move on self.board.
+        on_iteration is called with the result of every completed iteration.
+        '''
+        start = time.perf_counter()
+        with self._clock:
+            self._start_clock()
+        self.nodes = 0
+        self._players = {player.team: player, opponent.team: opponent}
+        self.tt.new_generation()
+
+        result = SearchResult(None, 0, 0, 0, [], 0.0)
+        # 保證至少有一步可以下
+        first_move = next(iter(MovePicker(self.board, player)), None)
+        if first_move is None:
+            return result._replace(score=-MATE_SCORE)
+        result = result._replace(move=first_move)
+
+        if self.mate_nodes:
+            solver = MateSolver(self.board, self.mate_nodes)
+            line = solver.solve(player, opponent, MATE_SEARCH_LENGTH)
+            if line:
+                result = SearchResult(line[0], MATE_SCORE - len(line), len(line), solver.nodes, line, time.perf_counter() - start)
+                if on_iteration is not None:
+                    on_iteration(result)
+                return result
+
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, pv = self._search_root(player, opponent, depth, result.score if result.depth else None)
+            except SearchTimeout:
+                break
+
+            elapsed = time.perf_counter() - start
+            result = SearchResult(pv[0] if pv else result.move, score, depth, self.nodes, pv, elapsed)
+            if on_iteration is not None:
+                on_iteration(result)
+
+            # 已經找到將死，或是剩下的時間不太可能再完成一層
+            if abs(score) >= MATE_SCORE - depth:
+                break
+            soft_deadline = self._soft_deadline
+            if soft_deadline is not None and time.perf_counter() > soft_deadline:
+                break
+
+        return result._replace(nodes=self.nodes, seconds=time.perf_counter() - start)
+
+
+class EnginePlayer(ShogiPlayer):
+    '''
+    A ShogiPlayer whose moves are chosen by a ShogiEngine, seated in ShogiGame like any player
+    '''
+    def __init__(self, name, team: int, time_limit: Optional[float] = 1.0, node_limit: Optional[int] = None,
+                 max_depth: int = 64, captured: Optional[List[str]] = None) -> None:
+        super().__init__(name, team, captured)
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.engine = None
+        self.last_result = None
+
+
+    def get_move(self, board: ShogiBoard, opponent: ShogiPlayer) -> str:
+        '''Search the board and return the chosen move in notation'''
+        if self.engine is None or self.engine.board is not board:
+            self.engine = ShogiEngine(board, self.max_depth, self.time_limit, self.node_limit)
+
+        self.last_result = self.engine.search(self, opponent)
+        if self.last_result.move is None:
+            raise Exception("No legal move!")
+        return move_to_string(self.last_result.move, self.team)
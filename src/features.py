@@ -0,0 +1,165 @@
+from typing import Iterator, Optional
+
+from src.utils import PAWN, ROOK, KING
+from src.bitboard import PROMOTED
+from src.move import make_move, make_drop, move_src, move_dst, is_promotion, drop_type
+from src.record import RecordReader
+
+try:
+    import numpy as np
+except ImportError:  # numpy 只有輸出特徵時才需要
+    np = None
+
+# NumPy feature planes of positions, for training evaluation models.
+#
+# planes  (N, PLANES, 9, 9) uint8  one plane per (team, piece type), then one promoted plane
+#                                  per team; squares as in ShogiBoard.board (row, column)
+# hands   (N, 2, 7) uint8          pieces in hand of team 1 and team -1, PAWN..ROOK
+# side    (N,) int8                side to move, 1 or -1
+# legal   (N, MOVE_SPACE) bool     optional legal-move mask, indexed by move_index()
+# moves   (N,) int32               index of the move played from the position, -1 if unknown
+# results (N,) int8                game result from the side to move's point of view
+#
+# Batches are allocated once and filled in place, one position per row.
+
+TEAMS = (1, -1)
+PIECE_PLANES = 2 * KING
+PLANES = PIECE_PLANES + 2
+HAND_TYPES = ROOK  # PAWN..ROOK, kings are never in hand
+
+CODE_OFFSET = 32  # Piece codes run from -24 to 24, shifted to index the lookup tables
+
+BOARD_MOVES = 81 * 81 * 2
+MOVE_SPACE = BOARD_MOVES + HAND_TYPES * 81
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("src.features requires numpy, pip install numpy")
+
+
+def move_index(move: int) -> int:
+    '''Index of a src.move integer in the legal-move mask'''
+    ptype = drop_type(move)
+    if ptype:
+        return BOARD_MOVES + (ptype - 1) * 81 + move_dst(move)
+    return (move_src(move) * 81 + move_dst(move)) * 2 + is_promotion(move)
+
+
+def index_to_move(index: int) -> int:
+    if index >= BOARD_MOVES:
+        ptype, dst = divmod(index - BOARD_MOVES, 81)
+        return make_drop(ptype + 1, dst)
+    squares, promoted = divmod(index, 2)
+    src, dst = divmod(squares, 81)
+    return make_move(src, dst, bool(promoted))
+
+
+def _code_tables():
+    '''Piece plane and promoted plane (-1 for none) per piece code, offset by CODE_OFFSET'''
+    piece_plane = np.full(2 * CODE_OFFSET, -1, dtype=np.int64)
+    promoted_plane = np.full(2 * CODE_OFFSET, -1, dtype=np.int64)
+    for team_idx, team in enumerate(TEAMS):
+        for ptype in range(PAWN, KING + 1):
+            for flag in (0, PROMOTED):
+                code = team * (ptype | flag) + CODE_OFFSET
+                piece_plane[code] = team_idx * KING + ptype - 1
+                if flag:
+                    promoted_plane[code] = PIECE_PLANES + team_idx
+    return piece_plane, promoted_plane
+
+
+_PIECE_PLANE, _PROMOTED_PLANE = _code_tables() if np is not None else (None, None)
+
+
+class FeatureBatch:
+    '''
+    Preallocated arrays for up to `capacity` positions, `size` of them filled
+    '''
+    def __init__(self, capacity: int, legal_masks: bool = False) -> None:
+        _require_numpy()
+        self.capacity = capacity
+        self.size = 0
+        self.planes = np.zeros((capacity, PLANES, 9, 9), dtype=np.uint8)
+        self.hands = np.zeros((capacity, 2, HAND_TYPES), dtype=np.uint8)
+        self.side = np.zeros(capacity, dtype=np.int8)
+        self.legal = np.zeros((capacity, MOVE_SPACE), dtype=bool) if legal_masks else None
+        self.moves = np.full(capacity, -1, dtype=np.int32)
+        self.results = np.zeros(capacity, dtype=np.int8)
+        self._flat_planes = self.planes.reshape(capacity, PLANES * 81)
+
+
+    def __len__(self) -> int:
+        return self.size
+
+
+    @property
+    def is_full(self) -> bool:
+        return self.size == self.capacity
+
+
+    def clear(self) -> None:
+        '''Empty the batch, only the rows that were filled are zeroed'''
+        rows = slice(0, self.size)
+        self.planes[rows] = 0
+        self.hands[rows] = 0
+        self.side[rows] = 0
+        if self.legal is not None:
+            self.legal[rows] = False
+        self.moves[rows] = -1
+        self.results[rows] = 0
+        self.size = 0
+
+
+    def add(self, board, move: Optional[int] = None, result: int = 0) -> int:
+        '''
+        Encode the position of `board` into the next row, with the move played from it and the
+        game result (1, -1 or 0 for team 1), returns the row
+        '''
+        if self.is_full:
+            raise Exception("Batch is full!")
+        row = self.size
+        position = board.position
+
+        codes = np.asarray(position.squares, dtype=np.int64) + CODE_OFFSET
+        occupied = np.flatnonzero(codes != CODE_OFFSET)
+        occupied_codes = codes[occupied]
+        flat = self._flat_planes[row]
+        flat[_PIECE_PLANE[occupied_codes] * 81 + occupied] = 1
+        promoted = _PROMOTED_PLANE[occupied_codes]
+        is_promoted = promoted >= 0
+        flat[promoted[is_promoted] * 81 + occupied[is_promoted]] = 1
+
+        players = board.players
+        for team_idx, team in enumerate(TEAMS):
+            self.hands[row, team_idx] = players[team].captured.counts[PAWN:ROOK + 1]
+
+        side = board.side_to_move
+        self.side[row] = side
+        if self.legal is not None:
+            moves, drops = board.get_all_valid_moves_and_drops(board.board, players[side])
+            self.legal[row, [move_index(legal_move) for legal_move in moves | drops]] = True
+        if move is not None:
+            self.moves[row] = move_index(move)
+        self.results[row] = result * side
+
+        self.size += 1
+        return row
+
+
+def iter_record_batches(reader: RecordReader, batch_size: int = 1024, legal_masks: bool = False) -> Iterator[FeatureBatch]:
+    '''
+    Encode every position of every game in `reader`, a full batch at a time, the last one
+    possibly partial. The same FeatureBatch is refilled for every batch: consume or copy it
+    before asking for the next one.
+    '''
+    batch = FeatureBatch(batch_size, legal_masks)
+    for idx in range(len(reader)):
+        result = reader[idx].result
+        for board, _, move in reader.positions(idx):
+            batch.add(board, move, result)
+            if batch.is_full:
+                yield batch
+                batch.clear()
+    if batch.size:
+        yield batch
@@ -0,0 +1,129 @@
+from typing import List, Optional, Union
+
+from src.player import ShogiPlayer
+from src.board import ShogiBoard
+from src.piece import *
+from src.move import string_to_move
+from src.gamestate import GameState
+from src.repetition import RepetitionHistory
+from src import instrument
+
+class ShogiGame:
+    def __init__(self, players: Optional[List[ShogiPlayer]] = None, tt_memory_mb: Optional[float] = 16) -> None:
+        '''
+        players: [team 1, team -1], defaults to two human players.
+        A player with get_move, ex: EnginePlayer or MCTSPlayer, picks its own moves.
+        tt_memory_mb: budget of the board's cache table, 0 or None to cache nothing
+        '''
+        self.players = players if players else [ShogiPlayer("Gojo Satoru", 1), ShogiPlayer("Geto Suguru", -1)]
+        self.board = ShogiBoard(self.players[0], self.players[1], tt_memory_mb)
+        self.state = GameState(self.board)  # 輪到的一方的將軍狀態，每步增量更新
+        self.history = RepetitionHistory(self.board.key)  # 千日手判定用的局面紀錄
+        self.current_player = self.players[0]
+        self.game_round = 0
+        self.stats = instrument.CallStats()  # 本局的呼叫次數與時間，需先 instrument.enable()
+
+
+    def play_move(self, move_command: Union[str, int], player: ShogiPlayer, validate: bool = True) -> None:
+        '''
+        Execute a move on self.board and update the game state and the position history
+        from that move alone. validate=False plays a move already known to be legal with
+        make_move, ex: one taken from get_all_valid_moves_and_drops.
+        '''
+        move = string_to_move(move_command) if isinstance(move_command, str) else move_command
+        is_synced = self.state.key == self.board.key
+        if self.history.key != self.board.key:
+            self.history.reset(self.board.key)
+
+        if validate:
+            self.board.execute_move(move, player)
+        else:
+            self.board.make_move(move, player)
+        if is_synced:
+            self.state.update(self.board, move)
+        else:
+            self.state.reset(self.board)
+        self.history.push(self.board.key, player.team, self.state.in_check)
+
+
+    def get_game_ended(self, board: List[List[str]], our_player: ShogiPlayer, opponent_player: ShogiPlayer) -> int:            
+        '''
+        Input:
+            board: 2D list of ShogiPiece objects
+            our_player: 1
+            opponent_player: -1
+
+        Returns:
+            result: 0 if game has not ended. 1 if player won, -1 if player lost,
+                    small non-zero value for draw.
+        '''
+        # 自己的盤面: 只有輪到的一方可能剛被將死，用增量更新的狀態判斷
+        if board is self.board.board:
+            if self.state.key != self.board.key:
+                self.state.reset(self.board)
+            if 'k' in opponent_player.captured:
+                return opponent_player.team
+            if 'K' in our_player.captured:
+                return our_player.team
+            side = our_player if our_player.team == self.state.side_to_move else opponent_player
+            if self.state.is_checkmated(self.board, side):
+                return -side.team
+            # 千日手: 和局 (DRAW) 或連續王手的一方輸
+            return self.history.result() if self.history.key == self.board.key else 0
+
+        result = 0
+
+        # 先檢查我方是否被將死
+        if 'k' in opponent_player.captured or self.board.is_checkmate(board, our_player):
+            result = opponent_player.team
+
+        # 再檢查敵方是否被將死
+        if 'K' in our_player.captured or self.board.is_checkmate(board, opponent_player):
+            result = our_player.team
+
+        return result
+
+
+    def play(self):
+        with instrument.collect() as self.stats:
+            self._play()
+
+
+    def _play(self):
+        while True:
+            self.current_player = self.players[self.game_round % 2]
+
+            print(f"Round: {self.game_round + 1}\nCurrent Player : {self.current_player.name}\n")
+            print(self.board)
+
+            if hasattr(self.current_player, 'get_move'):
+                input_move = self.current_player.get_move(self.board, self.players[(self.game_round + 1) % 2])
+                print(f"{self.current_player.name} move: {input_move}")
+            else:
+                input_move = input('Input your move: ').replace(" ", "")  # truncation all space
+
+            try:
+                self.play_move(input_move, self.current_player)
+                result = self.get_game_ended(self.board.board, self.players[0], self.players[1])
+
+                if result:
+                    # Game over
+                    winner = result
+                    # Final board
+                    print(self.board)
+
+                    if abs(winner) < 1:
+                        print("Draw by repetition (Sennichite)")
+                    elif winner == 1:
+                        print(f"Winner is {self.players[0].name}")
+                    else:
+                        print(f"Winner is {self.players[1].name}")
+
+                    break
+                
+                self.game_round += 1
+                print('-' * 35)
+            except Exception as e:
+                print(f"Error message: {e}")
+                print('-' * 35)
+                continue
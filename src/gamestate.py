@@ -0,0 +1,78 @@
+from src.move import move_src, move_dst, drop_type
+from src.bitboard import BitboardPosition, SQUARE_BB, RAYS
+from src.mate import is_checkmate
+from src.movepicker import has_legal_move
+
+# Game-end bookkeeping for the side to move on one ShogiBoard.
+# A legal move can only give check with the piece that moved or by uncovering a slider
+# behind its source square, so after each move the checkers are found from that move alone,
+# and only a side in check gets its evasions searched.
+
+
+def _discovered_checker(position: BitboardPosition, king_sq: int, src: int, team: int) -> int:
+    '''The team's slider that attacks king_sq through the vacated src square, 0 if none'''
+    for direction, rays in enumerate(RAYS):
+        if rays[king_sq] & SQUARE_BB[src]:
+            blocker = position.slide_attacks(king_sq, direction, position.occupied) & position.teams[team]
+            if blocker and position.attacks_from(blocker.bit_length() - 1) & SQUARE_BB[king_sq]:
+                return blocker
+            return 0
+    return 0
+
+
+class GameState:
+    '''
+    Check status of the side to move: its checkers, whether it is in check, and whether it
+    has any legal move. `key` is the board key the state belongs to, a board changed some
+    other way (unmake_move, set_sfen ...) no longer matches and has to be reset().
+    '''
+    def __init__(self, board) -> None:
+        self.reset(board)
+
+
+    def reset(self, board) -> None:
+        '''Recompute everything from the position'''
+        self.key = board.key
+        self.side_to_move = board.side_to_move
+        self.checkers = board.position.checkers(board.side_to_move)
+        self._has_legal_move = None
+
+
+    def update(self, board, move: int) -> None:
+        '''Catch up with `move`, just played on board from the position of self.key'''
+        position = board.position
+        mover, defender = -board.side_to_move, board.side_to_move
+        king_sq = position.kings[defender]
+        checkers = 0
+
+        if king_sq >= 0:
+            dst = move_dst(move)
+            if position.attacks_from(dst) & SQUARE_BB[king_sq]:
+                checkers |= SQUARE_BB[dst]
+            if not drop_type(move):
+                checkers |= _discovered_checker(position, king_sq, move_src(move), mover)
+
+        self.key = board.key
+        self.side_to_move = defender
+        self.checkers = checkers
+        self._has_legal_move = None
+
+
+    @property
+    def in_check(self) -> bool:
+        return self.checkers != 0
+
+
+    def has_legal_move(self, board, player) -> bool:
+        '''Any legal move or drop for `player`, the side to move, computed once per position'''
+        if self._has_legal_move is None:
+            if self.checkers:
+                self._has_legal_move = not is_checkmate(board.position, player.team, player.captured.counts)
+            else:
+                self._has_legal_move = has_legal_move(board, player)
+        return self._has_legal_move
+
+
+    def is_checkmated(self, board, player) -> bool:
+        '''The side to move is in check and cannot get out of it'''
+        return self.in_check and not self.has_legal_move(board, player)
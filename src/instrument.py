@@ -0,0 +1,193 @@
+import functools
+import inspect
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from src import mate
+from src.board import ShogiBoard
+from src.bitboard import BitboardPosition
+from src.gamestate import GameState
+from src.movepicker import MovePicker
+
+# Opt-in call counting and timing of the move generation and legality hot paths.
+#
+# enable() swaps the methods and functions listed in INSTRUMENTED for timing wrappers and
+# disable() puts the originals back, so nothing is paid while instrumentation is off.
+# A module function is also swapped in every module that imported it by name.
+# Every call is added to PROCESS_STATS and to each collector opened with collect(), e.g. one
+# per game. Times are inclusive: a call that makes other instrumented calls also counts their
+# time. For a generator the time spent producing its items counts, as one call.
+
+INSTRUMENTED = [
+    (BitboardPosition, 'generate_legal_moves'),
+    (mate, 'is_checkmate'),
+    (GameState, 'update'),
+    (GameState, 'has_legal_move'),
+    (MovePicker, '__iter__'),
+    (ShogiBoard, 'get_all_valid_moves_and_drops'),
+    (ShogiBoard, 'iter_valid_drops'),
+    (ShogiBoard, '_can_drop_piece'),
+    (ShogiBoard, '_has_evade_moves_after_drop'),
+    (ShogiBoard, 'execute_move'),
+    (ShogiBoard, 'make_move'),
+    (ShogiBoard, 'unmake_move'),
+]
+
+
+class CallStats:
+    '''Number of calls and total seconds per instrumented method'''
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+
+
+    def add(self, name: str, seconds: float) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+
+    def reset(self) -> None:
+        self.calls.clear()
+        self.seconds.clear()
+
+
+    def merge(self, stats: Dict[str, Dict[str, float]]) -> None:
+        '''Add the counts of an as_dict() result, ex: from another process'''
+        for name, entry in stats.items():
+            self.calls[name] = self.calls.get(name, 0) + entry['calls']
+            self.seconds[name] = self.seconds.get(name, 0.0) + entry['seconds']
+
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {name: {'calls': self.calls[name], 'seconds': self.seconds[name]} for name in self.calls}
+
+
+    def report(self) -> str:
+        '''Table of the methods, the slowest in total first'''
+        lines = [f"{'method':<45}{'calls':>10}{'total s':>12}{'per call us':>14}"]
+        for name in sorted(self.calls, key=self.seconds.get, reverse=True):
+            calls, seconds = self.calls[name], self.seconds[name]
+            lines.append(f"{name:<45}{calls:>10}{seconds:>12.4f}{seconds / calls * 1e6:>14.2f}")
+        return "\n".join(lines)
+
+
+PROCESS_STATS = CallStats()
+
+_collectors: List[CallStats] = [PROCESS_STATS]
+_originals = {}
+
+
+def _add(name: str, seconds: float) -> None:
+    for stats in _collectors:
+        stats.add(name, seconds)
+
+
+def _timed(name: str, method):
+    if inspect.isgeneratorfunction(method):
+        return _timed_generator(name, method)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _add(name, time.perf_counter() - start)
+    return wrapper
+
+
+def _timed_generator(name: str, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        generator = method(*args, **kwargs)
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            # 呼叫端提早停止時也會到這裡 (close)
+            generator.close()
+            _add(name, elapsed)
+    return wrapper
+
+
+def _name(owner, attr: str) -> str:
+    return f"{owner.__name__.rsplit('.', 1)[-1]}.{attr}"
+
+
+def _holders(owner, attr: str, function) -> List:
+    '''The owner, plus for a module function every loaded module that imported it by name'''
+    if inspect.isclass(owner):
+        return [owner]
+    return [module for module in list(sys.modules.values()) if getattr(module, attr, None) is function]
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    '''Start counting and timing the INSTRUMENTED methods'''
+    if _originals:
+        return
+    for owner, attr in INSTRUMENTED:
+        method = owner.__dict__[attr]
+        wrapper = _timed(_name(owner, attr), method)
+        for holder in _holders(owner, attr, method):
+            _originals[(holder, attr)] = method
+            setattr(holder, attr, wrapper)
+
+
+def disable() -> None:
+    '''Put the original methods back, the statistics are kept'''
+    for (holder, attr), method in _originals.items():
+        setattr(holder, attr, method)
+    _originals.clear()
+
+    # 啟用期間才載入的模組拿到的也是包裝過的函式
+    for owner, attr in INSTRUMENTED:
+        if not inspect.isclass(owner):
+            function = owner.__dict__[attr]
+            for module in list(sys.modules.values()):
+                if getattr(getattr(module, attr, None), '__wrapped__', None) is function:
+                    setattr(module, attr, function)
+
+
+@contextmanager
+def instrumented() -> Iterator[CallStats]:
+    '''Instrumentation switched on for the block, yields the statistics of the block only'''
+    was_enabled = is_enabled()
+    enable()
+    try:
+        with collect() as stats:
+            yield stats
+    finally:
+        if not was_enabled:
+            disable()
+
+
+@contextmanager
+def collect() -> Iterator[CallStats]:
+    '''Statistics of the calls made inside the block, ex: one game'''
+    stats = CallStats()
+    _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.remove(stats)
+
+
+def dump(path: str, stats: CallStats = PROCESS_STATS) -> None:
+    '''Write the statistics as JSON'''
+    with open(path, 'w') as f:
+        json.dump(stats.as_dict(), f, indent=2)
@@ -0,0 +1,202 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.utils import PAWN
+from src.move import drop_type
+from src.bitboard import BitboardPosition, SQUARE_BB, FULL_BB, BETWEEN, iter_squares
+
+# Mate detection and a df-pn (depth-first proof-number) tsume solver.
+#
+# is_checkmate() answers "is this team mated" straight from the bitboards and stops at the
+# first evasion it finds. MateSolver proves or disproves mate in N for the side to move on a
+# ShogiBoard: the attacker may only play checks, the defender plays every legal evasion.
+# Proof and disproof numbers are kept as (phi, delta) from the side to move's point of view:
+# phi is the proof number at attacker nodes and the disproof number at defender nodes.
+
+INFINITE = 1 << 30
+
+
+def is_checkmate(position: BitboardPosition, team: int, hand: Sequence[int]) -> bool:
+    '''
+    True if the team's king is in check and no move or drop gets it out,
+    `hand` holds the team's piece counts by piece type (Hand.counts)
+    '''
+    checkers = position.checkers(team)
+    if not checkers:
+        return False
+
+    # 王將能逃就不是將死
+    king_sq = position.kings[team]
+    occupied = position.occupied & ~SQUARE_BB[king_sq]
+    for dst in iter_squares(position.attacks_from(king_sq) & ~position.teams[team]):
+        if not position.is_attacked(dst, -team, occupied):
+            return False
+
+    # 雙王手只能移動王將
+    if checkers & (checkers - 1):
+        return True
+
+    targets = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+    between = targets & ~checkers
+    if between:
+        for ptype, count in enumerate(hand):
+            if count and position.drop_targets(ptype, team) & between:
+                return False
+
+    pins = position.pinned(team)
+    for sq in position.piece_squares[team]:
+        if sq != king_sq and position.piece_moves(sq, targets & pins.get(sq, FULL_BB)):
+            return False
+    return True
+
+
+class MateSearchAborted(Exception):
+    '''Raised inside a MateSolver search once its node budget is used up'''
+
+
+class MateSolver:
+    '''
+    df-pn solver for mate in N on a ShogiBoard, played in place with make_move/unmake_move.
+    Entries are keyed by (Zobrist key, plies left), so the ply limit also breaks every cycle.
+    A pawn drop that mates is not a solution (uchifuzume).
+    '''
+    def __init__(self, board, max_nodes: int = 200000) -> None:
+        self.board = board
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.table: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self._checks: Dict[int, List[int]] = {}  # Checking moves of the attacker per position
+        self._players = {}
+        self._attacker = 0
+
+
+    def _gives_check(self, defender) -> bool:
+        return bool(self.board.position.checkers(defender.team))
+
+
+    def _children(self, player, opponent, plies: int) -> List[int]:
+        board = self.board
+        moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+        if player.team != self._attacker:
+            return list(moves | drops)
+        if plies <= 0:
+            return []
+        if board.key in self._checks:
+            return self._checks[board.key]
+
+        checks = []
+        for move in moves | drops:
+            board.make_move(move, player)
+            if self._gives_check(opponent):
+                # 打步詰: 用打入的步兵將死對方是犯規
+                if drop_type(move) != PAWN or not is_checkmate(board.position, opponent.team, opponent.captured.counts):
+                    checks.append(move)
+            board.unmake_move()
+        self._checks[board.key] = checks
+        return checks
+
+
+    def _lookup(self, key: int, plies: int, attacker_to_move: bool) -> Tuple[int, int]:
+        if attacker_to_move and plies <= 0:
+            return INFINITE, 0
+        return self.table.get((key, plies), (1, 1))
+
+
+    def _mid(self, plies: int, phi_threshold: int, delta_threshold: int) -> None:
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise MateSearchAborted()
+
+        board = self.board
+        player = self._players[board.side_to_move]
+        opponent = self._players[-board.side_to_move]
+        key = board.key
+
+        moves = self._children(player, opponent, plies)
+        # 無路可走: 攻方沒有王手可下，或守方已被將死
+        if not moves:
+            self.table[(key, plies)] = (INFINITE, 0)
+            return
+
+        child_keys = []
+        for move in moves:
+            board.make_move(move, player)
+            child_keys.append(board.key)
+            board.unmake_move()
+        child_is_attacker = opponent.team == self._attacker
+
+        while True:
+            phi, delta = INFINITE, 0
+            best, best_phi, best_delta, second_delta = 0, INFINITE, INFINITE, INFINITE
+            for idx, child_key in enumerate(child_keys):
+                child_phi, child_delta = self._lookup(child_key, plies - 1, child_is_attacker)
+                delta = min(INFINITE, delta + child_phi)
+                if child_delta < best_delta:
+                    second_delta = best_delta
+                    best, best_phi, best_delta = idx, child_phi, child_delta
+                elif child_delta < second_delta:
+                    second_delta = child_delta
+            phi = best_delta
+
+            if phi >= phi_threshold or delta >= delta_threshold:
+                self.table[(key, plies)] = (phi, delta)
+                return
+
+            board.make_move(moves[best], player)
+            try:
+                self._mid(plies - 1, delta_threshold + best_phi - delta, min(phi_threshold, second_delta + 1))
+            finally:
+                board.unmake_move()
+
+
+    def _mate_line(self, plies: int) -> List[int]:
+        '''Follow proven children from the root: a proving check, then any evasion, and so on'''
+        board = self.board
+        line = []
+        while True:
+            player = self._players[board.side_to_move]
+            opponent = self._players[-board.side_to_move]
+            moves = self._children(player, opponent, plies)
+            if not moves:
+                break
+
+            attacker_to_move = player.team == self._attacker
+            chosen = None
+            for move in moves:
+                board.make_move(move, player)
+                child_phi, child_delta = self._lookup(board.key, plies - 1, not attacker_to_move)
+                board.unmake_move()
+                # 攻方選已證明的王手，守方任選一個應手 (每個都已被證明會被將死)
+                if (attacker_to_move and child_delta == 0) or (not attacker_to_move and child_phi == 0):
+                    chosen = move
+                    break
+            if chosen is None:
+                break
+
+            board.make_move(chosen, player)
+            line.append(chosen)
+            plies -= 1
+
+        for _ in line:
+            board.unmake_move()
+        return line
+
+
+    def solve(self, attacker, defender, mate_length: int) -> Optional[List[int]]:
+        '''
+        Mating line of at most `mate_length` attacker moves for `attacker`, who is to move,
+        None if there is no such mate or the node budget runs out first.
+        Shorter mates are tried first, so the line returned is a shortest one.
+        '''
+        self._players = {attacker.team: attacker, defender.team: defender}
+        self._attacker = attacker.team
+        self.nodes = 0
+
+        for length in range(1, mate_length + 1):
+            plies = 2 * length - 1
+            try:
+                self._mid(plies, INFINITE, INFINITE)
+            except MateSearchAborted:
+                return None
+            if self.table[(self.board.key, plies)][0] == 0:
+                return self._mate_line(plies)
+        return None
@@ -0,0 +1,397 @@
+import math
+import multiprocessing
+import random
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from src.game import ShogiGame
+from src.board import ShogiBoard, CompactState
+from src.player import ShogiPlayer
+from src.values import PIECE_VALUES
+from src.move import move_dst, is_promotion, drop_type, move_to_string
+
+# Monte Carlo tree search (UCT).
+#
+# Every iteration walks the tree from the root on a scratch ShogiGame with make_move, adds one
+# new node, scores it with a random playout and backs the result up the path. Game ends inside
+# the tree and in playouts come from ShogiGame.get_game_ended. Results are kept from team 1's
+# point of view (1, -1, DRAW or a material estimate when a playout is cut off) and every node
+# adds them up from the point of view of the side that moved into it.
+#
+# With workers > 1 the playouts of `workers` leaves at a time run on a pool of processes, the
+# leaves being picked one after another with a virtual loss on their paths so they differ.
+
+MAX_PLAYOUT_PLIES = 64  # Playouts still running after this many plies are scored on material
+MATERIAL_SCALE = 3000  # Material lead, in centipawns, scored as a sure win at the playout cutoff
+
+
+class RandomRollout:
+    '''Uniformly random legal move'''
+    def __call__(self, board: ShogiBoard, player: ShogiPlayer, moves: List[int], rng: random.Random) -> int:
+        return rng.choice(moves)
+
+
+class CaptureRollout:
+    '''Capture the most valuable piece there is to capture, or a random move without captures'''
+    def __call__(self, board: ShogiBoard, player: ShogiPlayer, moves: List[int], rng: random.Random) -> int:
+        squares = board.position.squares
+        best, best_value = None, 0
+        for move in moves:
+            if not drop_type(move):
+                victim = abs(squares[move_dst(move)])
+                if victim and PIECE_VALUES[victim] >= best_value:
+                    best, best_value = move, PIECE_VALUES[victim]
+        return best if best is not None else rng.choice(moves)
+
+
+class CapturePrior:
+    '''Prior of a move: 1, more for captures (by the captured value) and promotions'''
+    def __call__(self, board: ShogiBoard, player: ShogiPlayer, moves: List[int]) -> List[float]:
+        squares = board.position.squares
+        priors = []
+        for move in moves:
+            prior = 1.0
+            if not drop_type(move):
+                victim = abs(squares[move_dst(move)])
+                prior += PIECE_VALUES[victim] / 100 if victim else 0
+                prior += is_promotion(move)
+            priors.append(prior)
+        return priors
+
+
+class Node:
+    '''
+    One position of the tree. `mover` is the team whose move led to it, `value` the sum of the
+    results backed up through it from the mover's point of view. `untried` holds the moves
+    without a child yet, as (prior, move) with the best prior last, None until expanded.
+    '''
+    __slots__ = ('move', 'mover', 'key', 'prior', 'result', 'visits', 'value', 'children', 'untried')
+
+    def __init__(self, move: Optional[int], mover: int, key: int, prior: float = 0.0, result: float = 0) -> None:
+        self.move = move
+        self.mover = mover
+        self.key = key
+        self.prior = prior
+        self.result = result  # 終局時的結果 (以 team 1 來看)，0 表示還沒結束
+        self.visits = 0
+        self.value = 0.0
+        self.children: List['Node'] = []
+        self.untried: Optional[List[Tuple[float, int]]] = None
+
+
+    def size(self) -> int:
+        '''Number of nodes in the subtree'''
+        count, stack = 0, [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+        return count
+
+
+class MCTSResult(NamedTuple):
+    move: Optional[int]
+    value: float  # Mean result of the move for the player, from -1 to 1
+    playouts: int
+    nodes: int
+    pv: List[int]
+    seconds: float
+
+
+def material_balance(board: ShogiBoard) -> int:
+    '''Material of team 1 minus material of team -1, pieces in hand included'''
+    squares = board.position.squares
+    score = sum(PIECE_VALUES[abs(code)] * (1 if code > 0 else -1) for code in squares if code)
+    for team, player in board.players.items():
+        score += team * sum(PIECE_VALUES[ptype] * count for ptype, count in enumerate(player.captured.counts) if count)
+    return score
+
+
+def legal_moves(game: ShogiGame, player: ShogiPlayer) -> List[int]:
+    moves, drops = game.board.get_all_valid_moves_and_drops(game.board.board, player)
+    return sorted(moves | drops)
+
+
+def playout(game: ShogiGame, rollout, rng: random.Random, max_plies: int = MAX_PLAYOUT_PLIES) -> float:
+    '''
+    Play the game on from its position with `rollout` moves and take them all back,
+    returns the result for team 1
+    '''
+    board = game.board
+    players = board.players
+    result, plies = 0, 0
+
+    try:
+        while plies < max_plies:
+            result = game.get_game_ended(board.board, game.players[0], game.players[1])
+            if result:
+                break
+            player = players[board.side_to_move]
+            moves = legal_moves(game, player)
+            # 沒有合法走步就輸了
+            if not moves:
+                result = -player.team
+                break
+            game.play_move(rollout(board, player, moves, rng), player, validate=False)
+            plies += 1
+        else:
+            result = max(-1.0, min(1.0, material_balance(board) / MATERIAL_SCALE))
+    finally:
+        for _ in range(plies):
+            board.unmake_move()
+            game.history.pop()
+    return result
+
+
+def load_game(game: ShogiGame, state: CompactState) -> None:
+    '''Put a compact_state() position on the game, with a fresh game state and history'''
+    game.board.load_compact_state(state)
+    game.state.reset(game.board)
+    game.history.reset(game.board.key)
+
+
+_worker = None  # (scratch game, rollout policy, playout plies) of the current process
+
+
+def _init_worker(rollout, max_plies: int) -> None:
+    global _worker
+    _worker = (ShogiGame(tt_memory_mb=0), rollout, max_plies)
+
+
+def _playout_task(task: Tuple[CompactState, int]) -> float:
+    state, seed = task
+    game, rollout, max_plies = _worker
+    load_game(game, state)
+    return playout(game, rollout, random.Random(seed), max_plies)
+
+
+class MCTS:
+    '''
+    UCT search for the side to move on a ShogiBoard.
+
+    Children are chosen by mean value + c * sqrt(ln N / n) + prior_weight * prior / (n + 1):
+    with the default uniform prior this is plain UCT, and new children are added in prior
+    order. A search runs `playouts` iterations or `time_limit` seconds, whichever comes first.
+    The tree is kept between searches: a later search from a position up to reuse_depth plies
+    below the last root starts from that subtree. Once the tree holds max_nodes nodes no node
+    is added, the playouts start from the leaves reached.
+    Use as a context manager, or call close(), to shut the worker pool down.
+    '''
+    def __init__(self, playouts: Optional[int] = 1000, time_limit: Optional[float] = None, c: float = 1.4,
+                 rollout=None, prior=None, prior_weight: float = 1.0, max_nodes: int = 200000,
+                 max_playout_plies: int = MAX_PLAYOUT_PLIES, workers: int = 1, reuse_depth: int = 2,
+                 seed: Optional[int] = None) -> None:
+        if playouts is None and time_limit is None:
+            raise Exception("MCTS needs a playout or a time budget!")
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.c = c
+        self.rollout = rollout if rollout is not None else RandomRollout()
+        self.prior = prior
+        self.prior_weight = prior_weight
+        self.max_nodes = max_nodes
+        self.max_playout_plies = max_playout_plies
+        self.workers = workers
+        self.reuse_depth = reuse_depth
+        self.rng = random.Random(seed)
+        self.root: Optional[Node] = None
+        self.node_count = 0
+        self._game = ShogiGame(tt_memory_mb=0)  # Playouts rarely meet a position twice, no cache
+        self._pool = None
+
+
+    def __enter__(self) -> 'MCTS':
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def __getstate__(self):
+        # 樹、暫存的對局與 process pool 留在各自的 process 重新建立
+        return {**self.__dict__, 'root': None, 'node_count': 0, '_game': ShogiGame(tt_memory_mb=0), '_pool': None}
+
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+    def _find_root(self, key: int) -> Optional[Node]:
+        '''The node of the position `key` within reuse_depth plies of the last root'''
+        if self.root is None:
+            return None
+        level = [self.root]
+        for _ in range(self.reuse_depth + 1):
+            for node in level:
+                if node.key == key:
+                    return node
+            level = [child for node in level for child in node.children]
+        return None
+
+
+    def _expand(self, node: Node, player: ShogiPlayer) -> None:
+        moves = legal_moves(self._game, player)
+        priors = self.prior(self._game.board, player, moves) if self.prior is not None else [1.0] * len(moves)
+        total = sum(priors) or 1.0
+        node.untried = sorted((prior / total, move) for prior, move in zip(priors, moves))
+        # 沒有合法走步就輸了
+        if not moves and not node.result:
+            node.result = -player.team
+
+
+    def _select_child(self, node: Node) -> Node:
+        log_visits = math.log(node.visits)
+
+        def score(child: Node) -> float:
+            return (child.value / child.visits + self.c * math.sqrt(log_visits / child.visits)
+                    + self.prior_weight * child.prior / (child.visits + 1))
+
+        return max(node.children, key=score)
+
+
+    def _select(self) -> List[Node]:
+        '''
+        Walk down from the root playing the moves on the scratch game, add a new node if there
+        is room and return the path, the game is left at the position of its last node
+        '''
+        game, board = self._game, self._game.board
+        players = board.players
+        node, path = self.root, [self.root]
+
+        while not node.result:
+            player = players[board.side_to_move]
+            if node.untried is None:
+                self._expand(node, player)
+                if node.result:
+                    break
+
+            if node.untried and self.node_count < self.max_nodes:
+                prior, move = node.untried.pop()
+                game.play_move(move, player, validate=False)
+                result = game.get_game_ended(board.board, game.players[0], game.players[1])
+                child = Node(move, player.team, board.key, prior, result)
+                node.children.append(child)
+                self.node_count += 1
+                path.append(child)
+                break
+
+            if not node.children:
+                break
+            node = self._select_child(node)
+            game.play_move(node.move, player, validate=False)
+            path.append(node)
+
+        return path
+
+
+    def _rewind(self, path: List[Node]) -> None:
+        '''Take back the moves of the path on the scratch game'''
+        for _ in range(len(path) - 1):
+            self._game.board.unmake_move()
+            self._game.history.pop()
+
+
+    def _backup(self, path: List[Node], result: float, virtual_loss: bool = False) -> None:
+        for node in path:
+            if virtual_loss:
+                # 把選擇時加上的一次虛擬敗場換成真正的結果
+                node.value += result * node.mover + 1
+            else:
+                node.visits += 1
+                node.value += result * node.mover
+
+
+    def _iterate_serial(self) -> int:
+        path = self._select()
+        leaf = path[-1]
+        result = leaf.result or playout(self._game, self.rollout, self.rng, self.max_playout_plies)
+        self._rewind(path)
+        self._backup(path, result)
+        return 1
+
+
+    def _iterate_parallel(self) -> int:
+        '''Pick `workers` leaves under virtual loss and run their playouts on the pool'''
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers, _init_worker, (self.rollout, self.max_playout_plies))
+
+        paths, tasks = [], []
+        for _ in range(self.workers):
+            path = self._select()
+            leaf = path[-1]
+            if not leaf.result:
+                tasks.append((self._game.board.compact_state(), self.rng.getrandbits(32)))
+            self._rewind(path)
+            for node in path:
+                node.visits += 1
+                node.value -= 1
+            paths.append(path)
+
+        results = iter(self._pool.map(_playout_task, tasks))
+        for path in paths:
+            leaf = path[-1]
+            self._backup(path, leaf.result or next(results), virtual_loss=True)
+        return len(paths)
+
+
+    def search(self, board: ShogiBoard, player: ShogiPlayer) -> MCTSResult:
+        '''
+        Most visited move for `player`, who is to move on `board`, and the most visited line
+        '''
+        start = time.perf_counter()
+        deadline = start + self.time_limit if self.time_limit is not None else None
+        load_game(self._game, board.compact_state())
+        game = self._game
+
+        key = game.board.key
+        root = self._find_root(key)
+        if root is None:
+            result = game.get_game_ended(game.board.board, game.players[0], game.players[1])
+            root = Node(None, -player.team, key, result=result)
+            self.node_count = 1
+        elif root is not self.root:
+            self.node_count = root.size()
+        self.root = root
+
+        playouts = 0
+        iterate = self._iterate_parallel if self.workers > 1 else self._iterate_serial
+        while self.playouts is None or playouts < self.playouts:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            playouts += iterate()
+            if root.result:
+                break
+
+        pv, node = [], root
+        while node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            pv.append(node.move)
+        if not pv:
+            moves = legal_moves(game, game.board.players[player.team])
+            pv = moves[:1]
+
+        best = max(root.children, key=lambda child: child.visits) if root.children else None
+        value = best.value / best.visits if best is not None and best.visits else 0.0
+        return MCTSResult(pv[0] if pv else None, value, playouts, self.node_count, pv, time.perf_counter() - start)
+
+
+class MCTSPlayer(ShogiPlayer):
+    '''
+    A ShogiPlayer whose moves are chosen by MCTS, the tree is kept from move to move
+    '''
+    def __init__(self, name, team: int, captured: Optional[Sequence[str]] = None, **options) -> None:
+        super().__init__(name, team, captured)
+        self.mcts = MCTS(**options)
+        self.last_result = None
+
+
+    def get_move(self, board: ShogiBoard, opponent: ShogiPlayer) -> str:
+        '''Search the board and return the chosen move in notation'''
+        self.last_result = self.mcts.search(board, self)
+        if self.last_result.move is None:
+            raise Exception("No legal move!")
+        return move_to_string(self.last_result.move, self.team)
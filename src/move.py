@@ -0,0 +1,107 @@
+from src.utils import PIECE_TYPES, hand_letter, parse_drop_to_string, parse_pos_to_string
+
+# Integer move encoding
+#   bits 0-6   destination square (r * 9 + c)
+#   bits 7-13  source square, unused by drops
+#   bit 14     promotion flag
+#   bits 15-18 dropped piece type, 0 for a board move
+
+SRC_SHIFT = 7
+PROMOTION_FLAG = 1 << 14
+DROP_SHIFT = 15
+SQUARE_MASK = 0x7F
+
+
+def make_move(src: int, dst: int, is_promoted: bool = False) -> int:
+    move = dst | (src << SRC_SHIFT)
+    return move | PROMOTION_FLAG if is_promoted else move
+
+
+def make_drop(ptype: int, dst: int) -> int:
+    return dst | (ptype << DROP_SHIFT)
+
+
+def move_src(move: int) -> int:
+    return (move >> SRC_SHIFT) & SQUARE_MASK
+
+
+def move_dst(move: int) -> int:
+    return move & SQUARE_MASK
+
+
+def is_promotion(move: int) -> bool:
+    return bool(move & PROMOTION_FLAG)
+
+
+def drop_type(move: int) -> int:
+    '''Type of the dropped piece, 0 for a board move'''
+    return move >> DROP_SHIFT
+
+
+def move_to_string(move: int, team: int) -> str:
+    '''
+    Move ex: a3a4, promotion move ex: h6h7+
+    Drops use the piece letter as it is kept in the team's hand, ex: P*d4
+    '''
+    dst = divmod(move & SQUARE_MASK, 9)
+    ptype = move >> DROP_SHIFT
+
+    if ptype:
+        return parse_drop_to_string(hand_letter(ptype, team), dst)
+    return parse_pos_to_string(divmod(move_src(move), 9), dst, bool(move & PROMOTION_FLAG))
+
+
+def _parse_square(notation: str) -> int:
+    if len(notation) != 2 or not 'a' <= notation[0] <= 'i' or not '1' <= notation[1] <= '9':
+        raise Exception("Incorrect position!")
+    return (9 - int(notation[1])) * 9 + ord(notation[0]) - 97
+
+
+def string_to_move(notation: str) -> int:
+    '''Parse a move or drop notation, the drop piece letter may be in either case'''
+    if len(notation) == 4 and notation[1] == '*':
+        if notation[0].upper() not in PIECE_TYPES:
+            raise Exception("Incorrect piece!")
+        return make_drop(PIECE_TYPES[notation[0].upper()], _parse_square(notation[2:]))
+
+    if len(notation) == 5 and notation[4] == '+':
+        return make_move(_parse_square(notation[:2]), _parse_square(notation[2:4]), True)
+    elif len(notation) == 4:
+        return make_move(_parse_square(notation[:2]), _parse_square(notation[2:4]))
+
+    raise Exception("Incorrect move format!")
+
+
+# USI writes a square as file then rank, ex: 7g. Files count 9..1 from board[r][0] to board[r][8]
+# and ranks a..i from board[0] down. Drop letters are always upper case, ex: P*5e
+def _usi_square(sq: int) -> str:
+    r, c = divmod(sq, 9)
+    return f"{9 - c}{chr(97 + r)}"
+
+
+def _parse_usi_square(notation: str) -> int:
+    if len(notation) != 2 or not '1' <= notation[0] <= '9' or not 'a' <= notation[1] <= 'i':
+        raise Exception("Incorrect position!")
+    return (ord(notation[1]) - 97) * 9 + 9 - int(notation[0])
+
+
+def move_to_usi(move: int) -> str:
+    ptype = move >> DROP_SHIFT
+    if ptype:
+        return f"{hand_letter(ptype, 1)}*{_usi_square(move & SQUARE_MASK)}"
+    usi = _usi_square(move_src(move)) + _usi_square(move & SQUARE_MASK)
+    return usi + '+' if move & PROMOTION_FLAG else usi
+
+
+def usi_to_move(notation: str) -> int:
+    if len(notation) == 4 and notation[1] == '*':
+        if notation[0].upper() not in PIECE_TYPES:
+            raise Exception("Incorrect piece!")
+        return make_drop(PIECE_TYPES[notation[0].upper()], _parse_usi_square(notation[2:]))
+
+    if len(notation) == 5 and notation[4] == '+':
+        return make_move(_parse_usi_square(notation[:2]), _parse_usi_square(notation[2:4]), True)
+    elif len(notation) == 4:
+        return make_move(_parse_usi_square(notation[:2]), _parse_usi_square(notation[2:4]))
+
+    raise Exception("Incorrect move format!")
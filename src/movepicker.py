@@ -0,0 +1,152 @@
+from typing import Iterator, Optional
+
+from src.utils import PAWN, KING
+from src.move import move_src, move_dst, is_promotion, drop_type
+from src.bitboard import BitboardPosition, PROMOTED, SQUARE_BB, FULL_BB, iter_squares
+from src.values import PIECE_VALUES
+
+# Staged move generation for one side of a ShogiBoard.
+#
+# MovePicker yields the legal moves one stage at a time, each stage generated only once the
+# previous one is used up: the hash move, captures by static exchange evaluation, promotions,
+# the other board moves, then drops. A search that cuts off early never pays for the stages it
+# does not reach. Every move is yielded once, and the stages together give the same moves as
+# get_all_valid_moves_and_drops. has_legal_move skips the ordering altogether.
+
+SEE_KING_VALUE = 10000  # The king can only take last, whatever it costs
+
+
+def _see_value(code: int) -> int:
+    '''Value of the piece with this code, of either team'''
+    ptype = abs(code)
+    return SEE_KING_VALUE if ptype == KING else PIECE_VALUES[ptype]
+
+
+def see(position: BitboardPosition, move: int) -> int:
+    '''
+    Static exchange evaluation: material won by the side playing `move` once every capture
+    on its destination is played out, least valuable attacker first, each side free to stop.
+    Promotions after the first move and pins are not taken into account. Drops are worth 0.
+    '''
+    if drop_type(move):
+        return 0
+    src, dst = move_src(move), move_dst(move)
+    code = position.squares[src]
+    team = 1 if code > 0 else -1
+
+    on_square = _see_value(abs(code) | PROMOTED if is_promotion(move) else code)
+    gains = [_see_value(position.squares[dst]) if position.squares[dst] else 0]
+    if is_promotion(move):
+        gains[0] += on_square - _see_value(code)
+    occupied = position.occupied & ~SQUARE_BB[src]
+    side = -team
+
+    while True:
+        attackers = position.attackers_to(dst, side, occupied) & occupied
+        if not attackers:
+            break
+        attacker = min(iter_squares(attackers), key=lambda sq: _see_value(position.squares[sq]))
+        gains.append(on_square - gains[-1])
+        on_square = _see_value(position.squares[attacker])
+        occupied &= ~SQUARE_BB[attacker]
+        side = -side
+
+    # 從最後一次吃子往回算，每一方都可以選擇不再吃回
+    for depth in range(len(gains) - 1, 0, -1):
+        gains[depth - 1] = -max(-gains[depth - 1], gains[depth])
+    return gains[0]
+
+
+class MovePicker:
+    '''
+    Legal moves of `player`, to move on `board`, in stages: hash_move (if legal), captures with
+    the best exchange first, non-capturing promotions, quiet board moves, drops.
+    captures_only stops after the captures. Iterate it once: the stages are generated as they
+    are reached, so the board may be changed between two moves as long as it is restored
+    (make_move / unmake_move) before asking for the next one.
+    '''
+    def __init__(self, board, player, hash_move: Optional[int] = None, captures_only: bool = False) -> None:
+        self.board = board
+        self.player = player
+        self.hash_move = hash_move
+        self.captures_only = captures_only
+
+
+    def __iter__(self) -> Iterator[int]:
+        position, team = self.board.position, self.player.team
+        hash_move = self.hash_move
+
+        if hash_move is not None:
+            if self._is_legal(hash_move):
+                yield hash_move
+            else:
+                hash_move = None
+
+        captures = position.generate_legal_moves(team, position.teams[-team])
+        if captures:
+            exchanges = {move: see(position, move) for move in captures}
+            for move in sorted(captures, key=exchanges.__getitem__, reverse=True):
+                if move != hash_move:
+                    yield move
+        if self.captures_only:
+            return
+
+        quiet = position.generate_legal_moves(team, ~position.occupied & FULL_BB)
+        for move in quiet:
+            if is_promotion(move) and move != hash_move:
+                yield move
+        for move in quiet:
+            if not is_promotion(move) and move != hash_move:
+                yield move
+
+        # 打入放在最後，前面就截斷的話完全不用產生
+        for move in self.board.iter_valid_drops(position, self.player):
+            if move != hash_move:
+                yield move
+
+
+    def _is_legal(self, move: int) -> bool:
+        '''Whether a move from elsewhere, ex: the transposition table, is legal here'''
+        position, team = self.board.position, self.player.team
+        dst = move_dst(move)
+        ptype = drop_type(move)
+
+        if ptype:
+            if not self.player.captured.counts[ptype]:
+                return False
+            if not position.drop_targets(ptype, team) & position.evasion_targets(team) & SQUARE_BB[dst]:
+                return False
+            return ptype != PAWN or self.board._has_evade_moves_after_drop(position, ptype, dst, self.player)
+        src = move_src(move)
+        if position.squares[src] * team <= 0:
+            return False
+        return move in position.generate_legal_moves(team, SQUARE_BB[dst])
+
+
+def has_legal_move(board, player) -> bool:
+    '''
+    Whether `player`, to move on `board`, has any legal move. Stops at the first one found:
+    king moves, then the other pieces one by one, then drops, with no ordering and no SEE.
+    '''
+    position, team = board.position, player.team
+    own = position.teams[team]
+    king_sq = position.kings[team]
+    if king_sq < 0:
+        targets, pins = FULL_BB, {}
+    else:
+        # 王將移開後，原本被王將擋住的路線也算被攻擊
+        occupied = position.occupied & ~SQUARE_BB[king_sq]
+        for dst in iter_squares(position.attacks_from(king_sq) & ~own):
+            if not position.is_attacked(dst, -team, occupied):
+                return True
+        targets = position.evasion_targets(team)
+        if not targets:
+            return False
+        pins = position.pinned(team)
+
+    for sq in position.piece_squares[team]:
+        if sq != king_sq and position.attacks_from(sq) & ~own & targets & pins.get(sq, FULL_BB):
+            return True
+    for _ in board.iter_valid_drops(position, player):
+        return True
+    return False
@@ -0,0 +1,218 @@
+import argparse
+import multiprocessing
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.board import ShogiBoard, CompactState
+from src.player import ShogiPlayer
+from src.engine import ShogiEngine, SearchResult, SearchTimeout, MATE_SCORE, INFINITE
+from src.perft import POSITIONS, setup_position
+
+# Root-splitting parallel search.
+# Every iteration first searches the best root move of the previous one in this process, then
+# the other root moves are searched as tasks by a pool of worker processes, each with its own
+# ShogiBoard, ShogiEngine and transposition table, so the GIL is never shared. A task only has to
+# show whether its move beats the first move's score: it is searched with a null window around
+# that bound and searched again with a full window only when it does (PVS at the root).
+# Positions travel as ShogiBoard.compact_state() tuples, the time limit as a time.time() deadline
+# that holds in every process, and results come back as (move, score, pv, nodes).
+
+RootTask = Tuple[CompactState, int, int, Optional[float], int]
+RootResult = Tuple[int, Optional[int], List[int], int]
+
+_worker = None  # (board, players by team, engine) of the current process
+
+
+def _new_searcher(tt_memory_mb: float):
+    players = {1: ShogiPlayer("Sente", 1), -1: ShogiPlayer("Gote", -1)}
+    board = ShogiBoard(players[1], players[-1], tt_memory_mb)
+    return board, players, ShogiEngine(board, time_limit=None, tt_memory_mb=tt_memory_mb)
+
+
+def _init_worker(tt_memory_mb: float) -> None:
+    global _worker
+    _worker = _new_searcher(tt_memory_mb)
+
+
+def _parent_score(score: int) -> int:
+    '''Score of a root move from the score its reply position got, a mate one ply further away'''
+    score = -score
+    if score >= MATE_SCORE - 1000:
+        return score - 1
+    if score <= -MATE_SCORE + 1000:
+        return score + 1
+    return score
+
+
+def _search_root_move(task: RootTask, searcher=None) -> RootResult:
+    '''
+    Play one root move and search the reply position depth - 1 plies. With a bound alpha the
+    score is exact only above alpha, at or below it it is just an upper bound.
+    The score is None when the deadline passed first.
+    '''
+    state, move, depth, deadline, alpha = task
+    board, players, engine = searcher if searcher is not None else _worker
+    board.load_compact_state(state)
+    player, opponent = players[state[3]], players[-state[3]]
+
+    board.make_move(move, player)
+    nodes = engine.nodes
+    try:
+        # 零窗口只確認能不能超過 alpha，超過了才用完整的窗口重新搜尋 (將死分數不做)
+        if -INFINITE < alpha and abs(alpha) < MATE_SCORE - 1000:
+            score, pv = engine.search_depth(opponent, player, depth - 1, deadline=deadline, alpha=-alpha - 1, beta=-alpha)
+            if _parent_score(score) > alpha:
+                score, pv = engine.search_depth(opponent, player, depth - 1, deadline=deadline, beta=-alpha)
+        else:
+            score, pv = engine.search_depth(opponent, player, depth - 1, deadline=deadline)
+    except SearchTimeout:
+        return move, None, [], engine.nodes - nodes
+    return move, _parent_score(score), [move] + pv, engine.nodes - nodes
+
+
+class ParallelSearch:
+    '''
+    Iterative deepening over root moves split across `workers` processes.
+    workers=1 runs the same tasks in this process, one after another, each with the best
+    score found so far as its bound. Use as a context manager, or call close(), to shut the pool down.
+    '''
+    def __init__(self, workers: Optional[int] = None, max_depth: int = 64, time_limit: Optional[float] = 1.0, tt_memory_mb: float = 16) -> None:
+        self.workers = workers if workers else os.cpu_count() or 1
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.tt_memory_mb = tt_memory_mb
+        self._pool = None
+        self._local = None  # 在這個 process 搜尋用的 (board, players, engine)
+
+
+    def __enter__(self) -> 'ParallelSearch':
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+    def _searcher(self):
+        if self._local is None:
+            self._local = _new_searcher(self.tt_memory_mb)
+        return self._local
+
+
+    def _map(self, tasks: Iterator[RootTask]):
+        if self.workers == 1:
+            searcher = self._searcher()
+            return (_search_root_move(task, searcher) for task in tasks)
+
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers, _init_worker, (self.tt_memory_mb,))
+        return self._pool.imap_unordered(_search_root_move, tasks)
+
+
+    def search(self, board: ShogiBoard, player: ShogiPlayer) -> SearchResult:
+        '''
+        Best move and principal variation for `player`, who is to move on `board`
+        '''
+        start = time.perf_counter()
+        deadline = time.time() + self.time_limit if self.time_limit is not None else None
+        state = board.compact_state()
+        moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+        root_moves = sorted(moves | drops)
+
+        result = SearchResult(root_moves[0] if root_moves else None, 0 if root_moves else -MATE_SCORE, 0, 0, [], 0.0)
+        nodes = 0
+
+        for depth in range(1, self.max_depth + 1):
+            if not root_moves:
+                break
+
+            # 上一層最好的一步先在這個 process 用完整的窗口搜尋，它的分數當作其他走步的界限
+            first, score, pv, task_nodes = _search_root_move((state, root_moves[0], depth, deadline, -INFINITE), self._searcher())
+            nodes += task_nodes
+            if score is None:
+                break
+            scores, lines = {first: score}, {first: pv}
+            best = [first, score]
+
+            def tasks() -> Iterator[RootTask]:
+                # 一個一個取用時 (workers=1) 界限會跟著目前最好的分數提高
+                for move in root_moves[1:]:
+                    yield state, move, depth, deadline, best[1]
+
+            timed_out = False
+            for move, score, pv, task_nodes in self._map(tasks()):
+                nodes += task_nodes
+                if score is None:
+                    timed_out = True
+                    continue
+                scores[move], lines[move] = score, pv
+                if score > best[1]:
+                    best[:] = [move, score]
+
+            if timed_out:
+                break
+
+            # 下一層先搜尋分數高的走步
+            root_moves.sort(key=lambda move: scores[move], reverse=True)
+            best_move = best[0]
+            root_moves.remove(best_move)
+            root_moves.insert(0, best_move)
+            elapsed = time.perf_counter() - start
+            result = SearchResult(best_move, scores[best_move], depth, nodes, lines[best_move], elapsed)
+
+            if abs(scores[best_move]) >= MATE_SCORE - depth:
+                break
+            if self.time_limit is not None and elapsed > self.time_limit / 2:
+                break
+
+        return result._replace(nodes=nodes, seconds=time.perf_counter() - start)
+
+
+def measure_speedup(board: ShogiBoard, player: ShogiPlayer, depth: int, workers: int) -> Dict[str, float]:
+    '''
+    Search `depth` plies with the single-process ShogiEngine and with ParallelSearch on
+    `workers` processes, returns both times, nodes per second and the speedup over the engine
+    '''
+    report = {}
+    serial_board = board.clone()
+    serial_players = serial_board.players
+    engine = ShogiEngine(serial_board, max_depth=depth, time_limit=None)
+    serial = engine.search(serial_players[player.team], serial_players[-player.team])
+
+    with ParallelSearch(workers, max_depth=depth, time_limit=None) as search:
+        parallel = search.search(board, player)
+
+    for name, result in (('serial', serial), ('parallel', parallel)):
+        report[f'{name}_seconds'] = result.seconds
+        report[f'{name}_nps'] = result.nodes / result.seconds if result.seconds > 0 else 0.0
+
+    report['speedup'] = report['serial_seconds'] / report['parallel_seconds'] if report['parallel_seconds'] > 0 else 0.0
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare the one-process engine with the multi-process root-split search")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--position', choices=sorted(POSITIONS), default='initial')
+    args = parser.parse_args(argv)
+
+    board, player, _ = setup_position(POSITIONS[args.position])
+    report = measure_speedup(board, player, args.depth, args.workers)
+
+    print(f"Workers: {args.workers}")
+    print(f"Engine: {report['serial_seconds']:.3f}s ({report['serial_nps']:.0f} nodes/sec)")
+    print(f"Parallel: {report['parallel_seconds']:.3f}s ({report['parallel_nps']:.0f} nodes/sec)")
+    print(f"Speedup: {report['speedup']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
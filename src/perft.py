@@ -0,0 +1,129 @@
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.board import ShogiBoard
+from src.player import ShogiPlayer
+from src.move import move_to_string
+
+# Positions given as the moves played from init_board, team 1 moving first
+POSITIONS = {
+    'initial': [],
+    'bishop-exchange': ['c3c4', 'g7g6', 'b2h8+', 'g9h8'],
+    'bishop-drops': ['c3c4', 'g7g6', 'b2h8+', 'g9h8', 'B*e5', 'b*d5'],
+    'middlegame': ['g1f2', 'g7g6', 'b3b4', 'h8c3+', 'c1d2', 'c3d3', 'b2f6', 'd3c3', 'f6i9+', 'g6g5', 'L*d3', 'c9d8',
+                   'a1a2', 'c3d3', 'f3f4', 'l*d4', 'i9h9', 'd3e3', 'h9f7', 'd4d2+', 'd1d2', 's*c5', 'N*b6', 'c5b4'],
+}
+
+# Node counts at depth 1, 2, 3, ... for each position above. None of them comes from this
+# generator. 'initial' is the published perft of the shogi starting position. The others
+# were counted with cshogi 1.0.9 from the SFEN of the position reached (ShogiBoard.to_sfen()),
+# and python-shogi 1.1.1 gave the same legal moves at every node down to depth 3:
+#   bishop-exchange  lnsgkg1nl/1r5s1/pppppp1pp/6p2/9/2P6/PP1PPPPPP/7R1/LNSGKGSNL b Bb 5
+#   bishop-drops     lnsgkg1nl/1r5s1/pppppp1pp/6p2/3bB4/2P6/PP1PPPPPP/7R1/LNSGKGSNL b - 7
+#   middlegame       ln1gkgs2/1r1s5/ppppp+B1pp/1N7/6p2/1s3P3/P3+b1PPP/L2G1S1R1/1N2KG1NL b LP4p 25
+REFERENCE_COUNTS = {
+    'initial': [30, 900, 25470, 719731],
+    'bishop-exchange': [77, 5390, 280687],
+    'bishop-drops': [46, 1622, 73102],
+    'middlegame': [103, 4197, 316513],
+}
+
+
+def setup_position(moves: Sequence[str]) -> Tuple[ShogiBoard, ShogiPlayer, ShogiPlayer]:
+    '''
+    Play `moves` from the initial position, returns the board, the player to move and the other player
+    '''
+    players = [ShogiPlayer("Sente", 1), ShogiPlayer("Gote", -1)]
+    board = ShogiBoard(players[0], players[1])
+
+    for ply, move in enumerate(moves):
+        board.execute_move(move, players[ply % 2])
+
+    return board, players[len(moves) % 2], players[(len(moves) + 1) % 2]
+
+
+def legal_moves(board: ShogiBoard, player: ShogiPlayer) -> List[int]:
+    moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+    return list(moves | drops)
+
+
+def perft(board: ShogiBoard, player: ShogiPlayer, opponent: ShogiPlayer, depth: int) -> int:
+    '''
+    Number of leaf nodes of the legal move tree `depth` plies deep
+    '''
+    if depth == 0:
+        return 1
+
+    moves = legal_moves(board, player)
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        board.make_move(move, player)
+        nodes += perft(board, opponent, player, depth - 1)
+        board.unmake_move()
+
+    return nodes
+
+
+def divide(board: ShogiBoard, player: ShogiPlayer, opponent: ShogiPlayer, depth: int) -> Dict[str, int]:
+    '''
+    Perft split per root move, keyed by move notation
+    '''
+    counts = {}
+
+    for move in legal_moves(board, player):
+        board.make_move(move, player)
+        counts[move_to_string(move, player.team)] = perft(board, opponent, player, depth - 1) if depth > 1 else 1
+        board.unmake_move()
+
+    return counts
+
+
+def run(moves: Sequence[str], depth: int, show_divide: bool = False) -> Tuple[int, float]:
+    '''
+    Run perft on the position reached by `moves` and print the report, returns (nodes, seconds)
+    '''
+    board, player, opponent = setup_position(moves)
+
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(board, player, opponent, depth)
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, player, opponent, depth)
+    elapsed = time.perf_counter() - start
+
+    if show_divide:
+        for move in sorted(counts):
+            print(f"{move}: {counts[move]}")
+        print()
+
+    print(f"Depth: {depth}")
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.3f}s")
+    print(f"Nodes/sec: {nodes / elapsed if elapsed > 0 else 0:.0f}")
+
+    return nodes, elapsed
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Count the leaf nodes of the legal move tree")
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--position', choices=sorted(POSITIONS), default='initial', help="named start position")
+    parser.add_argument('--moves', default='', help="moves from the initial position instead of --position, ex: 'c3c4 g7g6'")
+    parser.add_argument('--divide', action='store_true', help="print the node count under every root move")
+    args = parser.parse_args(argv)
+
+    moves = args.moves.split() if args.moves else POSITIONS[args.position]
+    nodes, _ = run(moves, args.depth, args.divide)
+
+    expected = REFERENCE_COUNTS.get(args.position, []) if not args.moves else []
+    if args.depth <= len(expected) and nodes != expected[args.depth - 1]:
+        raise SystemExit(f"Mismatch: expected {expected[args.depth - 1]} nodes")
+
+
+if __name__ == "__main__":
+    main()
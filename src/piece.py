@@ -1,79 +1,119 @@
-from typing import Tuple, List
-from abc import ABCMeta, abstractmethod
+from typing import Dict, Tuple, List
+from abc import ABCMeta
 
-from src.utils import is_in_board, parse_pos_to_string
+from src.utils import PAWN, LANCE, KNIGHT, SILVER, GOLD, BISHOP, ROOK, KING
+from src.move import make_move
+from src.tables import STEP_TABLE, RAY_TABLE, MUST_PROMOTE_ROWS
 
 class ShogiPiece:
+    '''
+    Pieces are immutable flyweights: constructing one returns the shared instance of its
+    (class, name, team, promoted), so boards only hold references and copying a board is a
+    shallow copy of its grid. Promotion swaps in the promoted instance, see promote().
+    '''
     __metaclass__ = ABCMeta
+    __slots__ = ('name', 'team', 'promoted')
+
+    ptype = 0
+    _instances: Dict[Tuple, 'ShogiPiece'] = {}
+
+    def __new__(cls, name: str, team: int, promoted: bool = False) -> 'ShogiPiece':
+        key = (cls, name, team, bool(promoted))
+        piece = ShogiPiece._instances.get(key)
+        if piece is None:
+            piece = super().__new__(cls)
+            object.__setattr__(piece, 'name', name)
+            object.__setattr__(piece, 'team', team)       # 1: Our team, -1: Opponent team
+            object.__setattr__(piece, 'promoted', bool(promoted))
+            ShogiPiece._instances[key] = piece
+        return piece
+
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ShogiPiece is immutable!")
+
+
+    def __reduce__(self):
+        return type(self), (self.name, self.team, self.promoted)
+
 
-    _GGeneral_pattern = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, 0)]
+    def __copy__(self) -> 'ShogiPiece':
+        return self
 
-    OUR_PROMOTION_ZONE = [0, 1, 2]
-    OPPONENT_PROMOTION_ZONE = [6, 7, 8]
 
-    def __init__(self, name: str, team: int, promoted: bool = False) -> None:
-        self.name = name
-        self.team = team          # 1: Our team, -1: Opponent team
-        self.promoted = promoted
+    def __deepcopy__(self, memo) -> 'ShogiPiece':
+        return self
 
 
     def __repr__(self):
         return self.name
 
 
-    @abstractmethod
-    def get_valid_moves(self):
-        pass
-    
+    def promote(self) -> 'ShogiPiece':
+        '''The promoted instance of this piece'''
+        return type(self)(self.name, self.team, True)
 
-    # Pattern provided to this function dictates the directions in which the piece may move
-    def pattern_check(self, pattern: List[Tuple[int, int]], position: Tuple[int, int], board) -> List[str]:
+
+    def get_valid_moves(self, position: Tuple[int, int], board) -> List[int]:
+        '''
+        Walk the move tables of src.tables for this piece standing on `position`
+        '''
         src_r, src_c = position
+        src = src_r * 9 + src_c
+        key = (self.ptype, self.promoted, self.team)
+
+        moves = self.pattern_check(STEP_TABLE[key][src], src, board)
+        for ray in RAY_TABLE[key][src]:
+            moves.extend(self.loop_pattern_check(ray, src, board))
+        return moves
+
+
+    # 步兵、香車、桂馬走到之後再也不能動的位置只能升變
+    def _must_promote(self, dst: int) -> bool:
+        return not self.promoted and dst // 9 in MUST_PROMOTE_ROWS.get(self.ptype, {}).get(self.team, ())
+
+
+    # Targets provided to this function are the one-step destinations of the piece, already inside the board
+    def pattern_check(self, targets: List[Tuple[int, bool]], src: int, board) -> List[int]:
         opponent_team = -self.team
         possible_moves = []
 
-        for pr, pc in pattern:
-            dst_r, dst_c = src_r + pr, src_c + pc
+        for dst, can_promote in targets:
+            target = board[dst // 9][dst % 9]
 
-            if is_in_board((dst_r, dst_c)):
-                if not board[dst_r][dst_c] or board[dst_r][dst_c].team == opponent_team:
-                    move_notation = parse_pos_to_string((src_r, src_c), (dst_r, dst_c))
-                    possible_moves.append(move_notation)
+            if not target or target.team == opponent_team:
+                if not self._must_promote(dst):
+                    possible_moves.append(make_move(src, dst))
+
+                # 加上能升變的 move
+                if can_promote:
+                    possible_moves.append(make_move(src, dst, True))
 
-                    # 加上能升變的 move
-                    if not board[src_r][src_c].promoted:
-                        if (self.team != opponent_team and dst_r in self.OUR_PROMOTION_ZONE) or (self.team == opponent_team and dst_r in self.OPPONENT_PROMOTION_ZONE):
-                            move_notation += '+'
-                            possible_moves.append(move_notation)
-        
         return possible_moves
-    
 
-    # Loop check diagonals or cardinal directions in the case of a rook or bishop that can move like this
-    def loop_pattern_check(self, pattern: List[Tuple[int, int]], position: Tuple[int, int], board) -> List[str]:
-        src_r, src_c = position
+
+    # Loop check one ray of a rook, bishop or lance, ordered outward from src
+    def loop_pattern_check(self, ray: List[Tuple[int, bool]], src: int, board) -> List[int]:
         opponent_team = -self.team
         possible_moves = []
 
-        for pr, pc in pattern:
-            dst_r, dst_c = src_r + pr, src_c + pc
-
-            while is_in_board((dst_r, dst_c)):
-                if not board[dst_r][dst_c] or board[dst_r][dst_c].team == opponent_team:
-                    move_notation = parse_pos_to_string((src_r, src_c), (dst_r, dst_c))
-                    possible_moves.append(move_notation)
-
-                    # 加上能升變的 move
-                    if not board[src_r][src_c].promoted:
-                        if (self.team == 1 and dst_r in self.OUR_PROMOTION_ZONE) or (self.team == -1 and dst_r in self.OPPONENT_PROMOTION_ZONE):
-                            move_notation += '+'
-                            possible_moves.append(move_notation)
-                else:
-                    break
-
-                dst_r += pr
-                dst_c += pc
-        
+        for dst, can_promote in ray:
+            target = board[dst // 9][dst % 9]
+
+            if target and target.team != opponent_team:
+                break
+
+            if not self._must_promote(dst):
+                possible_moves.append(make_move(src, dst))
+
+            # 加上能升變的 move
+            if can_promote:
+                possible_moves.append(make_move(src, dst, True))
+
+            # 吃掉敵方棋子後不能再往前走
+            if target:
+                break
+
         return possible_moves
 
 
@@ -84,11 +124,8 @@ class King(ShogiPiece):
     [D, S, D],
     [D, D, D]
     '''
-    _king_pattern = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-    
-    def get_valid_moves(self, position: Tuple[int, int], board: List[List[int]]) -> List[str]:
-        moves = self.pattern_check(self._king_pattern, position, board)
-        return moves
+    __slots__ = ()
+    ptype = KING
 
 
 class Rook(ShogiPiece):
@@ -98,14 +135,8 @@ class Rook(ShogiPiece):
     [E, S, E],
     [D, E, D]
     '''
-    _rook_pattern = [(-1, 0), (0, -1), (0, 1), (1, 0)]
-    _king_pattern = [(-1, -1), (-1, 1), (1, -1), (1, 1)]  # Including promoted pattern.
-
-    def get_valid_moves(self, position: Tuple[int, int], board: List[List[int]]) -> List[str]:
-        moves = self.loop_pattern_check(self._rook_pattern, position, board)
-        if self.promoted:
-            moves.extend(self.pattern_check(self._king_pattern, position, board))
-        return moves
+    __slots__ = ()
+    ptype = ROOK
 
 
 class Bishop(ShogiPiece):
@@ -115,14 +146,8 @@ class Bishop(ShogiPiece):
     [E, S, E],
     [D, E, D]
     '''
-    _bishop_pattern = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-    _king_pattern = [(-1, 0), (0, -1), (0, 1), (1, 0)]  # Including promoted pattern.
-
-    def get_valid_moves(self, position: Tuple[int, int], board: List[List[int]]) -> List[str]:
-        moves = self.loop_pattern_check(self._bishop_pattern, position, board)
-        if self.promoted:
-            moves.extend(self.pattern_check(self._king_pattern, position, board))
-        return moves
+    __slots__ = ()
+    ptype = BISHOP
 
 
 class GGeneral(ShogiPiece):
@@ -132,15 +157,8 @@ class GGeneral(ShogiPiece):
     [D, S, D],
     [E, D, E]
     '''
-    _GGeneral_pattern = ShogiPiece._GGeneral_pattern
-
-    @property
-    def _pattern(self):
-        return self._GGeneral_pattern if self.team == 1 else [(-r, c) for r, c in self._GGeneral_pattern]
-
-    def get_valid_moves(self, position: Tuple[int, int], board: List[List[int]]) -> List[str]:
-        moves = self.pattern_check(self._pattern, position, board)
-        return moves
+    __slots__ = ()
+    ptype = GOLD
 
 
 class SGeneral(ShogiPiece):
@@ -150,20 +168,8 @@ class SGeneral(ShogiPiece):
     [E, S, E],
     [D, E, D]
     '''
-    _SGeneral_pattern = [(-1, -1), (-1, 0), (-1, 1), (1, -1), (1, 1)]
-    
-    @property
-    def _pattern(self):
-        return self._SGeneral_pattern if self.team == 1 else [(-r, c) for r, c in self._SGeneral_pattern]
-    
-    @property
-    def _pattern_promoted(self):
-        return self._GGeneral_pattern if self.team == 1 else [(-r, c) for r, c in self._GGeneral_pattern]
-    
-    def get_valid_moves(self, position: Tuple[int, int], board: List[List[int]]) -> List[str]:
-        pattern = self._pattern_promoted if self.promoted else self._pattern
-        moves = self.pattern_check(pattern, position, board)
-        return moves
+    __slots__ = ()
+    ptype = SILVER
 
 
 class Knight(ShogiPiece):
@@ -173,21 +179,8 @@ class Knight(ShogiPiece):
     [E, E, E],
     [E, S, E]
     '''
-    _Kinght_pattern = [(-2, -1), (-2, 1)]
-    _GGeneral_pattern = ShogiPiece._GGeneral_pattern
-    
-    @property
-    def _pattern(self):
-        return self._Kinght_pattern if self.team == 1 else [(-r, c) for r, c in self._Kinght_pattern]
-    
-    @property
-    def _pattern_promoted(self):
-        return self._GGeneral_pattern if self.team == 1 else [(-r, c) for r, c in self._GGeneral_pattern]
-    
-    def get_valid_moves(self, position: Tuple[int, int], board: List[List[int]]) -> List[str]:
-        pattern = self._pattern_promoted if self.promoted else self._pattern
-        moves = self.pattern_check(pattern, position, board)
-        return moves
+    __slots__ = ()
+    ptype = KNIGHT
 
 
 class Lance(ShogiPiece):
@@ -197,21 +190,8 @@ class Lance(ShogiPiece):
     [E, S, E],
     [E, E, E]
     '''
-    _Lance_pattern = [(-1, 0)]
-    _GGeneral_pattern = ShogiPiece._GGeneral_pattern
-
-    @property
-    def _pattern(self):
-        return self._Lance_pattern if self.team == 1 else [(-r, c) for r, c in self._Lance_pattern]
-    
-    @property
-    def _pattern_promoted(self):
-        return self._GGeneral_pattern if self.team == 1 else [(-r, c) for r, c in self._GGeneral_pattern]
-    
-    def get_valid_moves(self, position: Tuple[int, int], board: List[List[int]]) -> List[str]:
-        pattern = self._pattern_promoted if self.promoted else self._pattern
-        moves = self.loop_pattern_check(pattern, position, board)
-        return moves
+    __slots__ = ()
+    ptype = LANCE
 
 
 class Pawn(ShogiPiece):
@@ -221,18 +201,5 @@ class Pawn(ShogiPiece):
     [E, S, E],
     [E, E, E]
     '''
-    _Pawn_pattern = [(-1, 0)]
-    _GGeneral_pattern = ShogiPiece._GGeneral_pattern
-
-    @property
-    def _pattern(self):
-        return self._Pawn_pattern if self.team == 1 else [(-r, c) for r, c in self._Pawn_pattern]
-    
-    @property
-    def _pattern_promoted(self):
-        return self._GGeneral_pattern if self.team == 1 else [(-r, c) for r, c in self._GGeneral_pattern]
-    
-    def get_valid_moves(self, position: Tuple[int, int], board: List[List[int]]) -> List[str]:
-        pattern = self._pattern_promoted if self.promoted else self._pattern
-        moves = self.pattern_check(pattern, position, board)
-        return moves
\ No newline at end of file
+    __slots__ = ()
+    ptype = PAWN
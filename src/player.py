@@ -1,6 +1,106 @@
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional, Union
 
 from src.piece import ShogiPiece
+from src.utils import PIECE_TYPES, PAWN, ROOK, KING, hand_letter
+from src.zobrist import HAND_KEYS, hand_key
+
+
+class Hand:
+    '''
+    Pieces in hand as a count per piece type, indexed like BitboardPosition.pieces.
+    Still reads like the list of piece letters it replaces: iterating, `in`, len(), count(),
+    indexing, append() and remove() all work on the letters, which are written in the case
+    hand_letter gives the team. `key` is the Zobrist key of the hand, kept up to date by
+    every change of the counts made through add(), take(), append() and remove().
+    Only PAWN..ROOK can be held, counts[KING] stays 0.
+    '''
+    def __init__(self, team: int, pieces: Iterable[str] = ()) -> None:
+        self.team = team
+        self.counts = [0] * (KING + 1)
+        for piece_name in pieces:
+            ptype = PIECE_TYPES[piece_name.upper()]
+            if ptype == KING:
+                raise ValueError(f"{piece_name} can't be held in hand")
+            self.counts[ptype] += 1
+        self.key = hand_key(team, list(self))
+
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+    def __iter__(self) -> Iterator[str]:
+        for ptype, count in enumerate(self.counts):
+            if count:
+                letter = hand_letter(ptype, self.team)
+                for _ in range(count):
+                    yield letter
+
+
+    def __len__(self) -> int:
+        return sum(self.counts)
+
+
+    def __getitem__(self, idx):
+        return list(self)[idx]
+
+
+    def __contains__(self, piece_name: str) -> bool:
+        return self.count(piece_name) > 0
+
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Hand):
+            return self.team == other.team and self.counts == other.counts
+        if isinstance(other, list):
+            return sorted(self) == sorted(other)
+        return NotImplemented
+
+
+    def _ptype(self, piece_name: str) -> int:
+        '''Piece type of a letter written in this hand's case, 0 for any other letter'''
+        ptype = PIECE_TYPES.get(piece_name.upper(), 0)
+        return ptype if PAWN <= ptype <= ROOK and piece_name == hand_letter(ptype, self.team) else 0
+
+
+    def count(self, piece_name: str) -> int:
+        return self.counts[self._ptype(piece_name)]
+
+
+    def add(self, ptype: int) -> None:
+        '''One more piece of ptype in hand, the key follows'''
+        if not PAWN <= ptype <= ROOK:
+            raise ValueError(f"Piece type {ptype} can't be held in hand")
+        self.counts[ptype] += 1
+        self.key ^= HAND_KEYS[self.team][ptype][self.counts[ptype]]
+
+
+    def take(self, ptype: int) -> None:
+        '''One piece of ptype less in hand, the key follows'''
+        if not self.counts[ptype]:
+            raise ValueError(f"{hand_letter(ptype, self.team)} is not in hand")
+        self.key ^= HAND_KEYS[self.team][ptype][self.counts[ptype]]
+        self.counts[ptype] -= 1
+
+
+    def append(self, piece_name: str) -> None:
+        ptype = self._ptype(piece_name)
+        if not ptype:
+            raise ValueError(f"{piece_name} is not a piece letter of this hand")
+        self.add(ptype)
+
+
+    def remove(self, piece_name: str) -> None:
+        ptype = self._ptype(piece_name)
+        if not ptype:
+            raise ValueError(f"{piece_name} is not in hand")
+        self.take(ptype)
+
+
+    def piece_types(self) -> List[int]:
+        '''Distinct piece types held, each listed once however many there are'''
+        return [ptype for ptype in range(PAWN, ROOK + 1) if self.counts[ptype]]
+
 
 class ShogiPlayer:
     def __init__(self, name, team: int, captured: Optional[List[str]] = None) -> None:
@@ -11,10 +111,32 @@ class ShogiPlayer:
     def __repr__(self) -> str:
         return self.name
 
+    @property
+    def captured(self) -> Hand:
+        return self._captured
+
+    # Assigning a whole new hand (a Hand or a list of letters) recomputes its Zobrist key,
+    # the hand updates it incrementally afterwards
+    @captured.setter
+    def captured(self, captured: Union[Hand, Iterable[str]]) -> None:
+        self._captured = Hand(self.team, captured)
+
+    @property
+    def hand_key(self) -> int:
+        return self._captured.key
+
     # Pieces that the player has captured, printed every turn
     def capture(self, piece: ShogiPiece) -> None:
-        self.captured.append(piece.name)
+        self._captured.add(PIECE_TYPES[piece.name.upper()])
 
     # Piece that has been placed on to the board and removed from captured
-    def drop(self, piece: ShogiPiece) -> None:
-        self.captured.remove(piece)
\ No newline at end of file
+    def drop(self, piece_name: str) -> None:
+        self._captured.remove(piece_name)
+
+    # Take back a capture() when the move is unmade
+    def undo_capture(self, piece: ShogiPiece) -> None:
+        self._captured.take(PIECE_TYPES[piece.name.upper()])
+
+    # Return a dropped piece to the hand when the drop is unmade
+    def undo_drop(self, piece_name: str) -> None:
+        self._captured.add(PIECE_TYPES[piece_name.upper()])
@@ -0,0 +1,170 @@
+import mmap
+import os
+import struct
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from src.board import ShogiBoard
+from src.player import ShogiPlayer
+from src.sfen import INITIAL_SFEN
+
+# Binary game records.
+#
+# <name>      FILE_HEADER, then one game after the other:
+#               GAME_HEADER (move count, result, start SFEN length), the start SFEN in ASCII
+#               (empty for the initial position), then every move as a fixed-width MOVE
+#               holding its src.move integer
+# <name>.idx  one INDEX_ENTRY per game, the byte offset of its GAME_HEADER
+#
+# Both files are only ever appended to, and readers memory-map them.
+
+MAGIC = b'SHGR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sH')
+GAME_HEADER = struct.Struct('<IbH')   # moves, result (1, -1 or 0), SFEN length
+MOVE = struct.Struct('<I')
+INDEX_ENTRY = struct.Struct('<Q')
+
+
+class GameRecord(NamedTuple):
+    start_sfen: str
+    result: int
+    moves: List[int]
+
+
+def _index_path(path: str) -> str:
+    return path + '.idx'
+
+
+class RecordWriter:
+    '''
+    Append games to a record file and its index, creating both when missing
+    '''
+    def __init__(self, path: str) -> None:
+        self.path = path
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._data = open(path, 'ab')
+        self._index = open(_index_path(path), 'ab')
+        if is_new:
+            self._data.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+
+    def __enter__(self) -> 'RecordWriter':
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        self._data.close()
+        self._index.close()
+
+
+    def write_game(self, moves: List[int], result: int, start_sfen: Optional[str] = None) -> None:
+        sfen = b'' if start_sfen is None or start_sfen == INITIAL_SFEN else start_sfen.encode('ascii')
+
+        self._index.write(INDEX_ENTRY.pack(self._data.tell()))
+        self._data.write(GAME_HEADER.pack(len(moves), result, len(sfen)))
+        self._data.write(sfen)
+        self._data.write(struct.pack(f'<{len(moves)}I', *moves))
+        self._data.flush()
+        self._index.flush()
+
+
+class RecordReader:
+    '''
+    Memory-mapped reader: games are decoded only when asked for, by index or by iteration.
+    Without an index file the offsets are found by one scan over the game headers.
+    '''
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = FILE_HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise Exception("Incorrect record file!")
+
+        self._index_file, self._index, self._offsets = None, None, None
+        if os.path.exists(_index_path(path)) and os.path.getsize(_index_path(path)):
+            self._index_file = open(_index_path(path), 'rb')
+            self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        elif os.path.exists(_index_path(path)):
+            self._offsets = []
+        else:
+            self._offsets = self._scan_offsets()
+
+
+    def __enter__(self) -> 'RecordReader':
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        self._data.close()
+        self._file.close()
+        if self._index is not None:
+            self._index.close()
+            self._index_file.close()
+
+
+    def _scan_offsets(self) -> List[int]:
+        offsets, offset = [], FILE_HEADER.size
+        while offset < len(self._data):
+            offsets.append(offset)
+            move_count, _, sfen_length = GAME_HEADER.unpack_from(self._data, offset)
+            offset += GAME_HEADER.size + sfen_length + move_count * MOVE.size
+        return offsets
+
+
+    def __len__(self) -> int:
+        if self._index is not None:
+            return len(self._index) // INDEX_ENTRY.size
+        return len(self._offsets)
+
+
+    def _offset(self, idx: int) -> int:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Game index out of range")
+        if self._index is not None:
+            return INDEX_ENTRY.unpack_from(self._index, idx * INDEX_ENTRY.size)[0]
+        return self._offsets[idx]
+
+
+    def __getitem__(self, idx: int) -> GameRecord:
+        offset = self._offset(idx)
+        move_count, result, sfen_length = GAME_HEADER.unpack_from(self._data, offset)
+        offset += GAME_HEADER.size
+
+        sfen = self._data[offset:offset + sfen_length].decode('ascii') if sfen_length else INITIAL_SFEN
+        offset += sfen_length
+        moves = list(struct.unpack_from(f'<{move_count}I', self._data, offset))
+
+        return GameRecord(sfen, result, moves)
+
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+    def positions(self, idx: int) -> Iterator[Tuple[ShogiBoard, ShogiPlayer, int]]:
+        '''
+        Replay game idx on one ShogiBoard, yielding (board, player to move, move played) before every move.
+        The board is updated in place, copy what has to outlive the next step.
+        '''
+        record = self[idx]
+        players = {1: ShogiPlayer("Sente", 1), -1: ShogiPlayer("Gote", -1)}
+        board = ShogiBoard(players[1], players[-1], tt_memory_mb=0)  # Every position is seen once
+        board.set_sfen(record.start_sfen)
+
+        for move in record.moves:
+            player = players[board.side_to_move]
+            yield board, player, move
+            board.make_move(move, player)
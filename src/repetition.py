@@ -0,0 +1,85 @@
+from typing import Dict, List, Tuple
+
+# Sennichite (千日手): the same position, hands and side to move included, appearing for the
+# fourth time ends the game in a draw, unless one side gave check with every one of its moves
+# since the position first appeared (perpetual check), in which case that side loses.
+
+REPETITION_LIMIT = 4
+DRAW = 1e-4  # Game result of a draw, small and non-zero so that it still ends the game
+
+
+class RepetitionHistory:
+    '''
+    Stack of position keys of one game, one entry per position from the start.
+    Every push and pop is O(1): occurrences are counted per key and each entry carries
+    the number of consecutive checking moves each side had made up to it.
+    '''
+    def __init__(self, key: int) -> None:
+        self.reset(key)
+
+
+    def reset(self, key: int) -> None:
+        '''Start a new history from the position `key`'''
+        self.keys: List[int] = []
+        self._streaks: List[Tuple[int, int]] = []  # (team 1, team -1) consecutive checks
+        self._occurrences: Dict[int, List[int]] = {}
+        self._append(key, (0, 0))
+
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+    @property
+    def key(self) -> int:
+        '''Key of the current position'''
+        return self.keys[-1]
+
+
+    def _append(self, key: int, streaks: Tuple[int, int]) -> None:
+        self._occurrences.setdefault(key, []).append(len(self.keys))
+        self.keys.append(key)
+        self._streaks.append(streaks)
+
+
+    def push(self, key: int, team: int, gave_check: bool) -> None:
+        '''Record the position `key` reached by a move of `team`, which gave check or not'''
+        ours, theirs = self._streaks[-1]
+        if team == 1:
+            ours = ours + 1 if gave_check else 0
+        else:
+            theirs = theirs + 1 if gave_check else 0
+        self._append(key, (ours, theirs))
+
+
+    def pop(self) -> None:
+        '''Take back the last push, e.g. together with ShogiBoard.unmake_move'''
+        key = self.keys.pop()
+        self._streaks.pop()
+        occurrences = self._occurrences[key]
+        occurrences.pop()
+        if not occurrences:
+            del self._occurrences[key]
+
+
+    def repetitions(self) -> int:
+        '''How many times the current position has appeared, itself included'''
+        return len(self._occurrences[self.key])
+
+
+    def result(self) -> float:
+        '''
+        0 while the game goes on, DRAW on sennichite,
+        or the team that wins because the other one checked perpetually
+        '''
+        occurrences = self._occurrences[self.key]
+        if len(occurrences) < REPETITION_LIMIT:
+            return 0
+
+        # 從第一次出現到現在，一方的每一步都是王手就是連續王手的千日手，該方輸
+        moves_each = (occurrences[-1] - occurrences[0]) // 2
+        streaks = self._streaks[-1]
+        for team, streak in ((1, streaks[0]), (-1, streaks[1])):
+            if streak >= moves_each:
+                return -team
+        return DRAW
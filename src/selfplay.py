@@ -0,0 +1,228 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from src.game import ShogiGame
+from src.board import ShogiBoard
+from src.player import ShogiPlayer
+from src.engine import ShogiEngine
+from src.mcts import MCTS
+from src.move import move_to_string, string_to_move
+from src.record import RecordWriter
+from src import instrument
+
+# Headless self-play: games are driven through ShogiGame.play_move and
+# ShogiGame.get_game_ended without printing, spread over worker processes,
+# and every finished game is written as one JSON line.
+
+
+class RandomPolicy:
+    '''Uniformly random legal move'''
+    def __call__(self, board: ShogiBoard, player: ShogiPlayer, opponent: ShogiPlayer, ply: int, rng: random.Random) -> int:
+        moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+        return rng.choice(sorted(moves | drops))
+
+
+class EnginePolicy:
+    '''Move chosen by ShogiEngine within a time and/or node budget'''
+    def __init__(self, time_limit: Optional[float] = 0.1, node_limit: Optional[int] = None, max_depth: int = 64) -> None:
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self._engine = None
+
+
+    def __getstate__(self) -> Dict:
+        # 引擎與置換表留在各自的 process 重新建立
+        return {**self.__dict__, '_engine': None}
+
+
+    def __call__(self, board: ShogiBoard, player: ShogiPlayer, opponent: ShogiPlayer, ply: int, rng: random.Random) -> int:
+        if self._engine is None or self._engine.board is not board:
+            self._engine = ShogiEngine(board, self.max_depth, self.time_limit, self.node_limit)
+        return self._engine.search(player, opponent).move
+
+
+class MCTSPolicy:
+    '''Move chosen by MCTS with a playout and/or time budget, the tree is kept from move to move'''
+    def __init__(self, playouts: Optional[int] = 200, time_limit: Optional[float] = None, **options) -> None:
+        self.mcts = MCTS(playouts, time_limit, **options)
+
+
+    def __call__(self, board: ShogiBoard, player: ShogiPlayer, opponent: ShogiPlayer, ply: int, rng: random.Random) -> int:
+        return self.mcts.search(board, player).move
+
+
+class ScriptedPolicy:
+    '''
+    Play the moves of a fixed game line, indexed by ply, then hand over to `fallback`
+    '''
+    def __init__(self, moves: Sequence[str], fallback=None) -> None:
+        self.moves = list(moves)
+        self.fallback = fallback if fallback is not None else RandomPolicy()
+
+
+    def __call__(self, board: ShogiBoard, player: ShogiPlayer, opponent: ShogiPlayer, ply: int, rng: random.Random) -> int:
+        if ply < len(self.moves):
+            return string_to_move(self.moves[ply])
+        return self.fallback(board, player, opponent, ply, rng)
+
+
+def play_game(policies: Tuple, max_plies: int = 512, seed: Optional[int] = None) -> Dict:
+    '''
+    Play one game between policies[0] (team 1, moves first) and policies[1] (team -1).
+    winner is 1 or -1, or 0 for a repetition draw or when max_plies is reached.
+    With src.instrument enabled the record also carries the game's call statistics.
+    '''
+    with instrument.collect() as stats:
+        record = _play_game(policies, max_plies, seed)
+    if instrument.is_enabled():
+        record['stats'] = stats.as_dict()
+    return record
+
+
+def _play_game(policies: Tuple, max_plies: int, seed: Optional[int]) -> Dict:
+    rng = random.Random(seed)
+    game = ShogiGame()
+    players = game.players
+    moves, ply_times = [], []
+    winner = 0
+    start = time.perf_counter()
+
+    for ply in range(max_plies):
+        player, opponent = players[ply % 2], players[(ply + 1) % 2]
+        legal, drops = game.board.get_all_valid_moves_and_drops(game.board.board, player)
+
+        # 沒有合法走步 (被將死或無子可動) 就輸了
+        if not legal and not drops:
+            winner = opponent.team
+            break
+
+        ply_start = time.perf_counter()
+        move = policies[ply % 2](game.board, player, opponent, ply, rng)
+        game.play_move(move, player)
+        ply_times.append(time.perf_counter() - ply_start)
+        moves.append(move_to_string(move, player.team))
+
+        result = game.get_game_ended(game.board.board, players[0], players[1])
+        if result:
+            # 千日手和局的結果是接近 0 的小數
+            winner = 0 if abs(result) < 1 else (1 if result > 0 else -1)
+            break
+
+    return {
+        'seed': seed,
+        'moves': moves,
+        'winner': winner,
+        'plies': len(moves),
+        'ply_times': ply_times,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _play_indexed(task: Tuple[int, Tuple, int, Optional[int]]) -> Dict:
+    index, policies, max_plies, seed = task
+    record = play_game(policies, max_plies, seed)
+    record['game'] = index
+    return record
+
+
+def run_games(games: int, policies: Tuple, workers: int = 1, max_plies: int = 512, seed: Optional[int] = None) -> Iterator[Dict]:
+    '''
+    Yield the record of every game as soon as it finishes, games run on `workers` processes
+    '''
+    tasks = [(index, policies, max_plies, None if seed is None else seed + index) for index in range(games)]
+
+    if workers <= 1:
+        yield from map(_play_indexed, tasks)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(_play_indexed, tasks)
+
+
+def run_to_file(out: TextIO, games: int, policies: Tuple, workers: int = 1, max_plies: int = 512, seed: Optional[int] = None,
+                record_writer: Optional[RecordWriter] = None) -> Dict[str, float]:
+    '''
+    Stream every finished game to `out` as JSON lines, and to record_writer in the binary
+    format of src.record when given, then return the throughput summary
+    '''
+    start = time.perf_counter()
+    summary = {'games': 0, 'plies': 0, 'wins': {1: 0, -1: 0, 0: 0}, 'stats': instrument.CallStats()}
+
+    for record in run_games(games, policies, workers, max_plies, seed):
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        if record_writer is not None:
+            record_writer.write_game([string_to_move(move) for move in record['moves']], record['winner'])
+        summary['games'] += 1
+        summary['plies'] += record['plies']
+        summary['wins'][record['winner']] += 1
+        if 'stats' in record:
+            summary['stats'].merge(record['stats'])
+
+    summary['seconds'] = time.perf_counter() - start
+    summary['games_per_sec'] = summary['games'] / summary['seconds'] if summary['seconds'] > 0 else 0.0
+    summary['plies_per_sec'] = summary['plies'] / summary['seconds'] if summary['seconds'] > 0 else 0.0
+    return summary
+
+
+def make_policy(name: str, time_limit: float, node_limit: Optional[int], script: List[str], playouts: int = 200):
+    if name == 'random':
+        return RandomPolicy()
+    if name == 'engine':
+        return EnginePolicy(time_limit, node_limit)
+    if name == 'mcts':
+        return MCTSPolicy(playouts)
+    if name == 'scripted':
+        return ScriptedPolicy(script)
+    raise ValueError(f"Unknown policy: {name}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Play games between move-selection policies without a terminal")
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--sente', choices=['random', 'engine', 'mcts', 'scripted'], default='random', help="policy of team 1, who moves first")
+    parser.add_argument('--gote', choices=['random', 'engine', 'mcts', 'scripted'], default='random', help="policy of team -1")
+    parser.add_argument('--time', type=float, default=0.1, help="engine time per move in seconds")
+    parser.add_argument('--nodes', type=int, default=None, help="engine node budget per move")
+    parser.add_argument('--playouts', type=int, default=200, help="MCTS playouts per move")
+    parser.add_argument('--script', default='', help="opening line for scripted policies, ex: 'c3c4 g7g6'")
+    parser.add_argument('--max-plies', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--out', default='selfplay.jsonl')
+    parser.add_argument('--record', default=None, help="also append the games to this binary record file")
+    parser.add_argument('--stats', action='store_true', help="count and time the move generation hot paths of every game")
+    args = parser.parse_args(argv)
+
+    script = args.script.split()
+    policies = (make_policy(args.sente, args.time, args.nodes, script, args.playouts),
+                make_policy(args.gote, args.time, args.nodes, script, args.playouts))
+    record_writer = RecordWriter(args.record) if args.record else None
+    if args.stats:
+        # 在建立 worker process 之前打開，fork 出來的 process 也會被量測
+        instrument.enable()
+
+    try:
+        with open(args.out, 'w') as out:
+            summary = run_to_file(out, args.games, policies, args.workers, args.max_plies, args.seed, record_writer)
+    finally:
+        if record_writer is not None:
+            record_writer.close()
+
+    print(f"Games: {summary['games']} (Sente {summary['wins'][1]}, Gote {summary['wins'][-1]}, drawn or unfinished {summary['wins'][0]})")
+    print(f"Plies: {summary['plies']}")
+    print(f"Time: {summary['seconds']:.3f}s")
+    print(f"Games/sec: {summary['games_per_sec']:.2f}")
+    print(f"Plies/sec: {summary['plies_per_sec']:.0f}")
+    if args.stats:
+        print(summary['stats'].report())
+
+
+if __name__ == "__main__":
+    main()
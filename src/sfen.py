@@ -0,0 +1,129 @@
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from src.utils import PIECE_TYPES, PIECE_LETTERS, ROOK, BISHOP, GOLD, SILVER, KNIGHT, LANCE, PAWN, KING
+from src.bitboard import BitboardPosition, PROMOTED, piece_code
+
+# SFEN: "<board> <side to move> <hands> <move number>",
+# ex: lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL b - 1
+#
+# The board is written from the top row (board[0]) down and every row from left to right
+# (board[r][0] first), so SFEN squares map straight onto ShogiBoard.board.
+# Upper case is the side moving first (team 1, "b"), lower case team -1 ("w").
+# Note that ShogiBoard names it the other way round (team 1 pieces are lower case),
+# while hands agree: team 1 holds upper case letters in both.
+
+INITIAL_SFEN = "lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL b - 1"
+
+HAND_ORDER = [ROOK, BISHOP, GOLD, SILVER, KNIGHT, LANCE, PAWN]
+
+
+class SfenPosition(NamedTuple):
+    squares: Tuple[int, ...]      # Piece code per square, as in BitboardPosition.squares
+    hands: Dict[int, List[int]]   # Hand counts per team, indexed by piece type
+    side_to_move: int
+    move_number: int
+
+
+def _sfen_error() -> Exception:
+    return Exception("Incorrect SFEN!")
+
+
+def parse_sfen(sfen: str) -> SfenPosition:
+    '''
+    Parse a SFEN straight into piece codes and hand counts, no ShogiPiece objects are built
+    '''
+    fields = sfen.split()
+    if len(fields) == 3:
+        fields.append('1')
+    if len(fields) != 4:
+        raise _sfen_error()
+    board_field, side_field, hand_field, number_field = fields
+
+    rows = board_field.split('/')
+    if len(rows) != 9:
+        raise _sfen_error()
+
+    squares = []
+    for row in rows:
+        row_squares, promoted = [], False
+        for char in row:
+            if char == '+':
+                if promoted:
+                    raise _sfen_error()
+                promoted = True
+            elif char.isdigit():
+                # '+' 只能接在棋子前面
+                if promoted:
+                    raise _sfen_error()
+                row_squares.extend([0] * int(char))
+            elif char.upper() in PIECE_TYPES:
+                ptype = PIECE_TYPES[char.upper()]
+                if promoted and (ptype in (GOLD, KING)):
+                    raise _sfen_error()
+                row_squares.append(piece_code(ptype, 1 if char.isupper() else -1, promoted))
+                promoted = False
+            else:
+                raise _sfen_error()
+        if len(row_squares) != 9 or promoted:
+            raise _sfen_error()
+        squares.extend(row_squares)
+
+    if side_field not in ('b', 'w'):
+        raise _sfen_error()
+
+    hands = {1: [0] * (KING + 1), -1: [0] * (KING + 1)}
+    if hand_field != '-':
+        count = 0
+        for char in hand_field:
+            if char.isdigit():
+                count = count * 10 + int(char)
+            elif char.upper() in PIECE_TYPES and char.upper() != 'K':
+                hands[1 if char.isupper() else -1][PIECE_TYPES[char.upper()]] += count if count else 1
+                count = 0
+            else:
+                raise _sfen_error()
+
+    if not number_field.isdigit():
+        raise _sfen_error()
+
+    return SfenPosition(tuple(squares), hands, 1 if side_field == 'b' else -1, int(number_field))
+
+
+def position_from_sfen(sfen: str) -> BitboardPosition:
+    '''Bitboards of the SFEN board, the fast path when no ShogiBoard is needed'''
+    position = BitboardPosition()
+    for sq, code in enumerate(parse_sfen(sfen).squares):
+        if code:
+            position.put_code(sq, code)
+    return position
+
+
+def _sfen_letter(code: int) -> str:
+    letter = PIECE_LETTERS[abs(code) & ~PROMOTED]
+    letter = letter if code > 0 else letter.lower()
+    return '+' + letter if abs(code) & PROMOTED else letter
+
+
+def to_sfen(squares: Sequence[int], hands: Dict[int, Sequence[int]], side_to_move: int, move_number: int = 1) -> str:
+    rows = []
+    for r in range(9):
+        row, empty = '', 0
+        for code in squares[r * 9:r * 9 + 9]:
+            if not code:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            row += _sfen_letter(code)
+        rows.append(row + str(empty) if empty else row)
+
+    hand = ''
+    for team in (1, -1):
+        for ptype in HAND_ORDER:
+            count = hands[team][ptype]
+            if count:
+                letter = PIECE_LETTERS[ptype] if team == 1 else PIECE_LETTERS[ptype].lower()
+                hand += (str(count) if count > 1 else '') + letter
+
+    return f"{'/'.join(rows)} {'b' if side_to_move == 1 else 'w'} {hand or '-'} {move_number}"
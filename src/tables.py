@@ -0,0 +1,87 @@
+from typing import Dict, List, Tuple
+
+from src.utils import PAWN, LANCE, KNIGHT, SILVER, GOLD, BISHOP, ROOK, KING
+
+# Move tables built once at import.
+# Offsets are (row, col) steps for team 1, which moves towards row 0; team -1 mirrors the rows.
+# For every (piece type, promoted, team) and source square the tables list the destination
+# squares inside the board, each paired with whether the move may also be played as a promotion.
+
+KING_PATTERN = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+ORTHOGONAL_PATTERN = [(-1, 0), (0, -1), (0, 1), (1, 0)]
+DIAGONAL_PATTERN = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+GOLD_PATTERN = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, 0)]
+SILVER_PATTERN = [(-1, -1), (-1, 0), (-1, 1), (1, -1), (1, 1)]
+KNIGHT_PATTERN = [(-2, -1), (-2, 1)]
+FORWARD_PATTERN = [(-1, 0)]
+
+# (step offsets, slide directions) of every piece kind
+PIECE_PATTERNS = {
+    (KING, False): (KING_PATTERN, []),
+    (ROOK, False): ([], ORTHOGONAL_PATTERN),
+    (ROOK, True): (DIAGONAL_PATTERN, ORTHOGONAL_PATTERN),
+    (BISHOP, False): ([], DIAGONAL_PATTERN),
+    (BISHOP, True): (ORTHOGONAL_PATTERN, DIAGONAL_PATTERN),
+    (GOLD, False): (GOLD_PATTERN, []),
+    (SILVER, False): (SILVER_PATTERN, []),
+    (SILVER, True): (GOLD_PATTERN, []),
+    (KNIGHT, False): (KNIGHT_PATTERN, []),
+    (KNIGHT, True): (GOLD_PATTERN, []),
+    (LANCE, False): ([], FORWARD_PATTERN),
+    (LANCE, True): (GOLD_PATTERN, []),
+    (PAWN, False): (FORWARD_PATTERN, []),
+    (PAWN, True): (GOLD_PATTERN, []),
+}
+
+PROMOTABLE = {PAWN, LANCE, KNIGHT, SILVER, BISHOP, ROOK}
+PROMOTION_ROWS = {1: (0, 1, 2), -1: (6, 7, 8)}
+# Rows an unpromoted piece could never move on from, it may only arrive there promoted
+MUST_PROMOTE_ROWS = {
+    PAWN: {1: (0,), -1: (8,)},
+    LANCE: {1: (0,), -1: (8,)},
+    KNIGHT: {1: (0, 1), -1: (7, 8)},
+}
+
+Target = Tuple[int, bool]  # (destination square, promotion allowed: the move starts or ends in the zone)
+TableKey = Tuple[int, bool, int]  # (piece type, promoted, team)
+
+
+def _target(ptype: int, promoted: bool, team: int, src_r: int, r: int, c: int) -> Target:
+    in_zone = r in PROMOTION_ROWS[team] or src_r in PROMOTION_ROWS[team]
+    return r * 9 + c, ptype in PROMOTABLE and not promoted and in_zone
+
+
+def _build_tables() -> Tuple[Dict[TableKey, List[List[Target]]], Dict[TableKey, List[List[List[Target]]]]]:
+    step_table, ray_table = {}, {}
+
+    for (ptype, promoted), (steps, slides) in PIECE_PATTERNS.items():
+        for team in (1, -1):
+            step_targets, rays = [], []
+
+            for sq in range(81):
+                src_r, src_c = divmod(sq, 9)
+
+                step_targets.append([_target(ptype, promoted, team, src_r, src_r + dr * team, src_c + dc)
+                                     for dr, dc in steps
+                                     if 0 <= src_r + dr * team <= 8 and 0 <= src_c + dc <= 8])
+
+                sq_rays = []
+                for dr, dc in slides:
+                    ray = []
+                    r, c = src_r + dr * team, src_c + dc
+                    while 0 <= r <= 8 and 0 <= c <= 8:
+                        ray.append(_target(ptype, promoted, team, src_r, r, c))
+                        r, c = r + dr * team, c + dc
+                    if ray:
+                        sq_rays.append(ray)
+                rays.append(sq_rays)
+
+            step_table[(ptype, promoted, team)] = step_targets
+            ray_table[(ptype, promoted, team)] = rays
+
+    return step_table, ray_table
+
+
+# STEP_TABLE[(ptype, promoted, team)][sq]: one-step destinations
+# RAY_TABLE[(ptype, promoted, team)][sq]: sliding rays, each ordered outward from sq
+STEP_TABLE, RAY_TABLE = _build_tables()
@@ -0,0 +1,67 @@
+from typing import Any, Dict, Optional, Tuple
+
+
+class TranspositionTable:
+    '''
+    Fixed-size hash table keyed by Zobrist key.
+
+    The number of slots comes from a memory budget, every key maps to exactly one slot.
+    Slots are only allocated when first written, so a table that is hardly used costs little.
+    A budget of 0 or None gives a table that stores nothing, ex: for throwaway boards.
+    On a collision the new entry replaces the stored one if the stored entry is from an
+    older generation or was searched to a depth no greater than the new one (depth-preferred
+    replacement with aging). Results that are not search scores use depth 0 and always replace.
+    Values should be small: ENTRY_BYTES is measured with the values stored by ShogiBoard and
+    ShogiEngine, a legal move array or a (score, bound, move) tuple.
+    '''
+    # Measured cost of one filled slot, dict entry and (key, value, depth, generation) tuple
+    # included: ~560 bytes caching the 103 moves of the perft middlegame, ~270 for a search entry
+    ENTRY_BYTES = 576
+
+    def __init__(self, memory_mb: Optional[float] = 16) -> None:
+        self.size = int((memory_mb or 0) * 1024 * 1024) // self.ENTRY_BYTES
+        if memory_mb:
+            self.size = max(1, self.size)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+    def clear(self) -> None:
+        self._slots: Dict[int, Tuple[int, Any, int, int]] = {}  # slot -> (key, value, depth, generation)
+
+
+    def new_generation(self) -> None:
+        '''Age every stored entry, e.g. once per move of a game or per search'''
+        self.generation += 1
+
+
+    def probe(self, key: int) -> Optional[Any]:
+        entry = self._slots.get(key % self.size) if self.size else None
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        return None
+
+
+    def probe_depth(self, key: int) -> int:
+        '''Depth the stored entry for key was computed at, -1 if there is none'''
+        entry = self._slots.get(key % self.size) if self.size else None
+        return entry[2] if entry is not None and entry[0] == key else -1
+
+
+    def store(self, key: int, value: Any, depth: int = 0) -> None:
+        if not self.size:
+            return
+        idx = key % self.size
+        entry = self._slots.get(idx)
+
+        if entry is None or entry[0] == key or entry[3] != self.generation or depth >= entry[2]:
+            self._slots[idx] = (key, value, depth, self.generation)
@@ -0,0 +1,217 @@
+import sys
+import threading
+from typing import Dict, List, Optional, TextIO
+
+from src.board import ShogiBoard
+from src.player import ShogiPlayer
+from src.engine import ShogiEngine, SearchResult, MATE_SCORE
+from src.move import move_to_usi, usi_to_move
+from src.sfen import INITIAL_SFEN
+from src.transposition import TranspositionTable
+
+# USI (Universal Shogi Interface) front-end, run as: python -m src.usi
+#
+# Commands are read line by line on the main thread. `go` starts the search on a background
+# thread, so `stop`, `ponderhit` and `quit` are answered while it runs. `go ponder` and
+# `go infinite` search without a clock and only print bestmove after `ponderhit` or `stop`;
+# on a ponder hit the running search simply gets its clock, keeping every completed
+# iteration and the transposition table.
+
+ENGINE_NAME = "Shogi"
+ENGINE_AUTHOR = "ronchen0927"
+
+MOVES_TO_GO = 30      # Share of the remaining time spent on one move
+MARGIN_MS = 100       # Kept back for the GUI and the transport
+MIN_THINK_MS = 10
+
+GO_PARAMETERS = ('btime', 'wtime', 'byoyomi', 'binc', 'winc', 'movetime', 'depth', 'nodes')
+
+
+def time_for_move(params: Dict[str, int], team: int) -> Optional[float]:
+    '''
+    Seconds to think from the `go` parameters (milliseconds), None when no clock is given
+    '''
+    if 'movetime' in params:
+        return max(MIN_THINK_MS, params['movetime'] - MARGIN_MS) / 1000
+
+    remaining = params.get('btime' if team == 1 else 'wtime')
+    increment = params.get('binc' if team == 1 else 'winc', 0)
+    byoyomi = params.get('byoyomi', 0)
+    if remaining is None and not increment and not byoyomi:
+        return None
+
+    budget = (remaining or 0) // MOVES_TO_GO + increment + byoyomi
+    return max(MIN_THINK_MS, budget - MARGIN_MS) / 1000
+
+
+def format_score(score: int) -> str:
+    '''USI score field: centipawns, or plies to mate (negative when being mated)'''
+    if abs(score) >= MATE_SCORE - 1000:
+        plies = MATE_SCORE - abs(score)
+        return f"mate {plies if score > 0 else -plies}"
+    return f"cp {score}"
+
+
+class UsiEngine:
+    '''
+    One USI session over `output`, feed it the GUI's lines with handle()
+    '''
+    def __init__(self, output: TextIO = sys.stdout, tt_memory_mb: float = 16) -> None:
+        self.output = output
+        self.players = {1: ShogiPlayer("Sente", 1), -1: ShogiPlayer("Gote", -1)}
+        self.board = ShogiBoard(self.players[1], self.players[-1])
+        self.board.set_sfen(INITIAL_SFEN)
+        self.engine = ShogiEngine(self.board, time_limit=None, tt_memory_mb=tt_memory_mb)
+
+        self._output_lock = threading.Lock()
+        self._thread = None
+        self._release = threading.Event()  # 思考中 (ponder/infinite) 收到 ponderhit 或 stop 才輸出 bestmove
+        self._time_limit = None            # Clock the ponder search gets on ponderhit
+
+
+    def send(self, line: str) -> None:
+        with self._output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+
+    def run(self, input: TextIO = sys.stdin) -> None:
+        for line in input:
+            try:
+                if not self.handle(line):
+                    break
+            except Exception as e:
+                self.send(f"info string {e}")
+        self.stop()
+
+
+    def handle(self, line: str) -> bool:
+        '''Answer one command, False once the session is over'''
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command == 'usi':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send("option name USI_Hash type spin default 16 min 1 max 1024")
+            self.send("option name USI_Ponder type check default true")
+            self.send("usiok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'usinewgame':
+            self.stop()
+            self.engine.tt.clear()
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            self.stop()
+            self.go(args)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'gameover':
+            self.stop()
+        elif command == 'quit':
+            return False
+        return True
+
+
+    def set_option(self, args: List[str]) -> None:
+        # setoption name <id> [value <x>]
+        if 'name' not in args:
+            return
+        value_at = args.index('value') if 'value' in args else len(args)
+        name = ' '.join(args[args.index('name') + 1:value_at])
+        value = ' '.join(args[value_at + 1:])
+
+        if name == 'USI_Hash' and value.isdigit():
+            self.engine.tt = TranspositionTable(int(value))
+
+
+    def set_position(self, args: List[str]) -> None:
+        '''position startpos|sfen <sfen> [moves <move> ...]'''
+        moves_at = args.index('moves') if 'moves' in args else len(args)
+        if args and args[0] == 'startpos':
+            sfen = INITIAL_SFEN
+        elif args and args[0] == 'sfen':
+            sfen = ' '.join(args[1:moves_at])
+        else:
+            raise Exception("Incorrect position command!")
+
+        self.board.set_sfen(sfen)
+        for notation in args[moves_at + 1:]:
+            self.board.execute_move(usi_to_move(notation), self.players[self.board.side_to_move])
+
+
+    def go(self, args: List[str]) -> None:
+        '''go [ponder] [infinite] [btime x] [wtime x] [byoyomi x] [binc x] [winc x] [movetime x] [depth x] [nodes x]'''
+        params = {}
+        for name, value in zip(args, args[1:]):
+            if name in GO_PARAMETERS and value.lstrip('-').isdigit():
+                params[name] = int(value)
+        waits = 'ponder' in args or 'infinite' in args
+
+        team = self.board.side_to_move
+        self._time_limit = None if 'infinite' in args else time_for_move(params, team)
+        self.engine.max_depth = params.get('depth', 64)
+        self.engine.node_limit = params.get('nodes')
+        self.engine.time_limit = None if waits else self._time_limit
+        self.engine.stop_requested = False
+        self._release.clear()
+        if not waits:
+            self._release.set()
+
+        self._thread = threading.Thread(target=self._search, args=(self.players[team], self.players[-team]), daemon=True)
+        self._thread.start()
+
+
+    def _search(self, player: ShogiPlayer, opponent: ShogiPlayer) -> None:
+        result = self.engine.search(player, opponent, self._send_info)
+        # ponder 與 infinite 在 GUI 回應前不能送出 bestmove
+        self._release.wait()
+
+        if result.move is None:
+            self.send("bestmove resign")
+        elif len(result.pv) > 1:
+            self.send(f"bestmove {move_to_usi(result.move)} ponder {move_to_usi(result.pv[1])}")
+        else:
+            self.send(f"bestmove {move_to_usi(result.move)}")
+
+
+    def _send_info(self, result: SearchResult) -> None:
+        ms = int(result.seconds * 1000)
+        nps = int(result.nodes / result.seconds) if result.seconds > 0 else 0
+        pv = ' '.join(move_to_usi(move) for move in result.pv)
+        self.send(f"info depth {result.depth} score {format_score(result.score)} nodes {result.nodes} nps {nps} time {ms} pv {pv}")
+
+
+    def ponderhit(self) -> None:
+        '''The predicted move was played: keep searching, now against the clock'''
+        if self._thread is None:
+            return
+        self.engine.limit_time(self._time_limit)
+        self._release.set()
+
+
+    def stop(self) -> None:
+        '''Stop the running search, if any, and wait until its bestmove is sent'''
+        if self._thread is None:
+            return
+        self.engine.stop()
+        self._release.set()
+        self._thread.join()
+        self._thread = None
+
+
+def main() -> None:
+    UsiEngine().run()
+
+
+if __name__ == "__main__":
+    main()
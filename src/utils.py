@@ -29,4 +29,14 @@ def parse_drop_to_string(piece_name: str, dst: Tuple[int, int]) -> str:
     
     notation = piece_name + '*' + str_dst_c + str_dst_r
 
-    return notation
\ No newline at end of file
+    return notation
+
+# Piece types shared by the bitboard and the integer move encoding
+PAWN, LANCE, KNIGHT, SILVER, GOLD, BISHOP, ROOK, KING = range(1, 9)
+
+PIECE_TYPES = {'P': PAWN, 'L': LANCE, 'N': KNIGHT, 'S': SILVER, 'G': GOLD, 'B': BISHOP, 'R': ROOK, 'K': KING}
+PIECE_LETTERS = {ptype: letter for letter, ptype in PIECE_TYPES.items()}
+
+def hand_letter(ptype: int, team: int) -> str:
+    '''Letter of a piece in the team's hand: captured pieces keep the opponent's letter case'''
+    return PIECE_LETTERS[ptype] if team == 1 else PIECE_LETTERS[ptype].lower()
@@ -0,0 +1,10 @@
+from src.utils import PAWN, LANCE, KNIGHT, SILVER, GOLD, BISHOP, ROOK, KING
+from src.bitboard import PROMOTED
+
+# Material values in centipawns, by piece type and by promoted piece type (ptype | PROMOTED).
+# Shared by the engine's evaluation and the static exchange evaluation of src.movepicker.
+PIECE_VALUES = {
+    PAWN: 100, LANCE: 300, KNIGHT: 400, SILVER: 500, GOLD: 600, BISHOP: 800, ROOK: 1000, KING: 0,
+    PAWN | PROMOTED: 600, LANCE | PROMOTED: 600, KNIGHT | PROMOTED: 600, SILVER | PROMOTED: 600,
+    BISHOP | PROMOTED: 1100, ROOK | PROMOTED: 1300,
+}
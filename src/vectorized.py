@@ -0,0 +1,260 @@
+from typing import List, Sequence, Set, Tuple
+
+from src.utils import PAWN, KING
+from src.tables import PIECE_PATTERNS, PROMOTABLE, MUST_PROMOTE_ROWS
+from src.bitboard import BitboardPosition, PROMOTED
+from src.mate import is_checkmate
+from src.move import SRC_SHIFT, PROMOTION_FLAG, DROP_SHIFT
+
+try:
+    import numpy as np
+except ImportError:  # numpy 只有批次走法產生時才需要
+    np = None
+
+# Move generation for many positions at once over NumPy arrays.
+#
+# A PositionBatch stacks the piece codes of N positions as an (N, 9, 9) array. Attacks are
+# found per piece kind with whole-array shifts, sliders by shifting again through empty
+# squares until the rays stop. For moves every position is first turned so that its side
+# to move is team 1 (rotated 180 degrees, codes negated), so all of them move the same way.
+# Candidate moves that could expose the king (king moves, moves off a line through the king,
+# everything when in check) are then played on copies of their boards, one row per move, and
+# the ones that leave the mover's king attacked are dropped. Pawn drops that would mate are
+# dropped as well after a check with src.mate, and the result is the legal moves exactly
+# as ShogiBoard.get_all_valid_moves_and_drops does.
+
+CHUNK = 1 << 14  # Candidate moves checked for legality per array pass
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("src.vectorized requires numpy, pip install numpy")
+
+
+def _shift(mask, dr: int, dc: int):
+    '''Move every square of an (N, 9, 9) mask by (dr, dc), squares leaving the board are lost'''
+    out = np.zeros_like(mask)
+    out[:, max(dr, 0):9 + min(dr, 0), max(dc, 0):9 + min(dc, 0)] = mask[:, max(-dr, 0):9 - max(dr, 0), max(-dc, 0):9 - max(dc, 0)]
+    return out
+
+
+def _piece_kinds(team: int):
+    '''(piece code, piece type, promoted, steps, slides) of the team, offsets turned for the team'''
+    for (ptype, promoted), (steps, slides) in PIECE_PATTERNS.items():
+        code = team * (ptype | PROMOTED if promoted else ptype)
+        yield code, ptype, promoted, [(dr * team, dc) for dr, dc in steps], [(dr * team, dc) for dr, dc in slides]
+
+
+def _build_lines():
+    '''LINES[a, b]: b is on one of the eight lines through a'''
+    lines = np.zeros((81, 81), dtype=bool)
+    for a in range(81):
+        for b in range(81):
+            dr, dc = b // 9 - a // 9, b % 9 - a % 9
+            lines[a, b] = a != b and (dr == 0 or dc == 0 or abs(dr) == abs(dc))
+    return lines
+
+
+LINES = _build_lines() if np is not None else None
+
+
+def attack_maps(boards, team: int):
+    '''(N, 9, 9) bool: squares attacked by the team on each (N, 9, 9) board of piece codes'''
+    _require_numpy()
+    attacks = np.zeros(boards.shape, dtype=bool)
+    empty = boards == 0
+
+    for code, _, _, steps, slides in _piece_kinds(team):
+        pieces = boards == code
+        if not pieces.any():
+            continue
+        for dr, dc in steps:
+            attacks |= _shift(pieces, dr, dc)
+        for dr, dc in slides:
+            ray = _shift(pieces, dr, dc)
+            while ray.any():
+                attacks |= ray
+                ray = _shift(ray & empty, dr, dc)
+    return attacks
+
+
+class PositionBatch:
+    '''
+    N positions as arrays: squares (N, 9, 9) int8 piece codes as in BitboardPosition.squares,
+    hands (N, 2, KING + 1) hand counts of team 1 and team -1 by piece type, side (N,) side to move
+    '''
+    def __init__(self, squares, hands, side) -> None:
+        _require_numpy()
+        self.squares = np.asarray(squares, dtype=np.int8).reshape(-1, 9, 9)
+        self.hands = np.asarray(hands, dtype=np.int16).reshape(-1, 2, KING + 1)
+        self.side = np.asarray(side, dtype=np.int8).reshape(-1)
+
+
+    @classmethod
+    def from_boards(cls, boards: Sequence) -> 'PositionBatch':
+        '''Stack the positions of ShogiBoard objects'''
+        _require_numpy()
+        squares = np.array([board.position.squares for board in boards], dtype=np.int8)
+        hands = np.array([[board.players[1].captured.counts, board.players[-1].captured.counts] for board in boards], dtype=np.int16)
+        side = np.array([board.side_to_move for board in boards], dtype=np.int8)
+        return cls(squares, hands, side)
+
+
+    def __len__(self) -> int:
+        return len(self.side)
+
+
+    def attack_maps(self, team: int):
+        '''(N, 9, 9) bool: squares attacked by `team` in every position'''
+        return attack_maps(self.squares, team)
+
+
+    def _relative(self):
+        '''Boards and hands turned so that the side to move is team 1 everywhere'''
+        flip = self.side == -1
+        boards = self.squares.copy()
+        boards[flip] = -boards[flip][:, ::-1, ::-1]
+        hands = np.where(flip[:, None], self.hands[:, 1], self.hands[:, 0])
+        return boards, hands
+
+
+    def in_check(self):
+        '''(N,) bool: the side to move is in check'''
+        boards, _ = self._relative()
+        kings = boards == KING
+        return (attack_maps(boards, -1) & kings).any(axis=(1, 2))
+
+
+    def _board_candidates(self, boards) -> Tuple:
+        '''Pseudo-legal board moves of team 1: position, source, destination, promotion'''
+        own, empty = boards > 0, boards == 0
+        found = []
+
+        def collect(destinations, dr: int, dc: int, distance: int, promotable: bool, must_promote_rows: int) -> None:
+            n, r, c = np.nonzero(destinations)
+            src = (r - dr * distance) * 9 + c - dc * distance
+            dst = r * 9 + c
+            stays = r >= must_promote_rows
+            found.append((n[stays], src[stays], dst[stays], np.zeros(int(stays.sum()), dtype=bool)))
+            if promotable:
+                zone = (r <= 2) | (r - dr * distance <= 2)
+                found.append((n[zone], src[zone], dst[zone], np.ones(int(zone.sum()), dtype=bool)))
+
+        for code, ptype, promoted, steps, slides in _piece_kinds(1):
+            pieces = boards == code
+            if not pieces.any():
+                continue
+            promotable = ptype in PROMOTABLE and not promoted
+            must_promote_rows = 0 if promoted or ptype not in MUST_PROMOTE_ROWS else len(MUST_PROMOTE_ROWS[ptype][1])
+            for dr, dc in steps:
+                collect(_shift(pieces, dr, dc) & ~own, dr, dc, 1, promotable, must_promote_rows)
+            for dr, dc in slides:
+                ray, distance = _shift(pieces, dr, dc), 1
+                while ray.any():
+                    collect(ray & ~own, dr, dc, distance, promotable, must_promote_rows)
+                    ray, distance = _shift(ray & empty, dr, dc), distance + 1
+
+        if not found:
+            empty_int = np.zeros(0, dtype=np.int64)
+            return empty_int, empty_int, empty_int, np.zeros(0, dtype=bool)
+        return tuple(np.concatenate(column) for column in zip(*found))
+
+
+    def _drop_candidates(self, boards, hands) -> Tuple:
+        '''Drops of team 1 that keep the placement and nifu rules: position, piece type, destination'''
+        empty = boards == 0
+        rows = np.arange(9)[None, :, None]
+        found = []
+
+        for ptype in range(PAWN, KING):
+            holders = hands[:, ptype] > 0
+            if not holders.any():
+                continue
+            targets = empty & holders[:, None, None]
+            if ptype in MUST_PROMOTE_ROWS:
+                targets &= rows >= len(MUST_PROMOTE_ROWS[ptype][1])
+            if ptype == PAWN:
+                # 二步: 已經有自己步兵 (未升變) 的直行不能再打
+                targets &= ~(boards == PAWN).any(axis=1, keepdims=True)
+            n, r, c = np.nonzero(targets)
+            found.append((n, np.full(len(n), ptype), r * 9 + c))
+
+        if not found:
+            empty_int = np.zeros(0, dtype=np.int64)
+            return empty_int, empty_int, empty_int
+        return tuple(np.concatenate(column) for column in zip(*found))
+
+
+    def _keeps_king_safe(self, boards, n, src, dst, promote, drop):
+        '''Play every candidate on a copy of its board and keep those not leaving team 1 in check'''
+        safe = np.zeros(len(n), dtype=bool)
+        for start in range(0, len(n), CHUNK):
+            part = slice(start, start + CHUNK)
+            rows = np.arange(len(n[part]))
+            after = boards[n[part]].reshape(-1, 81).copy()
+
+            is_drop = drop[part] > 0
+            moved = np.where(is_drop, drop[part], after[rows, src[part]])
+            moved = np.where(promote[part], moved | PROMOTED, moved)
+            after[rows[~is_drop], src[part][~is_drop]] = 0
+            after[rows, dst[part]] = moved
+
+            after = after.reshape(-1, 9, 9)
+            safe[part] = ~(attack_maps(after, -1) & (after == KING)).any(axis=(1, 2))
+        return safe
+
+
+    def legal_moves(self) -> Tuple:
+        '''
+        Legal moves and drops of the side to move in every position, as two arrays:
+        the position index of each move and the move encoded as in src.move
+        '''
+        boards, hands = self._relative()
+        enemy_hands = np.where((self.side == -1)[:, None], self.hands[:, 0], self.hands[:, 1])
+        n, src, dst, promote = self._board_candidates(boards)
+        drop_n, drop_type, drop_dst = self._drop_candidates(boards, hands)
+
+        n = np.concatenate([n, drop_n])
+        src = np.concatenate([src, np.zeros(len(drop_n), dtype=src.dtype)])
+        dst = np.concatenate([dst, drop_dst])
+        promote = np.concatenate([promote, np.zeros(len(drop_n), dtype=bool)])
+        drop = np.concatenate([np.zeros(len(promote) - len(drop_n), dtype=np.int64), drop_type])
+
+        # 沒被將軍時，打入與不在王將八方直線上的棋子移動都不會讓王將被將軍，只需檢查其餘的走步
+        flat = boards.reshape(-1, 81)
+        kings = np.argmax(flat == KING, axis=1)
+        in_check = (attack_maps(boards, -1).reshape(-1, 81) & (flat == KING)).any(axis=1)
+        is_drop = drop > 0
+        moved = flat[n, src]
+        suspect = in_check[n] | (~is_drop & ((moved == KING) | LINES[kings[n], src]))
+
+        safe = np.ones(len(n), dtype=bool)
+        safe[suspect] = self._keeps_king_safe(boards, n[suspect], src[suspect], dst[suspect], promote[suspect], drop[suspect])
+        n, src, dst, promote, drop = n[safe], src[safe], dst[safe], promote[safe], drop[safe]
+
+        # 打步詰: 打在對方王將正前方的步兵不能將死對方，這種打入很少，逐一交給 src.mate 判斷
+        legal = np.ones(len(n), dtype=bool)
+        for idx in np.flatnonzero((drop == PAWN) & (dst >= 9) & (flat[n, np.maximum(dst - 9, 0)] == -KING)).tolist():
+            after = flat[n[idx]].copy()
+            after[dst[idx]] = PAWN
+            position = BitboardPosition()
+            for sq in np.flatnonzero(after).tolist():
+                position.put_code(sq, int(after[sq]))
+            legal[idx] = not is_checkmate(position, -1, enemy_hands[n[idx]].tolist())
+        n, src, dst, promote, drop = n[legal], src[legal], dst[legal], promote[legal], drop[legal]
+
+        # 轉回原本的方向
+        flip = self.side[n] == -1
+        src = np.where(flip & (drop == 0), 80 - src, src)
+        dst = np.where(flip, 80 - dst, dst)
+        moves = dst | np.where(drop == 0, src << SRC_SHIFT, 0) | np.where(promote, PROMOTION_FLAG, 0) | (drop << DROP_SHIFT)
+        return n, moves.astype(np.int64)
+
+
+    def legal_move_sets(self) -> List[Set[int]]:
+        '''Legal moves and drops of every position as a set of src.move integers'''
+        n, moves = self.legal_moves()
+        sets = [set() for _ in range(len(self))]
+        for idx, move in zip(n.tolist(), moves.tolist()):
+            sets[idx].add(move)
+        return sets
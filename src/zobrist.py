@@ -0,0 +1,38 @@
+import random
+from typing import List
+
+from src.utils import PIECE_TYPES
+from src.bitboard import BitboardPosition, STEP_ATTACKS, iter_squares
+
+# Zobrist keys: every (piece code, square), (team, piece type, count in hand) and the side to move
+# get a random 64-bit key, and a position's key is the XOR of the keys of everything in it,
+# so a move only has to XOR out what it removes and XOR in what it adds.
+
+MAX_HAND_COUNT = 38
+
+_rng = random.Random(20240531)
+
+PIECE_KEYS = {code: [_rng.getrandbits(64) for _ in range(81)] for code in sorted(STEP_ATTACKS)}
+HAND_KEYS = {team: [[_rng.getrandbits(64) for _ in range(MAX_HAND_COUNT + 1)] for _ in range(9)] for team in (1, -1)}
+SIDE_KEY = _rng.getrandbits(64)  # XORed in while team -1 is to move
+
+# Salts keeping the different results cached for one position apart in a TranspositionTable
+MOVES_KEYS = {team: _rng.getrandbits(64) for team in (1, -1)}
+CHECK_KEYS = {team: _rng.getrandbits(64) for team in (1, -1)}
+
+
+def board_key(position: BitboardPosition) -> int:
+    key = 0
+    for sq in iter_squares(position.occupied):
+        key ^= PIECE_KEYS[position.squares[sq]][sq]
+    return key
+
+
+def hand_key(team: int, captured: List[str]) -> int:
+    '''Key of a hand, the XOR of HAND_KEYS[team][ptype][n] for n = 1..count of each piece'''
+    key = 0
+    for piece_name in set(captured):
+        ptype = PIECE_TYPES[piece_name.upper()]
+        for count in range(1, captured.count(piece_name) + 1):
+            key ^= HAND_KEYS[team][ptype][count]
+    return key
@@ -0,0 +1,127 @@
+import pytest
+
+from game import *
+from src.bitboard import BitboardPosition, ROW_BB, SQUARE_BB, piece_code
+from src.move import make_move, move_src, move_to_string, string_to_move
+from src.tables import STEP_TABLE, RAY_TABLE
+from src.utils import PAWN, LANCE, KNIGHT, GOLD
+
+
+def _piece_moves(board, team):
+    moves = set()
+    for r, row in enumerate(board):
+        for c, cell in enumerate(row):
+            if cell and cell.team == team:
+                moves |= set(cell.get_valid_moves((r, c), board))
+    return moves
+
+
+def test_initial_moves_match_pieces():
+    game = ShogiGame()
+    moves, drops = game.board.get_all_valid_moves_and_drops(game.board.board, game.players[0])
+
+    assert len(moves) == 30
+    assert drops == set()
+    assert moves == _piece_moves(game.board.board, 1)
+
+
+def test_slider_stops_at_capture():
+    board = [[None for _ in range(9)] for _ in range(9)]
+    board[0][4] = King('K', -1)
+    board[8][4] = King('k', 1)
+    board[8][0] = Lance('l', 1)
+    board[5][0] = Pawn('P', -1)
+    board[4][4] = Rook('R', -1, True)
+
+    game = ShogiGame()
+    game.board.insert_board(board)
+    moves = set(game.board.position.generate_moves(1))
+
+    assert {'a1a2', 'a1a3', 'a1a4'} <= {move_to_string(move, 1) for move in moves}
+    assert string_to_move('a1a5') not in moves
+    assert moves == _piece_moves(board, 1)
+    assert game.board.is_in_check(board, game.players[0])
+    assert BitboardPosition.from_grid(board).king_square(-1) == 4
+
+    # Under check by the dragon on e5 only the king may move, off the e-file
+    legal_moves, _ = game.board.get_all_valid_moves_and_drops(board, game.players[0])
+    assert {move_to_string(move, 1) for move in legal_moves} == {'e1d1', 'e1d2', 'e1f1', 'e1f2'}
+
+
+def test_legal_moves_respect_pins_and_checks():
+    board = [[None for _ in range(9)] for _ in range(9)]
+    board[0][4] = King('K', -1)
+    board[8][4] = King('k', 1)
+    board[8][3] = GGeneral('g', 1)   # Pinned by the rook on a1, could otherwise block on d2
+    board[8][0] = Rook('R', -1)
+    board[5][1] = Bishop('B', -1)    # Checks along c3-d2-e1
+
+    game = ShogiGame()
+    game.board.insert_board(board)
+    game.players[0].captured = ['P', 'G']
+    moves, drops = game.board.get_all_valid_moves_and_drops(board, game.players[0])
+    legal = {move_to_string(move, 1) for move in moves | drops}
+
+    assert legal == {'e1e2', 'e1f1', 'e1f2', 'P*c3', 'P*d2', 'G*c3', 'G*d2'}
+    assert game.board.position.pinned(1) == {8 * 9 + 3: sum(SQUARE_BB[8 * 9 + c] for c in range(4))}
+
+
+def test_move_encoding_round_trip():
+    for notation, team in [('a3a4', 1), ('h6h7+', 1), ('P*d4', 1), ('r*g5', -1)]:
+        assert move_to_string(string_to_move(notation), team) == notation
+
+
+def test_is_square_attacked():
+    game = ShogiGame()
+
+    assert game.board.is_square_attacked((5, 4), 1)      # Pawn e3 covers e4
+    assert not game.board.is_square_attacked((4, 4), 1)
+    assert game.board.is_square_attacked((2, 1), -1)     # Pawn b7 is defended by the rook behind it
+    assert not game.board.is_square_attacked((4, 1), -1)  # Rook b8 is blocked by pawn b7
+
+
+def test_move_tables_flag_promotions():
+    assert STEP_TABLE[(PAWN, False, -1)][5 * 9 + 4] == [(6 * 9 + 4, True)]
+    assert STEP_TABLE[(PAWN, False, 1)][5 * 9 + 4] == [(4 * 9 + 4, False)]
+    assert STEP_TABLE[(PAWN, False, 1)][4] == []
+    assert not any(can_promote for _, can_promote in STEP_TABLE[(GOLD, False, 1)][2 * 9 + 4])
+    assert RAY_TABLE[(LANCE, False, 1)][4 * 9] == [[(3 * 9, False), (2 * 9, True), (9, True), (0, True)]]
+    assert RAY_TABLE[(LANCE, True, 1)][4 * 9] == []
+
+
+def test_nifu_ignores_promoted_pawns():
+    position = BitboardPosition()
+    position.put_code(5 * 9 + 4, piece_code(PAWN, 1, True))  # 5 筋的と金
+    assert position.drop_targets(PAWN, 1) & SQUARE_BB[4 * 9 + 4]
+
+    position.put(6 * 9 + 2, PAWN, 1)  # 7 筋的步兵
+    assert not position.drop_targets(PAWN, 1) & SQUARE_BB[4 * 9 + 2]
+
+
+def test_drops_only_avoid_ranks_the_piece_could_never_leave():
+    position = BitboardPosition()
+    # 香車可以打在 2 段，桂馬不行；後手反過來
+    assert position.drop_targets(LANCE, 1) & ROW_BB[1] == ROW_BB[1]
+    assert not position.drop_targets(LANCE, 1) & ROW_BB[0]
+    assert not position.drop_targets(KNIGHT, 1) & (ROW_BB[0] | ROW_BB[1])
+    assert position.drop_targets(LANCE, -1) & ROW_BB[7] == ROW_BB[7]
+    assert not position.drop_targets(KNIGHT, -1) & (ROW_BB[7] | ROW_BB[8])
+
+
+def test_pieces_that_could_not_move_again_must_promote():
+    # 2 段的香車、3 段的桂馬只能升變走上最後的段
+    game = ShogiGame()
+    board, player = game.board, game.players[0]
+    board.set_sfen("4k4/L8/1N7/9/9/9/9/9/4K4 b - 1")
+    moves, _ = board.get_all_valid_moves_and_drops(board.board, player)
+    assert {move for move in moves if move_src(move) == 9} == {make_move(9, 0, True)}
+    assert {move for move in moves if move_src(move) == 19} == {make_move(19, 0, True), make_move(19, 2, True)}
+    assert moves == _piece_moves(board.board, 1)
+    with pytest.raises(Exception, match="This move is invalid!"):
+        board.execute_move(make_move(19, 0), player)
+
+    # 從敵陣走出去也可以升變
+    board.set_sfen("4k4/9/2S6/9/9/9/9/9/4K4 b - 1")
+    moves, _ = board.get_all_valid_moves_and_drops(board.board, player)
+    assert {make_move(20, 28, True), make_move(20, 30, True)} <= moves
+    assert moves == _piece_moves(board.board, 1)
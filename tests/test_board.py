@@ -0,0 +1,194 @@
+import copy
+import random
+
+import pytest
+
+from game import *
+from src.bitboard import BitboardPosition
+from src.zobrist import SIDE_KEY, board_key, hand_key
+from src.transposition import TranspositionTable
+from src.utils import PAWN, GOLD, KING
+from src.move import drop_type
+
+
+def _snapshot(game):
+    return repr(game.board), list(game.board.position.squares), [sorted(player.captured) for player in game.players], game.board.key
+
+
+def _full_key(game):
+    key = board_key(BitboardPosition.from_grid(game.board.board))
+    for player in game.players:
+        key ^= hand_key(player.team, player.captured)
+    return key ^ SIDE_KEY if game.board.side_to_move == -1 else key
+
+
+def test_make_unmake_round_trip():
+    random.seed(0)
+    game = ShogiGame()
+
+    for ply in range(60):
+        player = game.players[ply % 2]
+        moves, drops = game.board.get_all_valid_moves_and_drops(game.board.board, player)
+        before = _snapshot(game)
+
+        for move in moves | drops:
+            game.board.make_move(move, player)
+            assert game.board.position.squares == BitboardPosition.from_grid(game.board.board).squares
+            assert game.board.key == _full_key(game)
+            game.board.unmake_move()
+            assert _snapshot(game) == before
+
+        game.board.execute_move(random.choice(sorted(moves | drops)), player)
+
+
+def test_zobrist_key_transposition():
+    first, second = ShogiGame(), ShogiGame()
+    start_key = first.board.key
+
+    for move, team in [('a3a4', 0), ('a7a6', 1), ('b3b4', 0)]:
+        first.board.execute_move(move, first.players[team])
+    for move, team in [('b3b4', 0), ('a7a6', 1), ('a3a4', 0)]:
+        second.board.execute_move(move, second.players[team])
+
+    assert first.board.key == second.board.key != start_key
+
+    for _ in range(3):
+        first.board.unmake_move()
+    assert first.board.key == start_key
+
+
+def test_transposition_table_replacement():
+    tt = TranspositionTable(memory_mb=TranspositionTable.ENTRY_BYTES / (1024 * 1024))  # One slot
+    assert tt.size == 1 and len(tt) == 0
+    tt.store(1, 'deep', depth=5)
+    tt.store(2, 'shallow', depth=2)  # Same slot, shallower entry of the same generation is dropped
+    assert tt.probe(1) == 'deep' and tt.probe(2) is None
+
+    tt.new_generation()
+    tt.store(2, 'shallow', depth=2)
+    assert tt.probe(2) == 'shallow' and tt.probe(1) is None
+
+
+def test_cache_table_can_be_switched_off():
+    for memory_mb in (0, None):
+        tt = TranspositionTable(memory_mb)
+        tt.store(1, 'value')
+        assert tt.probe(1) is None and len(tt) == 0
+
+    players = [ShogiPlayer("Sente", 1), ShogiPlayer("Gote", -1)]
+    board = ShogiBoard(players[0], players[1], tt_memory_mb=0)
+    moves, drops = board.get_all_valid_moves_and_drops(board.board, players[0])
+    assert len(moves) == 30 and len(board.tt) == 0
+
+
+def test_cached_moves_are_returned_as_stored():
+    game = ShogiGame()
+    game.board.set_sfen("4k4/9/9/9/9/9/9/9/4K4 b GP 1")
+    board, player = game.board, game.players[0]
+    first = board.get_all_valid_moves_and_drops(board.board, player)
+    assert len(board.tt) == 1
+    assert board.get_all_valid_moves_and_drops(board.board, player) == first
+    assert board.tt.hits == 1 and first[1] and all(drop_type(move) for move in first[1])
+
+
+def test_tracked_king_and_piece_positions():
+    game = ShogiGame()
+    assert game.board.get_king_pos(1) == (8, 4) and game.board.get_king_pos(-1) == (0, 4)
+    assert len(game.board.get_piece_positions(1)) == len(game.board.get_piece_positions(-1)) == 20
+
+    for move, team in [('e1d2', 0), ('e9f8', 1), ('b2h8+', 0)]:
+        if move == 'b2h8+':
+            game.board.execute_move('c3c4', game.players[0])
+            game.board.execute_move('g7g6', game.players[1])
+        game.board.execute_move(move, game.players[team])
+
+    assert game.board.get_king_pos(1) == (7, 3) and game.board.get_king_pos(-1) == (1, 5)
+    assert (1, 7) in game.board.get_piece_positions(1)
+    assert len(game.board.get_piece_positions(-1)) == 19
+
+    game.board.unmake_move()
+    assert len(game.board.get_piece_positions(-1)) == 20
+
+
+def test_hand_counts_keep_list_access():
+    player = ShogiPlayer("Sente", 1, ['P', 'G', 'P'])
+
+    assert player.captured.counts[PAWN] == 2
+    assert player.captured == ['P', 'P', 'G']
+    assert repr(player.captured) == "['P', 'P', 'G']" and player.captured[-1] == 'G'
+    assert len(player.captured) == 3 and player.captured.count('P') == 2
+    assert 'G' in player.captured and 'g' not in player.captured and 'R' not in player.captured
+    assert player.captured.piece_types() == [PAWN, GOLD]
+
+    key = player.hand_key
+    player.drop('P')
+    player.undo_drop('P')
+    assert player.hand_key == key == hand_key(1, ['P', 'P', 'G'])
+
+    player.drop('G')
+    with pytest.raises(ValueError):
+        player.drop('G')
+
+
+def test_list_style_hand_changes_keep_the_key():
+    game = ShogiGame()
+    board, player = game.board, game.players[0]
+    board.get_all_valid_moves_and_drops(board.board, player)
+
+    # 直接改手牌也要更新局面的 key，否則置換表會拿到舊的走步
+    player.captured.append('G')
+    assert player.hand_key == hand_key(1, ['G'])
+    board.execute_move('G*e5', player)
+    assert board.position.squares[4 * 9 + 4] == GOLD
+
+    player.captured.append('P')
+    player.captured.remove('P')
+    assert player.hand_key == hand_key(1, [])
+
+    # 和 count()、in、remove() 一樣，只接受這一方手牌的大小寫
+    with pytest.raises(ValueError):
+        player.captured.append('p')
+    with pytest.raises(ValueError):
+        player.captured.remove('g')
+
+
+def test_king_is_never_held_in_hand():
+    game = ShogiGame()
+    board, player = game.board, game.players[0]
+    for hold_king in (lambda: player.captured.append('K'), lambda: player.captured.add(KING),
+                      lambda: setattr(player, 'captured', ['K'])):
+        with pytest.raises(ValueError):
+            hold_king()
+
+    # 手牌裡沒有王將，只會有 PAWN..ROOK 的打入
+    board.set_sfen("4k4/9/9/9/9/9/9/9/4K4 b GP 1")
+    assert player.captured.piece_types() == [PAWN, GOLD]
+    moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+    assert {drop_type(move) for move in drops} == {PAWN, GOLD}
+
+
+def test_pieces_are_shared_and_immutable():
+    assert Pawn('p', 1) is Pawn('p', 1)
+    assert Pawn('p', 1) is not Pawn('P', -1)
+    assert Pawn('p', 1).promote() is Pawn('p', 1, True)
+    assert copy.deepcopy(Rook('R', -1)) is Rook('R', -1)
+    with pytest.raises(AttributeError):
+        Pawn('p', 1).promoted = True
+
+
+def test_clone_is_independent():
+    game = ShogiGame()
+    for move in ('c3c4', 'g7g6', 'b2h8+', 'g9h8'):
+        game.board.execute_move(move, game.players[0] if game.board.side_to_move == 1 else game.players[1])
+
+    clone = game.board.clone()
+    assert clone.to_sfen() == game.board.to_sfen()
+    assert clone.key == game.board.key
+
+    player = clone._our_player
+    clone.execute_move('B*e5', player)
+    assert 'B' not in player.captured
+    assert 'B' in game.players[0].captured
+    assert game.board.board[4][4] is None
+    clone.unmake_move()
+    assert clone.key == game.board.key
@@ -0,0 +1,43 @@
+from game import *
+from src.engine import ShogiEngine, MATE_SCORE
+from src.move import move_to_string
+
+
+def test_engine_finds_mate_in_one():
+    board = [[None for _ in range(9)] for _ in range(9)]
+    board[0][4] = King('K', -1)
+    board[2][4] = GGeneral('g', 1)
+    board[8][4] = King('k', 1)
+
+    game = ShogiGame()
+    game.board.insert_board(board)
+    game.players[0].captured = ['G']
+    key = game.board.key
+
+    result = ShogiEngine(game.board, max_depth=3, time_limit=None).search(game.players[0], game.players[1])
+
+    assert move_to_string(result.move, 1) == 'G*e8'
+    assert result.score == MATE_SCORE - 1
+    assert result.pv[0] == result.move
+    assert game.board.key == key
+
+
+def test_engine_respects_node_limit():
+    game = ShogiGame()
+    engine = ShogiEngine(game.board, time_limit=None, node_limit=2000)
+    result = engine.search(game.players[0], game.players[1])
+
+    assert result.move in game.board.get_all_valid_moves_and_drops(game.board.board, game.players[0])[0]
+    assert engine.nodes <= 2000
+    assert len(game.board._undo_stack) == 0
+
+
+def test_engine_player_is_seated():
+    game = ShogiGame([ShogiPlayer("Human", 1), EnginePlayer("Engine", -1, time_limit=None, max_depth=2)])
+    game.board.execute_move('c3c4', game.players[0])
+
+    move = game.players[1].get_move(game.board, game.players[0])
+    game.board.execute_move(move, game.players[1])
+
+    assert game.players[1].last_result.depth == 2
+    assert game.board.side_to_move == 1
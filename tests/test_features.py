@@ -0,0 +1,64 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from game import *
+from src.features import FeatureBatch, iter_record_batches, move_index, index_to_move, PLANES, MOVE_SPACE
+from src.move import string_to_move
+from src.perft import POSITIONS, setup_position
+from src.record import RecordReader, RecordWriter
+from src.utils import PAWN, KING
+
+
+def test_encode_positions():
+    batch = FeatureBatch(2, legal_masks=True)
+    game = ShogiGame()
+    batch.add(game.board, string_to_move('c3c4'), 1)
+
+    board, player, _ = setup_position(POSITIONS['bishop-exchange'])
+    batch.add(board)
+
+    assert batch.is_full and batch.planes.shape == (2, PLANES, 9, 9) and batch.legal.shape == (2, MOVE_SPACE)
+    assert batch.planes[0, PAWN - 1, 6].tolist() == [1] * 9          # 先手的步兵
+    assert batch.planes[0, KING + PAWN - 1, 2].tolist() == [1] * 9   # 後手的步兵
+    assert batch.planes[0, KING - 1, 8, 4] == 1 and batch.planes[0, 2 * KING - 1, 0, 4] == 1
+    assert batch.planes[0].sum() == 40
+    assert batch.side.tolist() == [1, board.side_to_move]
+    assert batch.moves[0] == move_index(string_to_move('c3c4')) and batch.moves[1] == -1
+    assert batch.results[0] == 1
+
+    assert batch.hands[0].sum() == 0
+    assert batch.hands[1].tolist() == [[0, 0, 0, 0, 0, 1, 0], [0, 0, 0, 0, 0, 1, 0]]  # 雙方各持一枚角行
+    moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+    assert batch.legal[0].sum() == 30
+    assert set(np.flatnonzero(batch.legal[1]).tolist()) == {move_index(move) for move in moves | drops}
+
+    with pytest.raises(Exception):
+        batch.add(board)
+
+
+def test_move_index_round_trip():
+    for notation in ('c3c4', 'b2h8+', 'P*e5', 'R*a1'):
+        move = string_to_move(notation)
+        assert index_to_move(move_index(move)) == move
+
+
+def test_record_batches(tmp_path):
+    path = str(tmp_path / "games.bin")
+    moves = [string_to_move(move) for move in POSITIONS['bishop-exchange']]
+    with RecordWriter(path) as writer:
+        writer.write_game(moves, 1)
+        writer.write_game(moves, -1)
+
+    with RecordReader(path) as reader:
+        sizes, sides, results, played = [], [], [], []
+        for batch in iter_record_batches(reader, batch_size=3):
+            sizes.append(batch.size)
+            sides.extend(batch.side[:batch.size].tolist())
+            results.extend(batch.results[:batch.size].tolist())
+            played.extend(batch.moves[:batch.size].tolist())
+
+    assert sizes == [3, 3, 2]
+    assert sides == [1, -1] * len(moves)
+    assert results == [1, -1, 1, -1, -1, 1, -1, 1]  # 以輪到的一方來看的勝負
+    assert played == [move_index(move) for move in moves] * 2
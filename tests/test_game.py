@@ -1,6 +1,9 @@
 import copy
 
+import pytest
+
 from game import *
+from src.move import usi_to_move
 
 
 def test_uchifuzume():
@@ -21,8 +24,20 @@ def test_uchifuzume():
     game.players[1].captured = ['p']
 
     game.board.execute_move('i1i3', game.players[0])
-    game.board.execute_move('p*b5', game.players[1])
+
+    # 打步兵將死對方是打步詰，不能打入，對局也沒有結束
+    with pytest.raises(Exception, match="Can't drop to the position!"):
+        game.board.execute_move('p*b5', game.players[1])
 
     board = copy.deepcopy(game.board.board)
 
-    assert game.get_game_ended(board, game.players[0], game.players[1]) == -1  # opponent player win
\ No newline at end of file
+    assert game.get_game_ended(board, game.players[0], game.players[1]) == 0
+
+    # MateSolver 也不把打步詰當成將死，兩邊的規則一致
+    game = ShogiGame()
+    game.board.set_sfen("3nkn3/3l1l3/4G4/9/9/9/9/9/4K4 b P 1")
+    moves, drops = game.board.get_all_valid_moves_and_drops(game.board.board, game.players[0])
+    assert usi_to_move('P*5b') not in drops
+    with pytest.raises(Exception, match="Can't drop to the position!"):
+        game.board.execute_move(usi_to_move('P*5b'), game.players[0])
+    assert game.get_game_ended(game.board.board, game.players[0], game.players[1]) == 0
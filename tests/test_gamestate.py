@@ -0,0 +1,49 @@
+import random
+
+from game import *
+
+
+def test_incremental_checkers_match_full_scan():
+    rng = random.Random(3)
+    checks = 0
+
+    for _ in range(5):
+        game = ShogiGame()
+        for ply in range(150):
+            player = game.players[ply % 2]
+            moves, drops = game.board.get_all_valid_moves_and_drops(game.board.board, player)
+            if not moves and not drops:
+                break
+
+            # 優先下王手，才會測到直接與閃開的將軍
+            legal = sorted(moves | drops)
+            checking = []
+            for move in legal:
+                game.board.make_move(move, player)
+                if game.board.position.checkers(-player.team):
+                    checking.append(move)
+                game.board.unmake_move()
+            game.play_move(rng.choice(checking if checking and rng.random() < 0.5 else legal), player)
+
+            opponent = game.players[(ply + 1) % 2]
+            assert game.state.key == game.board.key
+            assert game.state.checkers == game.board.position.checkers(opponent.team)
+            assert game.state.is_checkmated(game.board, opponent) == game.board.is_checkmate(game.board.board, opponent)
+            checks += game.state.in_check
+
+            result = game.get_game_ended(game.board.board, game.players[0], game.players[1])
+            assert result == (player.team if game.board.is_checkmate(game.board.board, opponent) else 0)
+            if result:
+                break
+
+    assert checks > 0
+
+
+def test_state_resyncs_after_unmake():
+    game = ShogiGame()
+    game.play_move('c3c4', game.players[0])
+    game.board.unmake_move()
+    assert game.state.key != game.board.key
+
+    assert game.get_game_ended(game.board.board, game.players[0], game.players[1]) == 0
+    assert game.state.key == game.board.key and game.state.side_to_move == 1
@@ -0,0 +1,53 @@
+import src.board
+import src.gamestate
+import src.mate
+from game import *
+from src import instrument
+from src.movepicker import MovePicker
+
+
+def test_instrumentation_counts_and_restores():
+    original = ShogiBoard.execute_move
+    game = ShogiGame()
+
+    with instrument.instrumented() as stats:
+        assert ShogiBoard.execute_move is not original
+        game.play_move('c3c4', game.players[0])
+        game.play_move('g7g6', game.players[1])
+        assert next(iter(MovePicker(game.board, game.players[0])))
+
+    assert ShogiBoard.execute_move is original
+    assert not instrument.is_enabled()
+    assert stats.calls['ShogiBoard.execute_move'] == 2
+    assert stats.calls['GameState.update'] == 2
+    assert stats.calls['MovePicker.__iter__'] == 1
+    assert stats.seconds['ShogiBoard.get_all_valid_moves_and_drops'] > 0
+    assert 'ShogiBoard.execute_move' in stats.report()
+
+    # 關閉之後不再計數
+    game.play_move('b2h8+', game.players[0])
+    assert stats.calls['ShogiBoard.execute_move'] == 2
+
+
+def test_checkmate_is_counted_where_it_is_imported():
+    game = ShogiGame()
+    game.board.set_sfen("4k4/4G4/4P4/9/9/9/9/9/4K4 w - 1")
+
+    with instrument.instrumented() as stats:
+        assert game.get_game_ended(game.board.board, *game.players) == 1
+        player = game.players[1]
+        drops = game.board.iter_valid_drops(game.board.position, player)
+        assert list(drops) == []
+
+    assert src.gamestate.is_checkmate is src.mate.is_checkmate
+    assert src.board.is_checkmate is src.mate.is_checkmate
+    assert stats.calls['GameState.has_legal_move'] == 1
+    assert stats.calls['mate.is_checkmate'] == 1
+    assert stats.calls['ShogiBoard.iter_valid_drops'] == 1
+
+
+def test_process_stats_merge():
+    stats = instrument.CallStats()
+    stats.merge({'ShogiBoard.make_move': {'calls': 3, 'seconds': 0.5}})
+    stats.add('ShogiBoard.make_move', 0.25)
+    assert stats.as_dict() == {'ShogiBoard.make_move': {'calls': 4, 'seconds': 0.75}}
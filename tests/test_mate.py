@@ -0,0 +1,55 @@
+from game import *
+from src.engine import ShogiEngine, MATE_SCORE
+from src.mate import MateSolver, is_checkmate
+from src.move import usi_to_move
+
+
+def _game(sfen: str) -> ShogiGame:
+    game = ShogiGame()
+    game.board.set_sfen(sfen)
+    return game
+
+
+def test_is_checkmate():
+    game = _game("4k4/4G4/4P4/9/9/9/9/9/4K4 w - 1")
+    assert is_checkmate(game.board.position, -1, game.players[1].captured.counts)
+    assert game.board.is_checkmate(game.board.board, game.players[1])
+    assert game.get_game_ended(game.board.board, game.players[0], game.players[1]) == 1
+
+    # 可以打入合駒就不是將死
+    game = _game("7lk/7l1/9/9/8R/9/9/9/K8 w s 1")
+    assert not is_checkmate(game.board.position, -1, game.players[1].captured.counts)
+    game.players[1].captured = []
+    assert is_checkmate(game.board.position, -1, game.players[1].captured.counts)
+
+
+def test_solve_mate_in_one_and_three():
+    game = _game("4k4/9/4P4/9/9/9/9/9/4K4 b G 1")
+    assert MateSolver(game.board).solve(game.players[0], game.players[1], 3) == [usi_to_move('G*5b')]
+
+    game = _game("9/4k4/8R/7n1/9/9/9/9/8K b R 1")
+    solver = MateSolver(game.board)
+    assert solver.solve(game.players[0], game.players[1], 1) is None
+    line = solver.solve(game.players[0], game.players[1], 3)
+    assert len(line) == 3
+
+    sfen = game.board.to_sfen()
+    for ply, move in enumerate(line):
+        game.board.execute_move(move, game.players[ply % 2])
+    assert game.board.is_checkmate(game.board.board, game.players[1])
+    for _ in line:
+        game.board.unmake_move()
+    assert game.board.to_sfen() == sfen
+
+
+def test_pawn_drop_mate_is_not_a_solution():
+    game = _game("3nkn3/3l1l3/4G4/9/9/9/9/9/4K4 b P 1")
+    assert MateSolver(game.board).solve(game.players[0], game.players[1], 1) is None
+
+
+def test_engine_plays_the_proven_mate():
+    game = _game("9/4k4/8R/7n1/9/9/9/9/8K b R 1")
+    engine = ShogiEngine(game.board, time_limit=None, max_depth=1, mate_nodes=10000)
+    result = engine.search(game.players[0], game.players[1])
+    assert result.score == MATE_SCORE - 3
+    assert len(result.pv) == 3
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from game import *
+from src.mcts import MCTS, MCTSPlayer, CaptureRollout, CapturePrior, RandomRollout, playout
+from src.move import usi_to_move
+from src.selfplay import MCTSPolicy, RandomPolicy, play_game
+
+
+def _game(sfen: str) -> ShogiGame:
+    game = ShogiGame()
+    game.board.set_sfen(sfen)
+    return game
+
+
+def test_playout_leaves_the_game_unchanged():
+    game = ShogiGame()
+    key, sfen = game.board.key, game.board.to_sfen()
+    rng = random.Random(0)
+
+    for rollout in (RandomRollout(), CaptureRollout()):
+        result = playout(game, rollout, rng, max_plies=40)
+        assert -1 <= result <= 1
+    assert game.board.key == key and game.board.to_sfen() == sfen and len(game.history) == 1
+
+
+def test_finds_mate_in_one():
+    game = _game("4k4/9/4P4/9/9/9/9/9/4K4 b G 1")
+    with MCTS(playouts=300, max_playout_plies=8, seed=1) as mcts:
+        result = mcts.search(game.board, game.players[0])
+    assert result.move == usi_to_move('G*5b')
+    assert result.value == 1
+
+
+def test_tree_reuse_and_node_cap():
+    game = ShogiGame()
+    mcts = MCTS(playouts=60, max_playout_plies=8, prior=CapturePrior(), seed=3)
+    first = mcts.search(game.board, game.players[0])
+    assert first.nodes == mcts.root.size() and mcts.root.visits == 60
+
+    # 走了一步之後，從原本的樹裡對應的子樹繼續搜尋
+    game.play_move(first.pv[0], game.players[0])
+    reused = next(child for child in mcts.root.children if child.move == first.pv[0])
+    visits, nodes = reused.visits, reused.size()
+    assert visits > 1
+    second = mcts.search(game.board, game.players[1])
+    assert mcts.root is reused and reused.visits == visits + 60 and second.nodes == nodes + 60
+
+    capped = MCTS(playouts=50, max_nodes=10, max_playout_plies=8, seed=3)
+    result = capped.search(ShogiGame().board, game.players[0])
+    assert result.nodes == 10 and capped.root.visits == 50
+
+
+def test_parallel_playouts():
+    game = ShogiGame()
+    with MCTS(playouts=8, workers=2, max_playout_plies=8, seed=5) as mcts:
+        result = mcts.search(game.board, game.players[0])
+    assert result.playouts == 8 and mcts.root.visits == 8
+    assert sum(child.visits for child in mcts.root.children) == 8
+    assert all(child.value == child.value and abs(child.value) <= child.visits for child in mcts.root.children)
+
+
+def test_mcts_player_and_policy():
+    game = ShogiGame()
+    player = MCTSPlayer("MCTS", 1, playouts=10, max_playout_plies=8, seed=0)
+    move = player.get_move(game.board, game.players[1])
+    game.play_move(move, game.players[0])
+    assert player.last_result.playouts == 10
+
+    record = play_game((MCTSPolicy(10, max_playout_plies=8, seed=0), RandomPolicy()), max_plies=4, seed=0)
+    assert record['plies'] == 4
+
+
+def test_mcts_player_is_seated(monkeypatch):
+    # MCTSPlayer 自己選步，不會要求輸入
+    game = ShogiGame([MCTSPlayer("MCTS", 1, playouts=300, max_playout_plies=8, seed=1), ShogiPlayer("Human", -1)])
+    game.board.set_sfen("4k4/9/4P4/9/9/9/9/9/4K4 b G 1")
+    monkeypatch.setattr('builtins.input', lambda prompt='': pytest.fail("MCTSPlayer was asked for input"))
+
+    game.play()
+    assert game.get_game_ended(game.board.board, *game.players) == 1
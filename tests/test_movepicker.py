@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from game import *
+from src.move import usi_to_move, is_promotion, drop_type, move_dst
+from src.movepicker import MovePicker, has_legal_move, see
+
+
+def _game(sfen: str) -> ShogiGame:
+    game = ShogiGame()
+    game.board.set_sfen(sfen)
+    return game
+
+
+def test_static_exchange_evaluation():
+    game = _game("4k4/9/9/4g4/4p4/9/4R4/9/4K4 b - 1")
+    assert see(game.board.position, usi_to_move('5g5e')) == 100 - 1000
+
+    game = _game("4k4/9/9/9/4p4/9/4R4/9/4K4 b - 1")
+    assert see(game.board.position, usi_to_move('5g5e')) == 100
+    # 走到步兵吃得到的格子就白白送掉飛車
+    assert see(game.board.position, usi_to_move('5g5f')) == -1000
+    assert see(game.board.position, usi_to_move('5g6g')) == 0
+
+
+def test_stages_match_all_legal_moves():
+    rng = random.Random(2)
+    game = ShogiGame()
+    for _ in range(80):
+        board = game.board
+        player = board.players[board.side_to_move]
+        moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+        legal = sorted(moves | drops)
+
+        hash_move = rng.choice(legal)
+        picked = list(MovePicker(board, player, hash_move))
+        assert picked[0] == hash_move and len(picked) == len(legal) and set(picked) == set(legal)
+        assert has_legal_move(board, player)
+
+        # 吃子、升變、其他走步、打入的順序
+        squares = board.position.squares
+        stages = [0 if squares[move_dst(move)] and not drop_type(move) else 3 if drop_type(move) else 1 if is_promotion(move) else 2
+                  for move in picked[1:]]
+        assert stages == sorted(stages)
+
+        game.play_move(rng.choice(legal), player)
+        if game.get_game_ended(board.board, *game.players):
+            break
+
+
+def test_has_legal_move_without_ordering(monkeypatch):
+    monkeypatch.setattr('src.movepicker.see', lambda *args: pytest.fail("has_legal_move ran SEE"))
+    # 被將死、只能打入合駒、合駒用的持駒沒有
+    for sfen, expected in (("4k4/4G4/4P4/9/9/9/9/9/4K4 w - 1", False),
+                           ("kl7/1l7/9/9/9/9/9/9/R3K4 w g 1", True),
+                           ("kl7/1l7/9/9/9/9/9/9/R3K4 w - 1", False)):
+        board = _game(sfen).board
+        assert has_legal_move(board, board.players[board.side_to_move]) == expected
+
+    rng = random.Random(4)
+    game = ShogiGame()
+    for _ in range(80):
+        board = game.board
+        player = board.players[board.side_to_move]
+        moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+        assert has_legal_move(board, player) == bool(moves | drops)
+        if not moves | drops:
+            break
+        game.play_move(rng.choice(sorted(moves | drops)), player)
+
+
+def test_illegal_hash_move_is_skipped():
+    game = ShogiGame()
+    picked = list(MovePicker(game.board, game.players[0], usi_to_move('5a5b')))
+    assert usi_to_move('5a5b') not in picked and len(picked) == 30
+
+
+def test_drops_generated_only_when_reached(monkeypatch):
+    game = _game("4k4/9/9/9/4p4/9/4R4/9/4K4 b GSP 1")
+    board, player = game.board, game.players[0]
+    calls = []
+    iter_valid_drops = board.iter_valid_drops
+    monkeypatch.setattr(board, 'iter_valid_drops', lambda *args: calls.append(args) or iter_valid_drops(*args))
+
+    picker = iter(MovePicker(board, player))
+    assert next(picker) == usi_to_move('5g5e')
+    assert has_legal_move(board, player)
+    assert not calls
+
+    assert any(drop_type(move) for move in picker)
+    assert len(calls) == 1
@@ -0,0 +1,41 @@
+import time
+
+from game import *
+from src.engine import ShogiEngine
+from src.parallel import ParallelSearch
+from src.perft import POSITIONS, setup_position
+
+
+def test_compact_state_round_trip():
+    board, _, _ = setup_position(POSITIONS['middlegame'])
+    other = ShogiBoard(ShogiPlayer("Sente", 1), ShogiPlayer("Gote", -1))
+    other.load_compact_state(board.compact_state())
+
+    assert other.key == board.key
+    assert repr(other).split('\n')[:12] == repr(board).split('\n')[:12]
+    assert other.compact_state() == board.compact_state()
+
+
+def test_parallel_search_matches_engine():
+    board, player, opponent = setup_position(POSITIONS['bishop-drops'])
+    expected = ShogiEngine(board, max_depth=2, time_limit=None).search(player, opponent)
+
+    for workers in (1, 2):
+        with ParallelSearch(workers, max_depth=2, time_limit=None) as search:
+            result = search.search(board, player)
+        assert result.depth == 2
+        assert result.score == expected.score
+        assert result.pv[0] == result.move
+
+
+def test_parallel_search_keeps_its_time_limit():
+    board, player, _ = setup_position(POSITIONS['middlegame'])
+
+    for workers in (1, 2):
+        with ParallelSearch(workers, time_limit=0.5) as search:
+            start = time.perf_counter()
+            result = search.search(board, player)
+            elapsed = time.perf_counter() - start
+        # 排在後面的任務也共用同一個截止時間
+        assert elapsed < 0.5 + 0.25
+        assert result.move is not None
@@ -0,0 +1,30 @@
+import pytest
+
+from src.perft import POSITIONS, REFERENCE_COUNTS, perft, run, setup_position
+
+
+@pytest.mark.perft
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_perft_reference_counts(name):
+    for depth, expected in enumerate(REFERENCE_COUNTS[name][:2], 1):
+        board, player, opponent = setup_position(POSITIONS[name])
+        assert perft(board, player, opponent, depth) == expected
+
+
+@pytest.mark.perft
+def test_perft_leaves_board_unchanged():
+    board, player, opponent = setup_position(POSITIONS['bishop-drops'])
+    key, grid = board.key, [row[:] for row in board.board]
+
+    perft(board, player, opponent, 2)
+
+    assert board.key == key
+    assert board.board == grid
+
+
+@pytest.mark.perft
+def test_perft_initial_depth_3(capsys):
+    nodes, _ = run(POSITIONS['initial'], 3)
+
+    assert nodes == REFERENCE_COUNTS['initial'][2]
+    assert "Nodes/sec" in capsys.readouterr().out
@@ -0,0 +1,39 @@
+import os
+
+from src.move import string_to_move
+from src.perft import POSITIONS, setup_position
+from src.record import RecordReader, RecordWriter
+from src.sfen import INITIAL_SFEN
+
+
+def test_record_round_trip(tmp_path):
+    path = str(tmp_path / "games.bin")
+    opening = [string_to_move(move) for move in POSITIONS['bishop-exchange']]
+    board, _, _ = setup_position(POSITIONS['bishop-drops'][:4])
+    start_sfen = board.to_sfen()
+    drops = [string_to_move(move) for move in POSITIONS['bishop-drops'][4:]]
+
+    with RecordWriter(path) as writer:
+        writer.write_game(opening, 0)
+    with RecordWriter(path) as writer:  # Appending to an existing archive
+        writer.write_game(drops, -1, start_sfen)
+
+    expected, _, _ = setup_position(POSITIONS['bishop-drops'])
+
+    for remove_index in (False, True):
+        if remove_index:
+            os.remove(path + '.idx')
+
+        with RecordReader(path) as reader:
+            assert len(reader) == 2
+            assert reader[0] == (INITIAL_SFEN, 0, opening)
+            assert reader[-1].start_sfen == start_sfen and reader[1].result == -1
+            assert [record.moves for record in reader] == [opening, drops]
+
+            replayed = [(player.team, move) for _, player, move in reader.positions(1)]
+            assert replayed == [(1, drops[0]), (-1, drops[1])]
+
+            # Running the replay to the end leaves the final position on the board
+            for board, _, _ in reader.positions(1):
+                pass
+            assert board.key == expected.key
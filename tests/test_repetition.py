@@ -0,0 +1,39 @@
+from game import *
+from src.move import usi_to_move
+from src.repetition import RepetitionHistory, DRAW
+
+
+def _play_until_end(game: ShogiGame, cycle, max_plies: int = 100):
+    for ply in range(max_plies):
+        player = game.players[0] if game.board.side_to_move == 1 else game.players[1]
+        game.play_move(usi_to_move(cycle[ply % len(cycle)]), player)
+        result = game.get_game_ended(game.board.board, game.players[0], game.players[1])
+        if result:
+            return ply + 1, result
+    return max_plies, 0
+
+
+def test_fourfold_repetition_is_a_draw():
+    game = ShogiGame()
+    plies, result = _play_until_end(game, ['5i5h', '5a5b', '5h5i', '5b5a'])
+    assert (plies, result) == (12, DRAW)
+    assert game.history.repetitions() == 4
+
+
+def test_perpetual_check_loses():
+    game = ShogiGame()
+    game.board.set_sfen("8k/9/9/9/9/9/9/9/K6R1 b - 1")
+    game.play_move(usi_to_move('2i1i'), game.players[0])
+    game.play_move(usi_to_move('1a2b'), game.players[1])
+    plies, result = _play_until_end(game, ['1i2i', '2b1b', '2i1i', '1b2b'])
+    assert result == -1  # 先手連續王手，判負
+
+
+def test_history_push_pop():
+    history = RepetitionHistory(1)
+    for key in (2, 1, 2, 1, 2, 1):
+        history.push(key, 1, False)
+    assert history.repetitions() == 4 and history.result() == DRAW
+
+    history.pop()
+    assert history.key == 2 and history.repetitions() == 3 and history.result() == 0
@@ -0,0 +1,27 @@
+import io
+import json
+
+from src.selfplay import RandomPolicy, ScriptedPolicy, EnginePolicy, play_game, run_to_file
+
+
+def test_scripted_game_replays_its_line():
+    script = ['c3c4', 'g7g6', 'b2h8+', 'g9h8']
+    record = play_game((ScriptedPolicy(script), ScriptedPolicy(script)), max_plies=10, seed=0)
+
+    assert record['moves'][:4] == script
+    assert record['plies'] == len(record['ply_times']) == 10
+    assert record['winner'] == 0
+
+
+def test_run_to_file_streams_every_game():
+    out = io.StringIO()
+    summary = run_to_file(out, 3, (RandomPolicy(), EnginePolicy(time_limit=None, node_limit=50)), workers=2, max_plies=6, seed=7)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+
+    assert sorted(record['game'] for record in records) == [0, 1, 2]
+    assert summary['games'] == 3 and summary['plies'] == sum(record['plies'] for record in records)
+    assert summary['plies_per_sec'] > 0
+
+    # Same seed, same random game
+    again = play_game((RandomPolicy(), RandomPolicy()), max_plies=6, seed=7)
+    assert again['moves'] == play_game((RandomPolicy(), RandomPolicy()), max_plies=6, seed=7)['moves']
@@ -0,0 +1,46 @@
+import pytest
+
+from game import *
+from src.perft import POSITIONS, setup_position, perft
+from src.sfen import INITIAL_SFEN, parse_sfen, position_from_sfen
+from src.utils import PAWN, LANCE
+
+
+def test_initial_position_sfen():
+    game = ShogiGame()
+    assert game.board.to_sfen() == INITIAL_SFEN
+
+    game.board.execute_move('c3c4', game.players[0])
+    assert game.board.to_sfen() == "lnsgkgsnl/1r5b1/ppppppppp/9/9/2P6/PP1PPPPPP/1B5R1/LNSGKGSNL w - 2"
+
+
+def test_sfen_round_trip_keeps_key_and_moves():
+    board, player, opponent = setup_position(POSITIONS['middlegame'])
+    sfen = board.to_sfen()
+
+    game = ShogiGame()
+    game.board.set_sfen(sfen)
+
+    assert game.board.to_sfen() == sfen
+    assert game.board.key == board.key
+    assert game.board.move_number == 25
+    assert perft(game.board, game.players[0], game.players[1], 2) == perft(board, player, opponent, 2)
+
+
+def test_parse_sfen_hands_and_fast_path():
+    sfen = "lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL w L12p 7"
+    parsed = parse_sfen(sfen)
+
+    assert parsed.side_to_move == -1 and parsed.move_number == 7
+    assert parsed.hands[1][LANCE] == 1 and parsed.hands[-1][PAWN] == 12
+    assert position_from_sfen(sfen).squares == ShogiGame().board.position.squares
+
+    with pytest.raises(Exception, match="Incorrect SFEN!"):
+        parse_sfen("lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1 b - 1")
+    with pytest.raises(Exception, match="Incorrect SFEN!"):
+        parse_sfen("lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1/LNSG+KGSNL b - 1")
+    # '+' 後面接數字或另一個 '+' 都不合法
+    with pytest.raises(Exception, match="Incorrect SFEN!"):
+        parse_sfen("lnsgkgsnl/1r5b1/+3p5/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL b - 1")
+    with pytest.raises(Exception, match="Incorrect SFEN!"):
+        parse_sfen("lnsgkgsnl/1r5b1/++p8/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL b - 1")
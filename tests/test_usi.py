@@ -0,0 +1,77 @@
+import io
+import time
+
+from game import *
+from src.move import move_to_usi, usi_to_move, string_to_move
+from src.usi import UsiEngine, time_for_move
+
+
+def _lines(output: io.StringIO):
+    return output.getvalue().splitlines()
+
+
+def _legal_usi(usi: UsiEngine):
+    player = usi.players[usi.board.side_to_move]
+    moves, drops = usi.board.get_all_valid_moves_and_drops(usi.board.board, player)
+    return {move_to_usi(move) for move in moves | drops}
+
+
+def test_usi_move_notation():
+    assert usi_to_move('7g7f') == string_to_move('c3c4')
+    assert usi_to_move('8h2b+') == string_to_move('b2h8+')
+    assert usi_to_move('P*5e') == string_to_move('P*e5')
+    for notation in ('7g7f', '8h2b+', 'P*5e', 'R*1a'):
+        assert move_to_usi(usi_to_move(notation)) == notation
+
+
+def test_handshake_position_and_go():
+    output = io.StringIO()
+    usi = UsiEngine(output)
+    for line in ('usi', 'isready', 'usinewgame', 'position startpos moves 7g7f 3c3d'):
+        assert usi.handle(line)
+    assert 'usiok' in _lines(output) and 'readyok' in _lines(output)
+    assert usi.board.to_sfen() == "lnsgkgsnl/1r5b1/pppppp1pp/6p2/9/2P6/PP1PPPPPP/1B5R1/LNSGKGSNL b - 3"
+
+    legal = _legal_usi(usi)
+    usi.handle('go depth 2')
+    usi._thread.join(10)
+
+    lines = _lines(output)
+    assert any(line.startswith('info depth 2 score') for line in lines)
+    assert lines[-1].split()[0] == 'bestmove' and lines[-1].split()[1] in legal
+    assert not usi.handle('quit')
+
+
+def test_stop_ends_infinite_search():
+    output = io.StringIO()
+    usi = UsiEngine(output)
+    usi.handle('position sfen lnsgkgsnl/1r5b1/ppppppppp/9/9/9/PPPPPPPPP/1B5R1/LNSGKGSNL b - 1')
+    usi.handle('go infinite')
+    time.sleep(0.2)
+    assert not any(line.startswith('bestmove') for line in _lines(output))
+
+    start = time.perf_counter()
+    usi.handle('stop')
+    assert time.perf_counter() - start < 0.5
+    assert _lines(output)[-1].startswith('bestmove')
+
+
+def test_ponderhit_puts_a_clock_on_the_search():
+    output = io.StringIO()
+    usi = UsiEngine(output)
+    usi.handle('position startpos moves 7g7f')
+    usi.handle('go ponder btime 0 wtime 0 byoyomi 300')
+    time.sleep(0.2)
+    assert not any(line.startswith('bestmove') for line in _lines(output))
+
+    usi.handle('ponderhit')
+    usi._thread.join(5)
+    assert not usi._thread.is_alive()
+    assert _lines(output)[-1].split()[1] in _legal_usi(usi)
+
+
+def test_time_for_move():
+    assert time_for_move({}, 1) is None
+    assert time_for_move({'movetime': 1000}, 1) == 0.9
+    assert time_for_move({'btime': 30000, 'wtime': 0, 'byoyomi': 1000}, 1) == 1.9
+    assert time_for_move({'btime': 30000, 'wtime': 0, 'byoyomi': 1000}, -1) == 0.9
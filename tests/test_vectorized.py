@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from game import *
+from src.bitboard import SQUARE_BB
+from src.move import make_drop, usi_to_move
+from src.perft import POSITIONS, setup_position
+from src.utils import PAWN
+from src.vectorized import PositionBatch
+
+
+def random_boards(count: int, seed: int):
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        game = ShogiGame()
+        for ply in range(rng.randint(0, 120)):
+            player = game.players[ply % 2]
+            moves, drops = game.board.get_all_valid_moves_and_drops(game.board.board, player)
+            if not moves and not drops:
+                break
+            game.play_move(rng.choice(sorted(moves | drops)), player)
+            if game.get_game_ended(game.board.board, *game.players):
+                break
+        boards.append(game.board)
+    return boards
+
+
+def test_batch_matches_scalar_move_generation():
+    boards = random_boards(30, 3) + [setup_position(sfen)[0] for sfen in POSITIONS.values()]
+    batch = PositionBatch.from_boards(boards)
+    sets = batch.legal_move_sets()
+    in_check = batch.in_check()
+    attacks = {team: batch.attack_maps(team).reshape(-1, 81) for team in (1, -1)}
+
+    for idx, board in enumerate(boards):
+        player = board.players[board.side_to_move]
+        moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+        assert sets[idx] == moves | drops
+        assert in_check[idx] == bool(board.position.checkers(board.side_to_move))
+        for team in (1, -1):
+            team_attacks = board.position.team_attacks(team)
+            assert [bool(team_attacks & SQUARE_BB[sq]) for sq in range(81)] == attacks[team][idx].tolist()
+
+
+def test_initial_position():
+    game = ShogiGame()
+    n, moves = PositionBatch.from_boards([game.board, game.board]).legal_moves()
+    assert np.bincount(n).tolist() == [30, 30]
+
+
+def test_pawn_drop_beside_tokin():
+    # 5 筋有先手的と金，二步不算，步兵仍然可以打在 5 筋
+    game = ShogiGame()
+    game.board.set_sfen("4k4/9/9/9/4+P4/9/9/9/4K4 b P 1")
+    board, player = game.board, game.players[0]
+    moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+    assert make_drop(PAWN, 5 * 9 + 4) in drops
+
+    sets = PositionBatch.from_boards([board]).legal_move_sets()
+    assert sets[0] == moves | drops
+
+
+def test_pawn_drop_mate_is_rejected():
+    # 打步詰: 5 二打步會將死對方，兩邊各走一次都不能出現在合法走步
+    for sfen, pawn_drop in (("3nkn3/3l1l3/4G4/9/9/9/9/9/4K4 b P 1", "P*5b"),
+                            ("4k4/9/9/9/9/9/4g4/3L1L3/3NKN3 w p 1", "P*5h")):
+        game = ShogiGame()
+        game.board.set_sfen(sfen)
+        board = game.board
+        player = board.players[board.side_to_move]
+        moves, drops = board.get_all_valid_moves_and_drops(board.board, player)
+        assert usi_to_move(pawn_drop) not in drops
+
+        sets = PositionBatch.from_boards([board]).legal_move_sets()
+        assert sets[0] == moves | drops
+
+
+def test_forced_and_leaving_zone_promotions():
+    # 2 段的香車、3 段的桂馬只能升變，敵陣裡的銀將往回走也可以升變
+    for sfen in ("4k4/L8/1N7/9/9/9/9/9/4K4 b - 1", "4k4/9/2S6/9/9/9/9/9/4K4 b - 1",
+                 "4k4/9/9/9/9/9/6s2/8n/4K4 w - 1"):
+        game = ShogiGame()
+        game.board.set_sfen(sfen)
+        board = game.board
+        moves, drops = board.get_all_valid_moves_and_drops(board.board, board.players[board.side_to_move])
+        assert PositionBatch.from_boards([board]).legal_move_sets()[0] == moves | drops